@@ -1,26 +1,117 @@
 # -*- coding: utf-8 -*-
 """User authentication and management"""
+from collections import OrderedDict
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .models import User, UserStats, generate_user_id
+from .models import User, UserStats
+from .game_manager import turkish_lower
+from .user_ids import user_id_allocator
+from .write_behind import write_behind
+from .rating import rating_columns
 from datetime import datetime
-from typing import Optional, Dict
+import time
+from typing import NamedTuple, Optional, Dict
+
+# Legacy random IDs may sit on a permutation slot; skip at most this many
+MAX_ID_SKIPS = 1000
+# Seconds an identity is trusted; a rename in another worker is seen after at most this long
+IDENTITY_TTL = 30.0
+
+
+class UserIdentity(NamedTuple):
+    """Cached (user_id, username) pair returned by the lookup helpers"""
+    user_id: int
+    username: str
+
+
+class IdentityCache:
+    """LRU of user identities, looked up by user_id or case-folded username
+
+    Renames only invalidate the worker that made them, so entries expire
+    after ttl seconds and other workers re-read the row.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = IDENTITY_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._by_id: "OrderedDict[int, UserIdentity]" = OrderedDict()
+        self._by_name: Dict[str, int] = {}  # turkish_lower(username) -> user_id
+        self._expires: Dict[int, float] = {}  # user_id -> monotonic deadline
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def by_id(self, user_id: int) -> Optional[UserIdentity]:
+        identity = self._by_id.get(user_id)
+        if identity is not None and time.monotonic() >= self._expires[user_id]:
+            self.invalidate(user_id)
+            self.expired += 1
+            identity = None
+        if identity is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._by_id.move_to_end(user_id)
+        return identity
+
+    def by_username(self, username: str) -> Optional[UserIdentity]:
+        user_id = self._by_name.get(turkish_lower(username))
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.by_id(user_id)
+
+    def put(self, user_id: int, username: str) -> UserIdentity:
+        self.invalidate(user_id)
+        identity = UserIdentity(user_id, username)
+        self._by_id[user_id] = identity
+        self._by_name[turkish_lower(username)] = user_id
+        self._expires[user_id] = time.monotonic() + self.ttl
+        while len(self._by_id) > self.max_entries:
+            evicted_id, evicted = self._by_id.popitem(last=False)
+            self._by_name.pop(turkish_lower(evicted.username), None)
+            self._expires.pop(evicted_id, None)
+        return identity
+
+    def invalidate(self, user_id: int):
+        identity = self._by_id.pop(user_id, None)
+        if identity is not None:
+            self._by_name.pop(turkish_lower(identity.username), None)
+            self._expires.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        return {
+            'entries': len(self._by_id),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+        }
+
+
+# Global identity cache instance
+identity_cache = IdentityCache()
+
+
+def _username_filter(username: str):
+    """Case-insensitive match served by the ux_users_username_lower index"""
+    return func.tr_lower(User.username) == turkish_lower(username)
 
 
 def create_user(db: Session, username: str) -> Optional[User]:
     """Create a new user with unique ID and username"""
-    # Check if username already exists
-    existing = db.query(User).filter(User.username == username).first()
+    # Check if username already exists (ignoring case)
+    existing = db.query(User.id).filter(_username_filter(username)).first()
     if existing:
         return None
 
-    # Generate unique user_id
-    max_attempts = 100
-    for _ in range(max_attempts):
-        user_id = generate_user_id()
-        if not db.query(User).filter(User.user_id == user_id).first():
+    # Permutation IDs never collide with each other; only pre-allocator
+    # random IDs can occupy a slot, so this loop almost never repeats
+    for _ in range(MAX_ID_SKIPS):
+        user_id = user_id_allocator.allocate()
+        if not db.query(User.id).filter(User.user_id == user_id).first():
             break
     else:
-        # Failed to generate unique ID after max attempts
         return None
 
     # Create user
@@ -36,59 +127,89 @@ def create_user(db: Session, username: str) -> Optional[User]:
     stats = UserStats(user_id=user_id)
     db.add(stats)
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # Same name registered concurrently (unique index)
+        return None
     db.refresh(user)
+    identity_cache.put(user.user_id, user.username)
     return user
 
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
-    """Get user by user_id"""
-    return db.query(User).filter(User.user_id == user_id).first()
+def get_user_by_id(db: Session, user_id: int) -> Optional[UserIdentity]:
+    """Get user identity by user_id (cached)"""
+    identity = identity_cache.by_id(user_id)
+    if identity is None:
+        row = db.query(User.user_id, User.username).filter(User.user_id == user_id).first()
+        identity = identity_cache.put(row.user_id, row.username) if row else None
+    return identity
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
-    """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+def get_user_by_username(db: Session, username: str) -> Optional[UserIdentity]:
+    """Get user identity by username, ignoring case (cached)"""
+    identity = identity_cache.by_username(username)
+    if identity is None:
+        row = db.query(User.user_id, User.username).filter(_username_filter(username)).first()
+        identity = identity_cache.put(row.user_id, row.username) if row else None
+    return identity
 
 
 def update_username(db: Session, user_id: int, new_username: str) -> bool:
     """Update user's username"""
-    # Check if new username is taken
-    existing = db.query(User).filter(User.username == new_username).first()
+    # Check if new username is taken (ignoring case)
+    existing = db.query(User.user_id).filter(_username_filter(new_username)).first()
     if existing and existing.user_id != user_id:
         return False
 
-    user = get_user_by_id(db, user_id)
+    user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
         return False
 
     user.username = new_username
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    identity_cache.invalidate(user_id)
     return True
 
 
-def update_last_login(db: Session, user_id: int):
-    """Update user's last login time"""
-    user = get_user_by_id(db, user_id)
-    if user:
-        user.last_login = datetime.utcnow()
-        db.commit()
+def update_last_login(user_id: int):
+    """Record a login; the write-behind buffer commits it with the next batch"""
+    write_behind.record_login(user_id)
+
+
+def _empty_stats(user_id: int) -> UserStats:
+    """Unsaved stats row carrying the column defaults"""
+    values = {
+        column.name: column.default.arg
+        for column in UserStats.__table__.columns
+        if column.default is not None and column.default.is_scalar
+    }
+    return UserStats(user_id=user_id, **values)
 
 
 def get_user_stats(db: Session, user_id: int) -> Optional[UserStats]:
-    """Get user statistics - creates if doesn't exist"""
+    """Get user statistics; a missing row (users created before stats) is read as zeros
+
+    The row itself is created by the write-behind buffer, so a read never commits.
+    """
     stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    if not stats and get_user_by_id(db, user_id):
+        write_behind.ensure_stats(user_id)
+        stats = _empty_stats(user_id)
+    return stats
 
-    # If stats don't exist, create them (for users created before stats feature)
-    if not stats:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if user:
-            stats = UserStats(user_id=user_id)
-            db.add(stats)
-            db.commit()
-            db.refresh(stats)
 
+def _get_or_create_stats(db: Session, user_id: int) -> Optional[UserStats]:
+    """Stats row to update in place, created in the caller's transaction if missing"""
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    if not stats and get_user_by_id(db, user_id):
+        stats = UserStats(user_id=user_id)
+        db.add(stats)
+        db.flush()
     return stats
 
 
@@ -113,8 +234,8 @@ def get_leaderboard(db: Session, limit: int = 100) -> list:
 
 
 def update_user_stats_after_game(db: Session, user_id: int, game_data: Dict):
-    """Update user stats after a game completes"""
-    stats = get_user_stats(db, user_id)
+    """Update user stats after a game completes; the caller commits the whole game at once"""
+    stats = _get_or_create_stats(db, user_id)
     if not stats:
         return
 
@@ -139,5 +260,11 @@ def update_user_stats_after_game(db: Session, user_id: int, game_data: Dict):
     stats.total_players_deceived += game_data.get('players_deceived', 0)
     stats.total_times_deceived += game_data.get('times_deceived', 0)
 
+    # Update skill rating (computed for the whole room by the caller)
+    rating = game_data.get('rating')
+    if rating is not None:
+        for column, value in rating_columns(rating).items():
+            setattr(stats, column, value)
+        stats.rated_games = (stats.rated_games or 0) + 1
+
     stats.last_updated = datetime.utcnow()
-    db.commit()
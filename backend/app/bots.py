@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Server-side bot players that fill empty seats
+
+A bot is an ordinary Player with a bot_skill and no socket. Bots have no
+tasks of their own: the room command that opens a phase (a new round,
+voting, the final test) calls BotPlayers.act(room) and every bot in the
+room plays that phase at once, so a bot costs a few dict operations per
+phase however long the room's timers run.
+
+Fake answers are the question's most convincing historical fakes
+(distractors.py), then correct answers of other questions in the same
+category, precomputed per category by CandidateTable. Votes and final
+test answers are right with probability bot_skill.
+"""
+import itertools
+import os
+import random
+from typing import Dict, List, Optional, Tuple
+
+from .distractors import distractor_index
+from .game_manager import GameManager, GamePhase, GameRoom, Player, game_manager, normalize_answer
+from .question_selector import QuestionSelector, question_selector
+
+BOT_SKILL = float(os.environ.get("BOT_SKILL", "0.5"))  # Default chance of voting for the truth
+BOT_NAMES = ["Bilge", "Çalışkan", "Meraklı", "Kurnaz", "Sakin", "Hızlı"]
+HISTORY_FAKES = 5  # Historical fakes a bot tries before category answers
+FAKE_ATTEMPTS = 8  # Category answers drawn before a bot submits an empty (penalized) answer
+MIN_CATEGORY_ANSWERS = 4  # Smaller categories borrow answers from the whole bank
+
+
+class CandidateTable:
+    """Normalized correct answers per category, rebuilt lazily when the catalog changes"""
+
+    def __init__(self, selector: QuestionSelector):
+        self._selector = selector
+        self._answers: Dict[Optional[str], Tuple[int, List[str]]] = {}  # category -> (catalog version, answers)
+        self.rebuilds = 0
+
+    def answers(self, category: Optional[str]) -> List[str]:
+        version = self._selector.catalog_version
+        cached = self._answers.get(category)
+        if cached is None or cached[0] != version:
+            answers = list({
+                normalize_answer(question['correct_answer'])
+                for question in self._selector.category_questions(category)
+            })
+            cached = (version, answers)
+            self._answers[category] = cached
+            self.rebuilds += 1
+        return cached[1]
+
+    def for_question(self, category: Optional[str]) -> List[str]:
+        answers = self.answers(category)
+        if len(answers) < MIN_CATEGORY_ANSWERS and category is not None:
+            return self.answers(None)
+        return answers
+
+
+class BotPlayers:
+    """Seats bots in rooms and plays their turns when a phase opens"""
+
+    def __init__(self, manager: GameManager, selector: QuestionSelector, rng: Optional[random.Random] = None):
+        self._manager = manager
+        self.candidates = CandidateTable(selector)
+        self._rng = rng or random.Random()
+        self._ids = itertools.count(1)
+        self.added = 0
+        self.fakes = 0
+        self.empty_fakes = 0
+        self.votes = 0
+        self.final_tests = 0
+
+    def add(self, room: GameRoom, skill: float = BOT_SKILL) -> Optional[Player]:
+        """Seat a bot in a free seat of a waiting room that has a person in it"""
+        if room.phase != GamePhase.WAITING or len(room.players) >= room.max_players or not room.human_count:
+            return None
+        taken = {player.name for player in room.players.values()}
+        name = next(f"{name} Bot" for name in BOT_NAMES if f"{name} Bot" not in taken)
+        socket_id = f"bot:{next(self._ids)}"  # Never a Socket.IO sid
+        if not room.add_player(socket_id, name):
+            return None
+        player = room.players[socket_id]
+        player.bot_skill = min(max(skill, 0.0), 1.0)
+        self.added += 1
+        return player
+
+    def act(self, room: GameRoom) -> int:
+        """Let the room's bots play the phase it is in; returns how many acted"""
+        bots = [(player_id, player) for player_id, player in room.players.items() if player.is_bot]
+        if not bots:
+            return 0
+        if room.phase == GamePhase.SUBMITTING_FAKE:
+            play = self._submit_fake
+        elif room.phase == GamePhase.VOTING:
+            play = self._vote
+        elif room.phase == GamePhase.FINAL_TEST:
+            play = self._answer_final_test
+        else:
+            return 0
+        return sum(1 for player_id, player in bots if play(room, player_id, player))
+
+    def _submit_fake(self, room: GameRoom, player_id: str, player: Player) -> bool:
+        current_round = room.rounds[room.current_round]
+        if player_id in current_round.fake_answers:
+            return False
+
+        history = [d.answer for d in distractor_index.top(current_round.question_id, HISTORY_FAKES)]
+        self._rng.shuffle(history)
+        # submit_fake_answer rejects the truth and answers already taken, so just try the next one
+        for answer in history:
+            if room.submit_fake_answer(player_id, answer):
+                self.fakes += 1
+                return True
+
+        pool = self.candidates.for_question(room.questions[room.current_round].get('category'))
+        for _ in range(FAKE_ATTEMPTS if pool else 0):
+            answer = self._rng.choice(pool)
+            if answer and room.submit_fake_answer(player_id, answer):
+                self.fakes += 1
+                return True
+
+        self.empty_fakes += 1
+        return room.submit_fake_answer(player_id, "")
+
+    def _vote(self, room: GameRoom, player_id: str, player: Player) -> bool:
+        current_round = room.rounds[room.current_round]
+        if player_id in current_round.votes:
+            return False
+        correct = normalize_answer(current_round.correct_answer)
+        own = current_round.fake_answers.get(player_id)
+        fakes = [option for option in current_round.all_options if option != correct and option != own]
+        choice = correct if not fakes or self._rng.random() < player.bot_skill else self._rng.choice(fakes)
+        self.votes += 1
+        return room.submit_vote(player_id, choice)
+
+    def _answer_final_test(self, room: GameRoom, player_id: str, player: Player) -> bool:
+        if len(player.final_answers) >= len(room.questions):
+            return False
+        for i, question in enumerate(room.questions):
+            if i not in player.final_answers:
+                answer = question['correct_answer'] if self._rng.random() < player.bot_skill else ""
+                room.submit_final_answer(player_id, i, answer)
+        self.final_tests += 1
+        return True
+
+    def get_stats(self) -> Dict:
+        """Bot counters for monitoring"""
+        seated = sum(
+            1 for room in self._manager.rooms.values() for player in room.players.values() if player.is_bot
+        )
+        return {
+            'seated': seated,
+            'added': self.added,
+            'fakes': self.fakes,
+            'empty_fakes': self.empty_fakes,
+            'votes': self.votes,
+            'final_tests': self.final_tests,
+            'candidate_rebuilds': self.candidates.rebuilds,
+        }
+
+
+# Global bot players instance
+bot_players = BotPlayers(game_manager, question_selector)
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
-from .models import Base, Question
+from .models import Base, Question, QuestionStats, User, UserStats
+from .game_manager import question_fingerprint
+from .search import register_functions, install_fts
+from .log import log
+from .tracing import tracer
 import os
 
 # SQLite veritabanı dosya yolu
@@ -13,10 +18,42 @@ engine = create_engine(
     connect_args={"check_same_thread": False}  # SQLite için gerekli
 )
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    """Her SQLite bağlantısına FTS tetikleyicilerinin kullandığı fonksiyonları ekle"""
+    register_functions(dbapi_connection)
+
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(SessionLocal, "after_transaction_create")
+def _trace_transaction_begin(session, transaction):
+    """İzlenen bir oyun komutu içindeyse her oturum işlemi için bir span aç"""
+    if transaction.parent is None:
+        span = tracer.start_span("db.session")
+        if span is not None:
+            span.set(**{"db.system": "sqlite", "db.statements": 0})
+            session.info["trace_span"] = span
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _trace_statement(orm_execute_state):
+    span = orm_execute_state.session.info.get("trace_span")
+    if span is not None:
+        span.attributes["db.statements"] += 1
+
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _trace_transaction_end(session, transaction):
+    if transaction.parent is None:
+        span = session.info.pop("trace_span", None)
+        if span is not None:
+            tracer.end_span(span)
+
+
 def get_db():
     """Veritabanı bağlantısı için dependency"""
     db = SessionLocal()
@@ -32,7 +69,13 @@ def init_db():
     os.makedirs("./data", exist_ok=True)
 
     Base.metadata.create_all(bind=engine)
-    print("Veritabani tablolari olusturuldu")
+    _migrate_question_text_hash()
+    _add_missing_columns(UserStats, QuestionStats)
+    _rename_case_duplicate_usernames()
+    _create_missing_indexes(User, UserStats)
+    with engine.begin() as conn:
+        install_fts(conn)
+    log.info("startup", "Veritabani tablolari olusturuldu")
 
     # Örnek sorular ekle (eğer veritabanı boşsa)
     db = SessionLocal()
@@ -114,6 +157,83 @@ def init_db():
             ]
             db.add_all(sample_questions)
             db.commit()
-            print(f"{len(sample_questions)} ornek soru eklendi")
+            log.info("startup", f"{len(sample_questions)} ornek soru eklendi")
     finally:
         db.close()
+
+
+def _create_missing_indexes(*models):
+    """create_all skips indexes on existing tables; add any that are missing"""
+    with engine.connect() as conn:
+        existing = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for model in models:
+        for index in model.__table__.indexes:
+            if index.name not in existing:  # name check: reflection skips expression indexes
+                try:
+                    index.create(bind=engine)
+                except IntegrityError:
+                    # Lookups rely on these indexes being unique; never run without them
+                    log.error("startup", f"{index.name} olusturulamadi, tabloda cakisan kayitlar var")
+                    raise
+
+
+def _rename_case_duplicate_usernames():
+    """Older databases allowed names differing only in case; keep the oldest, rename the rest
+
+    ux_users_username_lower cannot be created while such rows exist. A
+    renamed user gets "_<user_id>" appended, which is unique by itself.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_users_username_lower'"
+        )).first():
+            return
+        duplicates = conn.execute(text("""
+            SELECT u.id, u.user_id, u.username FROM users u
+            WHERE EXISTS (
+                SELECT 1 FROM users o WHERE tr_lower(o.username) = tr_lower(u.username) AND o.id < u.id
+            )
+        """)).fetchall()
+        for row in duplicates:
+            suffix = f"_{row.user_id}"
+            conn.execute(
+                text("UPDATE users SET username = :username WHERE id = :id"),
+                {"id": row.id, "username": row.username[:50 - len(suffix)] + suffix}
+            )
+    if duplicates:
+        log.warning("startup", f"{len(duplicates)} kullanici adi buyuk/kucuk harf cakismasi nedeniyle yeniden adlandirildi")
+
+
+def _add_missing_columns(*models):
+    """create_all skips new columns on existing tables; add them with their defaults"""
+    for model in models:
+        table = model.__table__
+        existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+
+
+def _migrate_question_text_hash(batch_size: int = 1000):
+    """Add questions.text_hash to older databases and fill missing values"""
+    columns = {c["name"] for c in inspect(engine).get_columns("questions")}
+    with engine.begin() as conn:
+        if "text_hash" not in columns:
+            conn.execute(text("ALTER TABLE questions ADD COLUMN text_hash VARCHAR(40)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_questions_text_hash ON questions (text_hash)"))
+
+        while True:
+            rows = conn.execute(text(
+                "SELECT id, question_text FROM questions WHERE text_hash IS NULL LIMIT :limit"
+            ), {"limit": batch_size}).fetchall()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE questions SET text_hash = :text_hash WHERE id = :id"),
+                [{"id": row.id, "text_hash": question_fingerprint(row.question_text or "")} for row in rows]
+            )
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Near-duplicate question detection (MinHash + LSH)"""
+import hashlib
+import operator
+import re
+import threading
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .database import SessionLocal
+from .game_manager import normalize_answer, normalize_question_text
+from .models import Question
+from .search import fold_for_search
+
+# Each shingle is hashed once with blake2b; the 64-byte digest gives
+# SIGNATURE_SIZE independent 16-bit hash values, and the signature keeps the
+# minimum of each across all shingles.
+SIGNATURE_SIZE = 32
+BAND_ROWS = 4  # 8 bands of 4 rows: ~98% recall at similarity 0.8, ~0% below 0.3
+BANDS = SIGNATURE_SIZE // BAND_ROWS
+
+# Flag when texts are this similar, or less similar but share the answer
+TEXT_THRESHOLD = 0.8
+SAME_ANSWER_THRESHOLD = 0.5
+
+# Buckets bigger than this come from very common fragments/answers ("Evet");
+# they are not scanned so lookups stay bounded
+MAX_BUCKET_SIZE = 500
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str) -> Set[str]:
+    """Words and adjacent word pairs of the normalized, ASCII-folded text"""
+    words = _TOKEN.findall(fold_for_search(normalize_question_text(text or "")))
+    result = set(words)
+    result.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return result or {""}
+
+
+def signature(text: str) -> array:
+    """MinHash signature of the question text's shingles"""
+    hashes = [array("H", hashlib.blake2b(s.encode("utf-8"), digest_size=64).digest()) for s in shingles(text)]
+    return array("H", map(min, zip(*hashes)))
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(map(operator.eq, a, b)) / SIGNATURE_SIZE
+
+
+def _band_keys(sig: array) -> List[Tuple]:
+    return [(band,) + tuple(sig[band * BAND_ROWS:(band + 1) * BAND_ROWS]) for band in range(BANDS)]
+
+
+def _first_shared_band(a: array, b: array) -> Optional[int]:
+    for band in range(BANDS):
+        start = band * BAND_ROWS
+        if a[start:start + BAND_ROWS] == b[start:start + BAND_ROWS]:
+            return band
+    return None
+
+
+def is_near_duplicate(text_similarity: float, same_answer: bool) -> bool:
+    return text_similarity >= TEXT_THRESHOLD or (same_answer and text_similarity >= SAME_ANSWER_THRESHOLD)
+
+
+class NearDuplicateIndex:
+    """In-memory LSH index over question text signatures and answers
+
+    Bulk imports add from a worker thread, so mutations hold a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Optional[Dict[int, Optional[Tuple[str, str]]]] = None  # changes during a rebuild
+        self._signatures: Dict[int, array] = {}  # question_id -> signature
+        self._answers: Dict[int, str] = {}  # question_id -> normalized answer
+        self._buckets: Dict[Tuple, Set[int]] = {}  # LSH band -> question ids
+        self._answer_buckets: Dict[str, Set[int]] = {}  # normalized answer -> question ids
+        self._links: Dict[int, Set[int]] = {}  # question_id -> flagged near-duplicates
+        self.ready = False
+        self.lookups = 0
+        self.flagged = 0
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def build(self, rows: Iterable[Tuple[int, str, str]]):
+        """Replace the index from (id, question_text, correct_answer) rows
+
+        Safe to run in a thread: adds/removes made meanwhile are replayed
+        onto the new index before it is swapped in.
+        """
+        with self._lock:
+            self._pending = {}
+        fresh = NearDuplicateIndex()
+        for question_id, question_text, correct_answer in rows:
+            fresh._add(question_id, question_text, correct_answer)
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            for question_id, values in pending.items():
+                fresh._remove(question_id)
+                if values is not None:
+                    fresh._add(question_id, *values)
+            self._signatures, self._answers = fresh._signatures, fresh._answers
+            self._buckets, self._answer_buckets = fresh._buckets, fresh._answer_buckets
+            self._links = fresh._links
+            self.ready = True
+
+    def _candidates(self, sig: array, answer: str) -> Set[int]:
+        candidates: Set[int] = set()
+        for key in _band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket and len(bucket) <= MAX_BUCKET_SIZE:
+                candidates.update(bucket)
+        bucket = self._answer_buckets.get(answer)
+        if bucket and len(bucket) <= MAX_BUCKET_SIZE:
+            candidates.update(bucket)
+        return candidates
+
+    def query(self, question_text: str, correct_answer: str, exclude_id: Optional[int] = None) -> List[Dict]:
+        """Near-duplicates of a question, most similar first"""
+        sig = signature(question_text)
+        with self._lock:
+            return self._query(sig, correct_answer, exclude_id)
+
+    def _query(self, sig: array, correct_answer: str, exclude_id: Optional[int]) -> List[Dict]:
+        self.lookups += 1
+        answer = normalize_answer(correct_answer or "")
+        candidates = self._candidates(sig, answer)
+        candidates.discard(exclude_id)
+
+        matches = []
+        for question_id in candidates:
+            score = similarity(sig, self._signatures[question_id])
+            same_answer = self._answers[question_id] == answer
+            if is_near_duplicate(score, same_answer):
+                matches.append({"id": question_id, "similarity": round(score, 3), "same_answer": same_answer})
+        matches.sort(key=lambda m: (-m["similarity"], m["id"]))
+        if matches:
+            self.flagged += 1
+        return matches
+
+    def add(self, question_id: int, question_text: str, correct_answer: str) -> List[Dict]:
+        """Index a question (replacing an older version); returns its near-duplicates"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending[question_id] = (question_text, correct_answer)
+            return self._add(question_id, question_text, correct_answer)
+
+    def _add(self, question_id: int, question_text: str, correct_answer: str) -> List[Dict]:
+        self._remove(question_id)
+        sig = signature(question_text)
+        answer = normalize_answer(correct_answer or "")
+        matches = self._query(sig, correct_answer, question_id)
+
+        self._signatures[question_id] = sig
+        self._answers[question_id] = answer
+        for key in _band_keys(sig):
+            self._buckets.setdefault(key, set()).add(question_id)
+        self._answer_buckets.setdefault(answer, set()).add(question_id)
+        for match in matches:
+            self._links.setdefault(question_id, set()).add(match["id"])
+            self._links.setdefault(match["id"], set()).add(question_id)
+        return matches
+
+    @staticmethod
+    def _discard(buckets: Dict, key, question_id: int):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.discard(question_id)
+            if not bucket:
+                del buckets[key]
+
+    def remove(self, question_id: int):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[question_id] = None
+            self._remove(question_id)
+
+    def _remove(self, question_id: int):
+        sig = self._signatures.pop(question_id, None)
+        if sig is None:
+            return
+        for key in _band_keys(sig):
+            self._discard(self._buckets, key, question_id)
+        self._discard(self._answer_buckets, self._answers.pop(question_id), question_id)
+        for other in self._links.pop(question_id, ()):
+            self._discard(self._links, other, question_id)
+
+    def duplicates_of(self, question_id: int) -> FrozenSet[int]:
+        """Flagged near-duplicates of an indexed question (a copy; imports may change the links)"""
+        with self._lock:
+            return frozenset(self._links.get(question_id, ()))
+
+    def find_groups(self) -> Dict:
+        """Cluster the whole bank into near-duplicate groups
+
+        Only pairs sharing an LSH band or an answer are compared, so the cost
+        scales with bucket sizes rather than n².
+        """
+        parent: Dict[int, int] = {}
+
+        def find(x: int) -> int:
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        def union(a: int, b: int):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        with self._lock:
+            buckets = [set(b) for b in self._buckets.values()] + [set(b) for b in self._answer_buckets.values()]
+            bands = [key[0] for key in self._buckets] + [None] * len(self._answer_buckets)
+            signatures, answers = dict(self._signatures), dict(self._answers)
+
+        pairs_compared = 0
+        skipped_buckets = 0
+        for band, bucket in zip(bands, buckets):
+            if len(bucket) < 2:
+                continue
+            if len(bucket) > MAX_BUCKET_SIZE:
+                skipped_buckets += 1
+                continue
+            members = sorted(bucket)
+            for i, a in enumerate(members):
+                sig_a = signatures[a]
+                for b in members[i + 1:]:
+                    sig_b = signatures[b]
+                    # Compare each pair once: in the first band where they collide,
+                    # or in the answer bucket when they share no band
+                    if _first_shared_band(sig_a, sig_b) != band:
+                        continue
+                    pairs_compared += 1
+                    if is_near_duplicate(similarity(sig_a, sig_b), answers[a] == answers[b]):
+                        union(a, b)
+
+        groups: Dict[int, List[int]] = {}
+        for question_id in set(parent) | set(parent.values()):
+            groups.setdefault(find(question_id), []).append(question_id)
+        clusters = sorted((sorted(ids) for ids in groups.values()), key=lambda ids: (-len(ids), ids[0]))
+        return {
+            "questions_indexed": len(signatures),
+            "pairs_compared": pairs_compared,
+            "skipped_buckets": skipped_buckets,
+            "groups": clusters,
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "questions": len(self._signatures),
+            "buckets": len(self._buckets),
+            "flagged_questions": len(self._links),
+            "lookups": self.lookups,
+            "lookups_flagged": self.flagged,
+        }
+
+
+# Global near-duplicate index instance
+near_duplicate_index = NearDuplicateIndex()
+
+
+def rebuild_index(index: NearDuplicateIndex = near_duplicate_index):
+    """Index every question in the database (blocking; run in a worker thread)"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Question.id, Question.question_text, Question.correct_answer).yield_per(5000)
+        index.build(rows)
+    finally:
+        db.close()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Historical fake answers per question with an in-memory top-K index
+
+Every fake answer typed in a round is kept normalized, with how often it
+was written and how many votes it drew ("vote-through"). A question's
+list is one compact blob in question_distractors, rewritten once per
+game over for the questions that game played. In memory only the TOP_K
+most convincing fakes of each question are kept, as a ready tuple, so
+top(question_id, 5) is a dict lookup and a slice.
+"""
+import struct
+import time
+from typing import Container, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import QuestionDistractors
+
+TOP_K = 10  # Fakes per question kept in memory
+MAX_ENTRIES = 256  # Fakes per question kept on disk; the least convincing are dropped
+MAX_ANSWER_BYTES = 255  # Longer fakes are not useful as distractors and are not stored
+
+_COUNT = struct.Struct("<H")  # number of entries
+_ENTRY = struct.Struct("<IIB")  # votes, times written, answer length; UTF-8 answer follows
+
+
+class Distractor(NamedTuple):
+    answer: str  # normalize_answer() form, as shown in the voting phase
+    votes: int  # Votes it drew from other players
+    written: int  # Rounds in which a player wrote it
+
+
+def _rank_key(item: Tuple[str, List[int]]):
+    answer, (votes, written) = item
+    return -votes, -written, answer
+
+
+class DistractorList:
+    """All recorded fakes of one question: answer -> [votes, written]"""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self):
+        self._entries: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, answer: str, votes: int, written: int = 1):
+        counts = self._entries.get(answer)
+        if counts is None:
+            self._entries[answer] = [votes, written]
+        else:
+            counts[0] += votes
+            counts[1] += written
+
+    def total_votes(self) -> int:
+        return sum(votes for votes, _ in self._entries.values())
+
+    def ranked(self, limit: Optional[int] = None) -> Tuple[Distractor, ...]:
+        """Most convincing first: by votes, then by how often it was written"""
+        items = sorted(self._entries.items(), key=_rank_key)
+        if limit is not None:
+            items = items[:limit]
+        return tuple(Distractor(answer, votes, written) for answer, (votes, written) in items)
+
+    def trim(self, limit: int = MAX_ENTRIES):
+        if len(self._entries) > limit:
+            self._entries = {d.answer: [d.votes, d.written] for d in self.ranked(limit)}
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a count followed by (votes, written, length, answer) records"""
+        parts = [_COUNT.pack(len(self._entries))]
+        for answer, (votes, written) in self._entries.items():
+            encoded = answer.encode("utf-8")
+            parts.append(_ENTRY.pack(votes, written, len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DistractorList":
+        distractors = cls()
+        (count,) = _COUNT.unpack_from(data, 0)
+        offset = _COUNT.size
+        for _ in range(count):
+            votes, written, length = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            answer = data[offset:offset + length].decode("utf-8")
+            offset += length
+            distractors._entries[answer] = [votes, written]
+        return distractors
+
+
+def round_distractors(round_data, exclude: Container[str] = ()) -> Dict[str, int]:
+    """A finished round's fake answers with the votes each drew, ignoring players in exclude"""
+    fakes = {answer: 0 for player_id, answer in round_data.fake_answers.items()
+             if answer and player_id not in exclude and len(answer.encode("utf-8")) <= MAX_ANSWER_BYTES}
+    for player_id, vote in round_data.votes.items():
+        if vote in fakes and player_id not in exclude:
+            fakes[vote] += 1
+    return fakes
+
+
+class DistractorIndex:
+    """Top-K fakes of every question in memory, backed by question_distractors"""
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self._top: Dict[int, Tuple[Distractor, ...]] = {}  # question_id -> ranked top-K
+        self.loaded = False
+        self.lookups = 0
+        self.games_recorded = 0
+        self.fakes_recorded = 0
+        self.rows_written = 0
+        self.last_record_ms = 0.0
+
+    def load(self, db: Session):
+        """Read every stored list once and keep only its top-K"""
+        top = {}
+        for question_id, entries in db.query(QuestionDistractors.question_id, QuestionDistractors.entries):
+            top[question_id] = DistractorList.from_bytes(entries).ranked(self.top_k)
+        self._top = top
+        self.loaded = True
+
+    def top(self, question_id: int, limit: int = 5) -> Tuple[Distractor, ...]:
+        """The question's most convincing recorded fakes (limit <= top_k)"""
+        self.lookups += 1
+        return self._top.get(question_id, ())[:limit]
+
+    def record(self, db: Session, rounds: Iterable,
+               exclude: Container[str] = ()) -> Dict[int, Tuple[Distractor, ...]]:
+        """Merge a finished game's rounds and stage the rows in db (caller commits)
+
+        One query loads the stored lists of every question the game played
+        and each is rewritten once, however many rounds used it. Fakes and
+        votes of players in exclude (bots) are left out. Returns the new
+        top-K of each question, for apply() once the commit has succeeded.
+        """
+        started = time.perf_counter()
+        per_question: Dict[int, Dict[str, int]] = {}
+        for round_data in rounds:
+            fakes = round_distractors(round_data, exclude)
+            if fakes and round_data.question_id:
+                merged = per_question.setdefault(round_data.question_id, {})
+                for answer, votes in fakes.items():
+                    merged[answer] = merged.get(answer, 0) + votes
+        if not per_question:
+            return {}
+
+        rows = {
+            row.question_id: row for row in
+            db.query(QuestionDistractors).filter(QuestionDistractors.question_id.in_(list(per_question)))
+        }
+        top = {}
+        for question_id, fakes in per_question.items():
+            row = rows.get(question_id)
+            if row is None:
+                row = QuestionDistractors(question_id=question_id)
+                db.add(row)
+                distractors = DistractorList()
+            else:
+                distractors = DistractorList.from_bytes(row.entries)
+            for answer, votes in fakes.items():
+                distractors.add(answer, votes)
+            distractors.trim()
+            row.entries = distractors.to_bytes()
+            row.distinct_count = len(distractors)
+            row.total_votes = distractors.total_votes()
+            top[question_id] = distractors.ranked(self.top_k)
+            self.fakes_recorded += len(fakes)
+
+        self.games_recorded += 1
+        self.rows_written += len(per_question)
+        self.last_record_ms = round((time.perf_counter() - started) * 1000, 3)
+        return top
+
+    def apply(self, top: Dict[int, Tuple[Distractor, ...]]):
+        """Publish the top-K lists record() returned, after their rows are committed"""
+        self._top.update(top)
+
+    def forget(self, question_id: int):
+        self._top.pop(question_id, None)
+
+    def get_stats(self) -> Dict:
+        """Index counters for monitoring"""
+        return {
+            'loaded': self.loaded,
+            'questions': len(self._top),
+            'top_k': self.top_k,
+            'lookups': self.lookups,
+            'games_recorded': self.games_recorded,
+            'fakes_recorded': self.fakes_recorded,
+            'rows_written': self.rows_written,
+            'last_record_ms': self.last_record_ms,
+        }
+
+
+# Global distractor index instance
+distractor_index = DistractorIndex()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Per-room batching of state-change broadcasts"""
+import asyncio
+from typing import Dict, Callable, Awaitable, Optional
+
+
+class EmitCoalescer:
+    """Collapse repeated notifications for a room into one emit per window
+
+    Payloads are built lazily at flush time, so N state changes inside the
+    window cost a single encode and a single broadcast carrying the latest state.
+    """
+
+    def __init__(self, emit: Callable[[str, Dict, str], Awaitable[None]], window: float = 0.05):
+        self._emit = emit
+        self.window = window
+        self._pending: Dict[str, Dict[str, Callable[[], Dict]]] = {}  # room -> {event -> build}
+        self._timers: Dict[str, asyncio.Task] = {}  # room -> flush task
+        self.scheduled_count = 0
+        self.emitted_count = 0
+
+    def schedule(self, room_code: str, event: str, build: Callable[[], Dict]):
+        """Queue `event` for the room; `build()` produces the payload when flushed"""
+        self.scheduled_count += 1
+        self._pending.setdefault(room_code, {})[event] = build
+
+        timer = self._timers.get(room_code)
+        if timer is None or timer.done():
+            self._timers[room_code] = asyncio.create_task(self._flush_later(room_code))
+
+    async def _flush_later(self, room_code: str):
+        await asyncio.sleep(self.window)
+        self._timers.pop(room_code, None)
+        await self._emit_pending(room_code)
+
+    async def flush(self, room_code: str, event: Optional[str] = None):
+        """Send pending notifications now (e.g. before a phase change event)"""
+        pending = self._pending.get(room_code)
+        if not pending:
+            return
+
+        if event is None:
+            self._cancel_timer(room_code)
+            await self._emit_pending(room_code)
+        elif event in pending:
+            build = pending.pop(event)
+            if not pending:
+                self._cancel_timer(room_code)
+                del self._pending[room_code]
+            self.emitted_count += 1
+            await self._emit(event, build(), room_code)
+
+    async def _emit_pending(self, room_code: str):
+        pending = self._pending.pop(room_code, None)
+        if not pending:
+            return
+        for event, build in pending.items():
+            self.emitted_count += 1
+            await self._emit(event, build(), room_code)
+
+    def _cancel_timer(self, room_code: str):
+        timer = self._timers.pop(room_code, None)
+        if timer and not timer.done():
+            timer.cancel()
+
+    def discard(self, room_code: str):
+        """Drop pending notifications for a room (e.g. on reset)"""
+        self._cancel_timer(room_code)
+        self._pending.pop(room_code, None)
+
+    def get_stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            'window_seconds': self.window,
+            'scheduled': self.scheduled_count,
+            'emitted': self.emitted_count,
+            'pending_rooms': len(self._pending),
+        }
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Per-room ring buffer of broadcast events, for reconnect catch-up"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Events kept per room; a full round is about a dozen broadcasts
+EVENT_LOG_SIZE = 64
+
+
+class RoomEventLog:
+    """Sequence-numbered ring buffer of one room's broadcasts"""
+
+    def __init__(self, capacity: int = EVENT_LOG_SIZE):
+        self.seq = 0  # Sequence number of the newest event
+        self._events: Deque[Tuple[int, str, Dict]] = deque(maxlen=capacity)
+
+    def append(self, event: str, data: Dict) -> int:
+        self.seq += 1
+        self._events.append((self.seq, event, data))
+        return self.seq
+
+    def since(self, last_seq: int) -> Optional[List[Dict]]:
+        """Events after last_seq, or None if some of them were already evicted"""
+        if last_seq > self.seq:
+            return None  # Sequence from another server run
+        oldest = self._events[0][0] if self._events else self.seq + 1
+        if last_seq + 1 < oldest:
+            return None
+        # Walk back from the newest end; catch-up is usually a handful of events
+        missed = []
+        for seq, event, data in reversed(self._events):
+            if seq <= last_seq:
+                break
+            missed.append({'seq': seq, 'event': event, 'data': data})
+        missed.reverse()
+        return missed
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+class EventLogs:
+    """Event logs for all rooms, keyed by room code
+
+    Logs outlive GameRoom objects (rooms are replaced on reset), so sequence
+    numbers for a room code only ever grow.
+    """
+
+    def __init__(self, capacity: int = EVENT_LOG_SIZE):
+        self.capacity = capacity
+        self._logs: Dict[str, RoomEventLog] = {}
+        self.catch_ups = 0
+        self.events_replayed = 0
+        self.snapshots = 0
+
+    def get(self, room_code: str) -> RoomEventLog:
+        log = self._logs.get(room_code)
+        if log is None:
+            log = self._logs[room_code] = RoomEventLog(self.capacity)
+        return log
+
+    def record(self, room_code: str, event: str, data: Dict) -> int:
+        return self.get(room_code).append(event, data)
+
+    def missed(self, room_code: str, last_seq: Optional[int]) -> Optional[List[Dict]]:
+        """Events a client that saw last_seq is missing; None means send a snapshot"""
+        events = None if last_seq is None else self.get(room_code).since(last_seq)
+        if events is None:
+            self.snapshots += 1
+        else:
+            self.catch_ups += 1
+            self.events_replayed += len(events)
+        return events
+
+    def get_stats(self) -> Dict:
+        return {
+            'rooms': len(self._logs),
+            'buffered_events': sum(len(log) for log in self._logs.values()),
+            'catch_ups': self.catch_ups,
+            'events_replayed': self.events_replayed,
+            'snapshots': self.snapshots,
+        }
+
+
+# Global event log instance
+event_logs = EventLogs()
@@ -1,34 +1,27 @@
 # -*- coding: utf-8 -*-
 import random
 import string
+import hashlib
 import time
-import threading
-from typing import Dict, List, Optional
+import itertools
+from typing import Callable, Dict, List, Optional
 from dataclasses import dataclass, field
 from enum import Enum
 
+from .tracing import tracer
+
+
+# Turkish-specific uppercase mappings, applied before str.lower()
+_TURKISH_UPPER = str.maketrans({
+    'İ': 'i',   # Turkish dotted I
+    'I': 'ı',   # Turkish dotless I
+})
+
 
 def turkish_lower(text: str) -> str:
     """Convert text to lowercase with proper Turkish character handling"""
-    # Turkish-specific character mappings
-    turkish_map = {
-        'İ': 'i',   # Turkish dotted I
-        'I': 'ı',   # Turkish dotless I
-        'Ş': 'ş',
-        'Ğ': 'ğ',
-        'Ü': 'ü',
-        'Ö': 'ö',
-        'Ç': 'ç',
-    }
-
-    result = []
-    for char in text:
-        if char in turkish_map:
-            result.append(turkish_map[char])
-        else:
-            result.append(char.lower())
-
-    return ''.join(result)
+    # Ş, Ğ, Ü, Ö, Ç already lowercase correctly; only the two I's need mapping
+    return text.translate(_TURKISH_UPPER).lower()
 
 
 def normalize_answer(answer: str) -> str:
@@ -36,6 +29,16 @@ def normalize_answer(answer: str) -> str:
     return turkish_lower(answer.strip())
 
 
+def normalize_question_text(text: str) -> str:
+    """Normalize question text for duplicate detection"""
+    return ' '.join(turkish_lower(text).split()).rstrip('?.!: ')
+
+
+def question_fingerprint(text: str) -> str:
+    """Stable hash of normalized question text"""
+    return hashlib.sha1(normalize_question_text(text).encode('utf-8')).hexdigest()
+
+
 def check_answer(user_answer: str, correct_answer: str, acceptable_answers: Optional[str] = None) -> bool:
     """Check if user answer is correct"""
     normalized_user = normalize_answer(user_answer)
@@ -77,6 +80,11 @@ class Player:
     final_answers: Dict[int, str] = field(default_factory=dict)
     submit_time: Optional[float] = None  # Time when submitted fake answer
     vote_time: Optional[float] = None  # Time when voted
+    bot_skill: Optional[float] = None  # Set for server-side bots (see bots.py): chance of picking the truth
+
+    @property
+    def is_bot(self) -> bool:
+        return self.bot_skill is not None
 
 
 @dataclass
@@ -95,10 +103,20 @@ class Round:
     reactions: Dict[str, Dict[str, str]] = field(default_factory=dict)
 
 
+# Room versions come from one counter, so a reset room never reuses an old version
+_room_versions = itertools.count(1)
+
+
 class GameRoom:
-    """Game room management class"""
+    """Game room management class
+
+    Not thread-safe by design: all mutations run on the event loop, one at a
+    time, through the room's mailbox (see room_actor.RoomMailbox).
+    """
 
-    def __init__(self, room_code: str, max_players: int = 4):
+    def __init__(self, room_code: str, max_players: int = 4, on_change: Optional[Callable[[str], None]] = None):
+        self._on_change = on_change
+        self.version = next(_room_versions)  # Bumped on lobby-visible changes
         self.room_code = room_code
         self.max_players = max_players
         self.players: Dict[str, Player] = {}
@@ -110,17 +128,49 @@ class GameRoom:
         self.created_at = time.time()
         self.final_test_start_time: Optional[float] = None
         self.final_test_duration = 120  # 120 seconds for final test
-        self._lock = threading.Lock()  # Lock for thread-safe operations
 
-    def add_player(self, socket_id: str, name: str) -> bool:
-        """Add player"""
-        if len(self.players) >= self.max_players:
-            return False
+    @property
+    def phase(self) -> GamePhase:
+        return self._phase
+
+    @phase.setter
+    def phase(self, value: GamePhase):
+        self._phase = value
+        if value != GamePhase.WAITING:
+            in_round = value in (GamePhase.SUBMITTING_FAKE, GamePhase.VOTING, GamePhase.SHOWING_RESULTS)
+            tracer.phase(self.room_code, value.value, self.current_round if in_round else None)
+        self.touch()
+
+    def touch(self):
+        """Mark room state as changed (invalidates cached room listings, notifies the lobby feed)"""
+        self.version = next(_room_versions)
+        if self._on_change is not None:
+            self._on_change(self.room_code)
+
+    @property
+    def human_count(self) -> int:
+        return sum(1 for player in self.players.values() if not player.is_bot)
+
+    @property
+    def is_available(self) -> bool:
+        """Joinable: waiting or game over, with a seat that is free or held by a bot"""
+        return (
+            self.phase in (GamePhase.WAITING, GamePhase.GAME_OVER) and
+            self.human_count < self.max_players
+        )
 
+    def add_player(self, socket_id: str, name: str) -> bool:
+        """Add player; a bot gives up its seat for a person"""
         # Assign colors cyclically: blue, red, orange, green
         colors = ["blue", "red", "orange", "green"]
         player_color = colors[len(self.players) % len(colors)]
 
+        if len(self.players) >= self.max_players:
+            bot_id = next((pid for pid, p in reversed(self.players.items()) if p.is_bot), None)
+            if bot_id is None or self.phase != GamePhase.WAITING:
+                return False
+            player_color = self.players.pop(bot_id).color
+
         is_host = len(self.players) == 0
         self.players[socket_id] = Player(
             socket_id=socket_id,
@@ -128,6 +178,7 @@ class GameRoom:
             is_host=is_host,
             color=player_color
         )
+        self.touch()
         return True
 
     def remove_player(self, socket_id: str):
@@ -136,20 +187,53 @@ class GameRoom:
             was_host = self.players[socket_id].is_host
             del self.players[socket_id]
 
-            # If host left, assign new host
+            # Bots only keep people company; the room empties with its last person
+            if not self.human_count:
+                self.players.clear()
+
+            # If host left, assign new host (never a bot)
             if was_host and self.players:
-                next_player = next(iter(self.players.values()))
+                next_player = next(p for p in self.players.values() if not p.is_bot)
                 next_player.is_host = True
+            self.touch()
+
+    def rebind_player(self, old_socket_id: str, new_socket_id: str) -> Optional[Player]:
+        """Move a player to a new socket id (session resume), keeping seat order and answers"""
+        if old_socket_id not in self.players or new_socket_id in self.players:
+            return None
+
+        self.players = {
+            (new_socket_id if sid == old_socket_id else sid): player
+            for sid, player in self.players.items()
+        }
+        player = self.players[new_socket_id]
+        player.socket_id = new_socket_id
+        player.is_connected = True
+
+        for round_ in self.rounds:
+            if old_socket_id in round_.fake_answers:
+                round_.fake_answers[new_socket_id] = round_.fake_answers.pop(old_socket_id)
+            if old_socket_id in round_.votes:
+                round_.votes[new_socket_id] = round_.votes.pop(old_socket_id)
+            for reactors in round_.reactions.values():
+                if old_socket_id in reactors:
+                    reactors[new_socket_id] = reactors.pop(old_socket_id)
+
+        self.touch()
+        return player
 
     def start_game(self, questions: List[Dict]):
         """Start game"""
-        if len(self.players) < 2:
+        if len(self.players) < 2 or not questions:
             return False
 
-        # Always select exactly max_rounds (10) questions
-        self.questions = random.sample(questions, min(self.max_rounds, len(questions)))
-        self.phase = GamePhase.SUBMITTING_FAKE
+        # Always select exactly max_rounds (10) questions; a pre-selected list keeps its order
+        if len(questions) > self.max_rounds:
+            questions = random.sample(questions, self.max_rounds)
+        self.questions = list(questions)
+        tracer.start_game(self.room_code, **{"game.players": len(self.players), "game.rounds": len(self.questions)})
         self.current_round = 0
+        self.phase = GamePhase.SUBMITTING_FAKE
         self._start_new_round()
         return True
 
@@ -180,56 +264,28 @@ class GameRoom:
 
     def submit_fake_answer(self, socket_id: str, fake_answer: str) -> bool:
         """Submit fake answer"""
-        with self._lock:  # Thread-safe to prevent duplicate answers
-            if self.phase != GamePhase.SUBMITTING_FAKE:
-                return False
-
-            if socket_id not in self.players:
-                return False
-
-            current_round = self.rounds[self.current_round]
-            normalized_answer = normalize_answer(fake_answer)
-
-            # If answer is empty (timeout penalty), accept it but don't add to options
-            if not normalized_answer:
-                submit_time = time.time()
-                time_taken = submit_time - current_round.start_time
-
-                player = self.players[socket_id]
-                player.submitted_answer = ""
-                player.submit_time = submit_time
-                player.score -= 100  # Penalty for not submitting
-
-                # Mark as submitted by adding empty string
-                current_round.fake_answers[socket_id] = ""
-
-                # If all players submitted, move to voting
-                if len(current_round.fake_answers) == len(self.players):
-                    self._prepare_voting()
-
-                return True
+        if self.phase != GamePhase.SUBMITTING_FAKE:
+            return False
 
-            # Normalize and check if answer is correct (prevent submitting correct answer)
-            if check_answer(fake_answer, current_round.correct_answer, current_round.acceptable_answers):
-                return False  # Cannot submit correct answer as fake
+        if socket_id not in self.players:
+            return False
 
-            # Check if answer already submitted by another player (exclude empty strings)
-            existing_answers = [normalize_answer(ans) for ans in current_round.fake_answers.values() if ans]
-            if normalized_answer in existing_answers:
-                return False  # Cannot submit duplicate answer
+        current_round = self.rounds[self.current_round]
+        normalized_answer = normalize_answer(fake_answer)
 
-            # Check time limit (20 seconds)
+        # If answer is empty (timeout penalty), accept it but don't add to options
+        if not normalized_answer:
             submit_time = time.time()
             time_taken = submit_time - current_round.start_time
 
-            current_round.fake_answers[socket_id] = normalized_answer
             player = self.players[socket_id]
-            player.submitted_answer = normalize_answer(fake_answer)
+            player.submitted_answer = ""
             player.submit_time = submit_time
+            player.score -= 100  # Penalty for not submitting
+            self.touch()
 
-            # Penalty for taking too long (more than 20 seconds)
-            if time_taken > 20:
-                player.score -= 100  # -100 points for timeout
+            # Mark as submitted by adding empty string
+            current_round.fake_answers[socket_id] = ""
 
             # If all players submitted, move to voting
             if len(current_round.fake_answers) == len(self.players):
@@ -237,6 +293,35 @@ class GameRoom:
 
             return True
 
+        # Normalize and check if answer is correct (prevent submitting correct answer)
+        if check_answer(fake_answer, current_round.correct_answer, current_round.acceptable_answers):
+            return False  # Cannot submit correct answer as fake
+
+        # Check if answer already submitted by another player (exclude empty strings)
+        existing_answers = [normalize_answer(ans) for ans in current_round.fake_answers.values() if ans]
+        if normalized_answer in existing_answers:
+            return False  # Cannot submit duplicate answer
+
+        # Check time limit (20 seconds)
+        submit_time = time.time()
+        time_taken = submit_time - current_round.start_time
+
+        current_round.fake_answers[socket_id] = normalized_answer
+        player = self.players[socket_id]
+        player.submitted_answer = normalize_answer(fake_answer)
+        player.submit_time = submit_time
+
+        # Penalty for taking too long (more than 20 seconds)
+        if time_taken > 20:
+            player.score -= 100  # -100 points for timeout
+            self.touch()
+
+        # If all players submitted, move to voting
+        if len(current_round.fake_answers) == len(self.players):
+            self._prepare_voting()
+
+        return True
+
     def _prepare_voting(self):
         """Prepare voting options"""
         current_round = self.rounds[self.current_round]
@@ -270,6 +355,7 @@ class GameRoom:
             player.voted_answer = ""
             player.vote_time = vote_time
             player.score -= 100  # Penalty for not voting
+            self.touch()
 
             # If all players voted, show results
             if len(current_round.votes) == len(self.players):
@@ -295,6 +381,7 @@ class GameRoom:
         # Penalty for taking too long (more than 10 seconds)
         if time_taken > 10:
             player.score -= 100  # -100 points for timeout
+            self.touch()
 
         # If all players voted, show results
         if len(current_round.votes) == len(self.players):
@@ -428,12 +515,46 @@ class GameRoom:
                     'name': p.name,
                     'score': p.score,
                     'is_host': p.is_host,
-                    'color': p.color
+                    'color': p.color,
+                    'is_bot': p.is_bot
                 }
                 for p in self.players.values()
             ]
         }
 
+    def snapshot_for(self, socket_id: str) -> Dict:
+        """Compact state for a resuming player: room state plus only what the current phase shows"""
+        player = self.players[socket_id]
+        snapshot = {
+            'room_state': self.to_dict(),
+            'is_host': player.is_host,
+        }
+
+        in_round = self.phase in (GamePhase.SUBMITTING_FAKE, GamePhase.VOTING, GamePhase.SHOWING_RESULTS)
+        if in_round and self.current_round < len(self.rounds):
+            current_round = self.rounds[self.current_round]
+            snapshot['question'] = {
+                'round': self.current_round + 1,
+                'total_rounds': self.max_rounds,
+                'text': current_round.question_text
+            }
+            snapshot['submitted'] = socket_id in current_round.fake_answers
+            snapshot['voted'] = socket_id in current_round.votes
+            if self.phase == GamePhase.VOTING:
+                snapshot['options'] = current_round.all_options
+
+        if self.phase in (GamePhase.SHOWING_RESULTS, GamePhase.GAME_OVER):
+            snapshot['leaderboard'] = self.get_leaderboard()
+
+        if self.phase == GamePhase.FINAL_TEST:
+            snapshot['final_questions'] = [
+                {'index': i, 'question_text': question['question_text']}
+                for i, question in enumerate(self.questions)
+            ]
+            snapshot['final_answers'] = player.final_answers
+
+        return snapshot
+
 
 class GameManager:
     """Manager for multiple fixed game rooms"""
@@ -450,11 +571,25 @@ class GameManager:
         {"code": "NEVAYI", "name": "Ali Şîr Nevâyî", "description": "Muhâkemetü'l-Lügateyn (Türkçenin Farsçadan üstünlüğünü savunan karşılaştırmalı dil eseri)"},
     ]
 
+    MAX_MATCH_ROOMS = 200  # Quick-play rooms kept at most
+
     def __init__(self):
+        # Called with a room code whenever that room's state changes
+        self.listeners: List[Callable[[str], None]] = []
+        self.room_info: Dict[str, Dict] = {info["code"]: info for info in self.FIXED_ROOMS}
+        self.lobby_codes = frozenset(self.room_info)  # Rooms the lobby lists (quick-play rooms are not)
+
         # Create 8 fixed rooms
         self.rooms: Dict[str, GameRoom] = {}
         for room_info in self.FIXED_ROOMS:
-            self.rooms[room_info["code"]] = GameRoom(room_info["code"], max_players=4)
+            self.rooms[room_info["code"]] = GameRoom(room_info["code"], max_players=4, on_change=self._room_changed)
+
+        # Quick-play rooms, created on demand and reused once empty (not listed in the lobby)
+        self.match_rooms: List[str] = []
+
+    def _room_changed(self, room_code: str):
+        for listener in self.listeners:
+            listener(room_code)
 
     def get_room(self, room_code: str = None) -> GameRoom:
         """Get a specific room by code, or the first room if not specified"""
@@ -463,16 +598,18 @@ class GameManager:
             return list(self.rooms.values())[0]
         return self.rooms.get(room_code)
 
+    @property
+    def version(self) -> int:
+        """Changes whenever any listed room's lobby-visible state changes"""
+        return max(self.rooms[room_code].version for room_code in self.lobby_codes)
+
     def get_all_rooms(self) -> List[Dict]:
         """Get all rooms with their status"""
         rooms_status = []
         for room_info in self.FIXED_ROOMS:
             room = self.rooms[room_info["code"]]
             # Room is available if: waiting phase OR game over with less than max players
-            is_available = (
-                (room.phase == GamePhase.WAITING and len(room.players) < room.max_players) or
-                (room.phase == GamePhase.GAME_OVER and len(room.players) < room.max_players)
-            )
+            is_available = room.is_available
 
             # Get current question text if in game
             current_question = None
@@ -489,7 +626,8 @@ class GameManager:
                     "score": player.score,
                     "is_host": player.is_host,
                     "is_connected": player.is_connected,
-                    "color": player.color
+                    "color": player.color,
+                    "is_bot": player.is_bot
                 })
 
             rooms_status.append({
@@ -506,10 +644,54 @@ class GameManager:
             })
         return rooms_status
 
+    def get_room_summary(self, room_code: str) -> Optional[Dict]:
+        """Lobby view of a room: counts and status only, no player details"""
+        room = self.rooms.get(room_code)
+        if room is None:
+            return None
+        info = self.room_info[room_code]
+        in_game = room.phase != GamePhase.WAITING
+        return {
+            "room_code": room_code,
+            "name": info["name"],
+            "description": info["description"],
+            "player_count": len(room.players),
+            "max_players": room.max_players,
+            "phase": room.phase.value,
+            "available": room.is_available,
+            "current_round": room.current_round if in_game else None,
+            "max_rounds": room.max_rounds if in_game else None,
+        }
+
+    def get_lobby_rooms(self) -> List[Dict]:
+        """Summaries of all fixed rooms, in display order"""
+        return [self.get_room_summary(info["code"]) for info in self.FIXED_ROOMS]
+
+    def acquire_match_room(self) -> Optional[GameRoom]:
+        """An empty waiting quick-play room, created if none is free; None at MAX_MATCH_ROOMS"""
+        for room_code in self.match_rooms:
+            room = self.rooms[room_code]
+            if room.phase == GamePhase.WAITING and not room.players:
+                return room
+        if len(self.match_rooms) >= self.MAX_MATCH_ROOMS:
+            return None
+
+        number = len(self.match_rooms) + 1
+        room_code = f"HIZLI_{number}"
+        self.room_info[room_code] = {
+            "code": room_code,
+            "name": f"Hızlı Oyun {number}",
+            "description": "Hızlı oyun eşleştirmesiyle açılan oda",
+        }
+        self.rooms[room_code] = GameRoom(room_code, max_players=4, on_change=self._room_changed)
+        self.match_rooms.append(room_code)
+        return self.rooms[room_code]
+
     def reset_room(self, room_code: str):
         """Reset a specific room for new game"""
         if room_code in self.rooms:
-            self.rooms[room_code] = GameRoom(room_code, max_players=4)
+            tracer.end_game(room_code)
+            self.rooms[room_code] = GameRoom(room_code, max_players=4, on_change=self._room_changed)
 
     def reset_room_keep_players(self, room_code: str) -> Optional[GameRoom]:
         """Reset room but keep the same players with their colors and host status"""
@@ -522,6 +704,8 @@ class GameManager:
         player_ids = list(room.players.keys())
         player_names = {pid: p.name for pid, p in room.players.items()}
         player_colors = {pid: p.color for pid, p in room.players.items()}
+        player_user_ids = {pid: p.user_id for pid, p in room.players.items()}
+        player_bot_skills = {pid: p.bot_skill for pid, p in room.players.items()}
         host_id = next((pid for pid, p in room.players.items() if p.is_host), None)
 
         # Reset the room
@@ -534,8 +718,11 @@ class GameManager:
                 socket_id=pid,
                 name=player_names[pid],
                 is_host=(pid == host_id),
-                color=player_colors[pid]
+                color=player_colors[pid],
+                user_id=player_user_ids[pid],
+                bot_skill=player_bot_skills[pid]
             )
+        room.touch()
 
         return room
 
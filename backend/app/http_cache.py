@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Version-invalidated response cache with ETag / 304 support"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+
+from .database import SessionLocal
+
+# Micro-cache lifetimes (seconds); versions invalidate sooner on local writes
+ROOMS_TTL = 1.0
+STATS_TTL = 5.0
+CATALOG_TTL = 30.0
+
+
+@dataclass
+class CacheEntry:
+    version: Hashable
+    etag: str
+    body: bytes
+    expires_at: float
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class ResponseCache:
+    """Caches serialized JSON bodies per URL until their version changes
+
+    A version is whatever identifies the data a response was built from: the
+    write counters of the tables it reads, or GameManager.version for rooms.
+    Entries also expire after a short TTL, which bounds staleness for writes
+    made outside this process. ETags hash the body, so a rebuild that yields
+    the same content still answers 304.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._table_versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def bump(self, *tables: str):
+        """Invalidate responses built from these tables"""
+        for table in tables:
+            self._table_versions[table] = self._table_versions.get(table, 0) + 1
+
+    def table_version(self, *tables: str) -> tuple:
+        return tuple(self._table_versions.get(table, 0) for table in tables)
+
+    def respond(self, request: Request, version: Hashable, build: Callable[[], Any], ttl: float) -> Response:
+        """Serve the cached body for this URL, rebuilding it if stale"""
+        key = str(request.url.include_query_params())
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version and now < entry.expires_at:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            body = json.dumps(
+                jsonable_encoder(build()), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+            entry = CacheEntry(version, etag, body, now + ttl)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def get_stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "table_versions": dict(self._table_versions),
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache()
+
+
+def _touched_tables(objects: Iterable) -> set:
+    return {obj.__table__.name for obj in objects if hasattr(obj, "__table__")}
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_writes(session, flush_context):
+    tables = session.info.setdefault("written_tables", set())
+    tables.update(_touched_tables(session.new))
+    tables.update(_touched_tables(session.dirty))
+    tables.update(_touched_tables(session.deleted))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_written_tables(session):
+    response_cache.bump(*session.info.pop("written_tables", ()))
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_written_tables(session, previous_transaction):
+    session.info.pop("written_tables", None)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Push-based lobby feed: room list on subscribe, throttled per-room deltas after"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Set
+
+from .emit_coalescer import EmitCoalescer
+from .game_manager import GameManager
+
+LOBBY_ROOM = "lobby"  # Socket.IO room of sockets watching the room list
+LOBBY_THROTTLE = 0.25  # At most one delta per room per window
+
+
+class LobbyFeed:
+    """Fans room changes out to lobby viewers
+
+    GameManager calls notify() on every room change; changes inside the
+    throttle window collapse into one delta carrying only the fields that
+    differ from what viewers last received.
+    """
+
+    def __init__(self, manager: GameManager, emit: Callable[[str, Dict], Awaitable[None]],
+                 window: float = LOBBY_THROTTLE):
+        self._manager = manager
+        self._emit = emit
+        self._coalescer = EmitCoalescer(self._send, window=window)
+        self._subscribers: Set[str] = set()
+        self._last_sent: Dict[str, Dict] = {}  # room_code -> summary viewers have
+        self.deltas_sent = 0
+        self.unchanged_skipped = 0
+
+    def subscribe(self, sid: str) -> List[Dict]:
+        """Register a viewer and return the full room list for it"""
+        self._subscribers.add(sid)
+        rooms = self._manager.get_lobby_rooms()
+        for summary in rooms:
+            # Deltas are computed against what the oldest viewers have; a newer
+            # snapshot just receives a few redundant (absolute) values
+            self._last_sent.setdefault(summary["room_code"], summary)
+        return rooms
+
+    def unsubscribe(self, sid: str):
+        self._subscribers.discard(sid)
+        if not self._subscribers:
+            self._last_sent.clear()
+
+    def notify(self, room_code: str):
+        """Room state changed; schedule a delta if anyone is watching and the lobby lists it"""
+        if not self._subscribers or room_code not in self._manager.lobby_codes:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop (scripts, benchmarks): nothing to push to
+        self._coalescer.schedule(room_code, "lobby_room_update", lambda: room_code)
+
+    async def _send(self, event: str, room_code: str, key: str):
+        summary = self._manager.get_room_summary(room_code)
+        if summary is None or not self._subscribers:
+            return
+        previous = self._last_sent.get(room_code, {})
+        changes = {k: v for k, v in summary.items() if previous.get(k) != v}
+        if not changes:
+            self.unchanged_skipped += 1
+            return
+        self._last_sent[room_code] = summary
+        self.deltas_sent += 1
+        await self._emit(event, {"room_code": room_code, "changes": changes})
+
+    def get_stats(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "deltas_sent": self.deltas_sent,
+            "unchanged_skipped": self.unchanged_skipped,
+            "coalescer": self._coalescer.get_stats(),
+        }
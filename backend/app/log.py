@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Structured, non-blocking logging: records are queued and written by a background thread"""
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, TextIO
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+FORMATS = ("text", "json")
+MAX_QUEUE = 10000  # Records waiting for the writer before new ones are dropped
+WRITE_BATCH = 500  # Records per write() call
+
+
+class StructuredLogger:
+    """Logger whose callers only build a dict and enqueue it
+
+    Formatting and the (possibly blocking) stdout write happen in a writer
+    thread, so a slow terminal or log collector never stalls the event
+    loop. When the queue is full records are dropped and counted instead of
+    waiting. A record is an event name, an optional message and fields;
+    records carrying a `sid` get the socket's room, user_id and phase from
+    the context provider. Per-event sample rates thin out high-volume
+    events. Level, format and sampling can be changed at runtime.
+    """
+
+    def __init__(self, level: str = "info", fmt: str = "text", stream: Optional[TextIO] = None,
+                 max_queue: int = MAX_QUEUE):
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._stream = stream
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.level = LEVELS["info"]
+        self.format = "text"
+        self.sample: Dict[str, float] = {}  # event -> fraction of records kept
+        self.configure(level=level, format=fmt)
+        # Called with (sid, room_code) on the caller's thread; returns extra fields
+        self.context_provider: Optional[Callable[[Optional[str], Optional[str]], Dict[str, Any]]] = None
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.errors = 0
+
+    def configure(self, level: Optional[str] = None, format: Optional[str] = None,
+                  sample: Optional[Dict[str, float]] = None) -> Dict:
+        """Change settings in place; returns the resulting configuration"""
+        if level is not None:
+            if level not in LEVELS:
+                raise ValueError(f"unknown level {level!r}")
+            self.level = LEVELS[level]
+        if format is not None:
+            if format not in FORMATS:
+                raise ValueError(f"unknown format {format!r}")
+            self.format = format
+        if sample is not None:
+            for event, rate in sample.items():
+                if not 0 <= rate <= 1:
+                    raise ValueError(f"sample rate for {event!r} must be between 0 and 1")
+            self.sample = {event: rate for event, rate in sample.items() if rate < 1}
+        return self.get_config()
+
+    def get_config(self) -> Dict:
+        level = next(name for name, value in LEVELS.items() if value == self.level)
+        return {"level": level, "format": self.format, "sample": dict(self.sample)}
+
+    def debug(self, event: str, message: str = "", **fields):
+        self._log("debug", event, message, fields)
+
+    def info(self, event: str, message: str = "", **fields):
+        self._log("info", event, message, fields)
+
+    def warning(self, event: str, message: str = "", **fields):
+        self._log("warning", event, message, fields)
+
+    def error(self, event: str, message: str = "", exc_info: bool = False, **fields):
+        if exc_info:
+            fields["traceback"] = traceback.format_exc()
+        self._log("error", event, message, fields)
+
+    def _log(self, level: str, event: str, message: str, fields: Dict[str, Any]):
+        if LEVELS[level] < self.level:
+            return
+        rate = self.sample.get(event)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out += 1
+            return
+
+        record = {"ts": time.time(), "level": level, "event": event, "msg": message}
+        if self.context_provider is not None and ("sid" in fields or "room" in fields):
+            try:
+                for key, value in self.context_provider(fields.get("sid"), fields.get("room")).items():
+                    if value is not None:
+                        record.setdefault(key, value)
+            except Exception:
+                self.errors += 1
+        record.update(fields)
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            lines = [self.render(record) for record in batch if record is not None]
+            if lines:
+                stream = self._stream or sys.stdout
+                try:
+                    stream.write("".join(lines))
+                    stream.flush()
+                    self.written += len(lines)
+                except Exception:
+                    self.errors += 1
+            if stop:
+                return
+
+    def render(self, record: Dict[str, Any]) -> str:
+        if self.format == "json":
+            stamp = datetime.fromtimestamp(record["ts"], timezone.utc).isoformat(timespec="milliseconds")
+            return json.dumps({**record, "ts": stamp}, ensure_ascii=False, default=str) + "\n"
+
+        stamp = datetime.fromtimestamp(record["ts"]).strftime("%H:%M:%S.%f")[:-3]
+        extras = " ".join(
+            f"{key}={value}" for key, value in record.items()
+            if key not in ("ts", "level", "event", "msg", "traceback")
+        )
+        line = f"{stamp} {record['level'].upper():<7} [{record['event'].upper()}] {record['msg']}"
+        if extras:
+            line += f"  {extras}"
+        line += "\n"
+        if "traceback" in record:
+            line += record["traceback"]
+        return line
+
+    def close(self, timeout: float = 2.0):
+        """Write out everything queued, then stop the writer thread"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        writer.join(timeout)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.get_config(),
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "errors": self.errors,
+        }
+
+
+def _from_env() -> StructuredLogger:
+    """Logger configured by LOG_LEVEL / LOG_FORMAT (any case); unknown values fall back to the default"""
+    settings, unknown = {}, []
+    for name, default, allowed in (("LOG_LEVEL", "info", LEVELS), ("LOG_FORMAT", "text", FORMATS)):
+        value = os.environ.get(name, default).strip().lower()
+        if value not in allowed:
+            unknown.append(f"{name}={value!r} is not one of {', '.join(allowed)}, using {default!r}")
+            value = default
+        settings[name] = value
+    logger = StructuredLogger(level=settings["LOG_LEVEL"], fmt=settings["LOG_FORMAT"])
+    for message in unknown:
+        logger.warning("startup", message)
+    return logger
+
+
+# Global logger instance (LOG_LEVEL / LOG_FORMAT set the initial configuration)
+log = _from_env()
@@ -1,14 +1,27 @@
 # -*- coding: utf-8 -*-
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Request, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
+import asyncio
+import os
+import secrets
+import threading
+import time
 from pydantic import BaseModel
 
 from .database import get_db, init_db
-from .models import Question, GameStats, QuestionStats, User, UserStats
+from .models import Question, GameStats, QuestionStats, QuestionDistractors
 from .websocket import socket_app
+from .question_selector import question_selector, refresh_loop
+from .seen_questions import seen_store
+from .distractors import distractor_index
+from .dedup import near_duplicate_index, rebuild_index
+from .http_cache import response_cache, ROOMS_TTL, STATS_TTL, CATALOG_TTL
+from .log import log
 
 # FastAPI uygulaması
 app = FastAPI(
@@ -49,6 +62,16 @@ class QuestionResponse(BaseModel):
         from_attributes = True
 
 
+class NearDuplicateMatch(BaseModel):
+    id: int
+    similarity: float
+    same_answer: bool
+
+
+class QuestionWriteResponse(QuestionResponse):
+    near_duplicates: List[NearDuplicateMatch] = []
+
+
 class GameStatsResponse(BaseModel):
     id: int
     total_players: int
@@ -85,6 +108,7 @@ async def health_check():
 
 @app.get("/api/questions")
 async def get_questions(
+    request: Request,
     skip: int = 0,
     limit: int = None,
     category: str = None,
@@ -92,52 +116,116 @@ async def get_questions(
     db: Session = Depends(get_db)
 ):
     """Tüm soruları listele (istatistiklerle birlikte)"""
-    query = db.query(Question)
-
-    if not include_inactive:
-        query = query.filter(Question.is_active == True)
-
-    if category:
-        query = query.filter(Question.category == category)
-
-    query = query.offset(skip)
-    if limit:
-        query = query.limit(limit)
-
-    questions = query.all()
-
-    # Add statistics to each question
-    result = []
-    for q in questions:
-        q_dict = {
-            'id': q.id,
-            'question_text': q.question_text,
-            'correct_answer': q.correct_answer,
-            'acceptable_answers': q.acceptable_answers,
-            'category': q.category,
-            'difficulty': q.difficulty,
-            'is_active': q.is_active,
-            'stats': None
-        }
-
-        # Get stats for this question
-        stats = db.query(QuestionStats).filter(
-            QuestionStats.question_id == q.id
-        ).first()
-
-        if stats:
-            q_dict['stats'] = {
-                'times_asked': stats.times_asked,
-                'times_correct': stats.times_correct,
-                'times_wrong': stats.times_wrong,
-                'total_players_seen': stats.total_players_seen,
-                'games_used': stats.games_used,
-                'success_rate': (stats.times_correct / stats.times_asked * 100) if stats.times_asked > 0 else 0
+    def build():
+        query = db.query(Question)
+
+        if not include_inactive:
+            query = query.filter(Question.is_active == True)
+
+        if category:
+            query = query.filter(Question.category == category)
+
+        query = query.offset(skip)
+        if limit:
+            query = query.limit(limit)
+
+        questions = query.all()
+
+        # Add statistics to each question
+        result = []
+        for q in questions:
+            q_dict = {
+                'id': q.id,
+                'question_text': q.question_text,
+                'correct_answer': q.correct_answer,
+                'acceptable_answers': q.acceptable_answers,
+                'category': q.category,
+                'difficulty': q.difficulty,
+                'is_active': q.is_active,
+                'stats': None
             }
 
-        result.append(q_dict)
+            # Get stats for this question
+            stats = db.query(QuestionStats).filter(
+                QuestionStats.question_id == q.id
+            ).first()
+
+            if stats:
+                q_dict['stats'] = {
+                    'times_asked': stats.times_asked,
+                    'times_correct': stats.times_correct,
+                    'times_wrong': stats.times_wrong,
+                    'total_players_seen': stats.total_players_seen,
+                    'games_used': stats.games_used,
+                    'success_rate': (stats.times_correct / stats.times_asked * 100) if stats.times_asked > 0 else 0
+                }
+
+            result.append(q_dict)
+
+        return result
+
+    version = response_cache.table_version("questions", "question_stats")
+    return response_cache.respond(request, version, build, ttl=STATS_TTL)
+
+
+@app.get("/api/questions/search")
+async def search_questions(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    category: str = None,
+    include_inactive: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Soru bankasında tam metin arama (FTS5, sıralı ve sayfalı)"""
+    from .search import search_questions as run_search
+
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    return run_search(db, q, limit=limit, offset=offset, category=category, include_inactive=include_inactive)
+
+
+@app.post("/api/questions/import")
+async def import_questions(file: UploadFile = File(...), format: str = None):
+    """Toplu soru içe aktarma (CSV veya JSONL, satır satır işlenir)"""
+    from .question_io import detect_format, import_questions as run_import
 
-    return result
+    fmt = detect_format(file.filename, format)
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Dosya formatı csv veya jsonl olmalı")
+
+    # Parse + insert runs in a worker thread so games on the event loop keep going
+    summary = await run_in_threadpool(run_import, file.file, fmt)
+
+    if summary["inserted"]:
+        response_cache.bump("questions")  # Core inserts bypass the session hooks
+        question_selector.swap(await run_in_threadpool(question_selector.build))
+
+    return summary
+
+
+@app.get("/api/questions/export")
+async def export_questions(format: str = "jsonl", include_inactive: bool = True):
+    """Soru bankasını akış halinde dışa aktar (CSV veya JSONL)"""
+    from .question_io import detect_format, iter_export
+
+    fmt = detect_format(None, format)
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Format csv veya jsonl olmalı")
+
+    return StreamingResponse(
+        iter_export(fmt, include_inactive=include_inactive),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="questions.{fmt}"'}
+    )
+
+
+@app.get("/api/questions/duplicates")
+async def get_duplicate_groups():
+    """Soru bankasındaki benzer (neredeyse aynı) soru gruplarını listele"""
+    if not near_duplicate_index.ready:
+        raise HTTPException(status_code=503, detail="Benzer soru indeksi henüz hazır değil")
+    return await run_in_threadpool(near_duplicate_index.find_groups)
 
 
 @app.get("/api/questions/{question_id}", response_model=QuestionResponse)
@@ -151,17 +239,27 @@ async def get_question(question_id: int, db: Session = Depends(get_db)):
     return question
 
 
-@app.post("/api/questions", response_model=QuestionResponse, status_code=201)
+def _with_near_duplicates(db_question: Question) -> QuestionWriteResponse:
+    """Soruyu benzerlik indeksine ekle, benzer soruları yanıtta işaretle"""
+    matches = near_duplicate_index.add(db_question.id, db_question.question_text, db_question.correct_answer)
+    return QuestionWriteResponse(
+        **QuestionResponse.model_validate(db_question).model_dump(),
+        near_duplicates=matches
+    )
+
+
+@app.post("/api/questions", response_model=QuestionWriteResponse, status_code=201)
 async def create_question(question: QuestionCreate, db: Session = Depends(get_db)):
     """Yeni soru oluştur"""
     db_question = Question(**question.model_dump())
     db.add(db_question)
     db.commit()
     db.refresh(db_question)
-    return db_question
+    question_selector.upsert(db_question)
+    return _with_near_duplicates(db_question)
 
 
-@app.put("/api/questions/{question_id}", response_model=QuestionResponse)
+@app.put("/api/questions/{question_id}", response_model=QuestionWriteResponse)
 async def update_question(
     question_id: int,
     question: QuestionCreate,
@@ -178,7 +276,8 @@ async def update_question(
 
     db.commit()
     db.refresh(db_question)
-    return db_question
+    question_selector.upsert(db_question)
+    return _with_near_duplicates(db_question)
 
 
 @app.patch("/api/questions/{question_id}/toggle")
@@ -192,6 +291,10 @@ async def toggle_question_active(question_id: int, db: Session = Depends(get_db)
     db_question.is_active = not db_question.is_active
     db.commit()
     db.refresh(db_question)
+    question_selector.upsert(
+        db_question,
+        db.query(QuestionStats).filter(QuestionStats.question_id == question_id).first()
+    )
 
     return {
         "id": db_question.id,
@@ -212,79 +315,115 @@ async def delete_question(question_id: int, db: Session = Depends(get_db)):
     db.query(QuestionStats).filter(
         QuestionStats.question_id == question_id
     ).delete()
+    db.query(QuestionDistractors).filter(
+        QuestionDistractors.question_id == question_id
+    ).delete()
 
     db.delete(db_question)
     db.commit()
+    question_selector.remove(question_id)
+    near_duplicate_index.remove(question_id)
+    distractor_index.forget(question_id)
     return {"message": "Soru kalıcı olarak silindi", "id": question_id}
 
 
 @app.get("/api/categories")
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(request: Request, db: Session = Depends(get_db)):
     """Tüm kategorileri listele"""
-    categories = db.query(Question.category).distinct().all()
-    return [cat[0] for cat in categories if cat[0]]
+    def build():
+        categories = db.query(Question.category).distinct().all()
+        return [cat[0] for cat in categories if cat[0]]
+
+    return response_cache.respond(request, response_cache.table_version("questions"), build, ttl=CATALOG_TTL)
 
 
 @app.get("/api/rooms")
-async def get_rooms():
+async def get_rooms(request: Request):
     """Tüm odaları listele"""
     from .game_manager import game_manager
-    return game_manager.get_all_rooms()
+    return response_cache.respond(request, game_manager.version, game_manager.get_all_rooms, ttl=ROOMS_TTL)
 
 
 @app.post("/api/rooms/{room_code}/reset")
 async def reset_room(room_code: str):
     """Admin: Odayı zorla sıfırla (tüm oyuncuları çıkar ve odayı temizle)"""
     from .game_manager import game_manager
-    from .websocket import sio, socket_rooms, cancel_all_room_tasks
+    from .websocket import sio, socket_rooms, cancel_all_room_tasks, room_actors
 
     room = game_manager.get_room(room_code)
     if not room:
         raise HTTPException(status_code=404, detail="Oda bulunamadı")
 
-    # Asılı task'ları iptal et
-    cancel_all_room_tasks(room_code)
+    async def reset():
+        # Asılı task'ları iptal et
+        cancel_all_room_tasks(room_code)
+
+        # Socket tracking'den oyuncuları temizle
+        players_to_remove = [sid for sid, code in socket_rooms.items() if code == room_code]
+        for player_sid in players_to_remove:
+            await sio.leave_room(player_sid, room_code)
+            del socket_rooms[player_sid]
 
-    # Socket tracking'den oyuncuları temizle
-    players_to_remove = [sid for sid, code in socket_rooms.items() if code == room_code]
-    for player_sid in players_to_remove:
-        await sio.leave_room(player_sid, room_code)
-        del socket_rooms[player_sid]
+        # Odadaki oyunculara bildir
+        await sio.emit('room_reset', {
+            'message': 'Oda admin tarafından sıfırlandı. Ana sayfaya yönlendiriliyorsunuz...'
+        }, room=room_code)
 
-    # Odadaki oyunculara bildir
-    await sio.emit('room_reset', {
-        'message': 'Oda admin tarafından sıfırlandı. Ana sayfaya yönlendiriliyorsunuz...'
-    }, room=room_code)
+        # Odayı sıfırla
+        game_manager.reset_room(room_code)
 
-    # Odayı sıfırla
-    game_manager.reset_room(room_code)
+    # Oyun akışıyla çakışmasın diye odanın komut kuyruğunda çalışır
+    await room_actors.call(room_code, reset)
 
     return {"message": "Oda sıfırlandı", "room_code": room_code}
 
 
 @app.get("/api/users")
-async def get_users(db: Session = Depends(get_db)):
-    """Tüm kullanıcıları listele (Admin için)"""
-    users = db.query(User).join(UserStats).order_by(User.user_id.desc()).all()
-
-    result = []
-    for user in users:
-        result.append({
-            'user_id': user.user_id,
-            'username': user.username,
-            'created_at': user.created_at.isoformat() if user.created_at else None,
-            'last_login': user.last_login.isoformat() if user.last_login else None,
-            'stats': {
-                'total_games_played': user.stats.total_games_played,
-                'total_games_won': user.stats.total_games_won,
-                'total_score': user.stats.total_score,
-                'highest_score': user.stats.highest_score,
-                'total_correct_answers': user.stats.total_correct_answers,
-                'total_questions_answered': user.stats.total_questions_answered
-            } if user.stats else None
-        })
-
-    return result
+async def get_users(
+    request: Request,
+    limit: int = 50,
+    sort: str = "user_id",
+    order: str = "desc",
+    cursor: str = None,
+    q: str = None,
+    format: str = "json",
+    include_total: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Kullanıcıları sayfalı listele (Admin için)
+
+    Sıralama herhangi bir istatistik sütununa göre yapılabilir; sonraki sayfa
+    için yanıttaki next_cursor gönderilir. format=ndjson tüm listeyi akış
+    halinde döndürür.
+    """
+    from .user_list import SORT_COLUMNS, MAX_PAGE_SIZE, InvalidCursor, count_users, list_users, iter_users_ndjson
+
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort şunlardan biri olmalı: {', '.join(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order asc veya desc olmalı")
+
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_users_ndjson(sort=sort, order=order, prefix=q),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="users.ndjson"'}
+        )
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format json veya ndjson olmalı")
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    def build():
+        try:
+            page = list_users(db, limit=limit, sort=sort, order=order, cursor=cursor, prefix=q)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if include_total:
+            page['total'] = count_users(db, prefix=q)
+        return page
+
+    return response_cache.respond(request, response_cache.table_version("users", "user_stats"), build, ttl=STATS_TTL)
 
 
 # Socket.IO'yu FastAPI'ye mount et
@@ -293,21 +432,179 @@ app.mount("/socket.io", socket_app)
 
 # Başlangıçta veritabanını initialize et
 @app.get("/api/stats", response_model=GameStatsResponse)
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(request: Request, db: Session = Depends(get_db)):
     """İstatistikleri getir"""
-    stats = db.query(GameStats).first()
-    if not stats:
-        # İlk kez çağrılıyorsa boş stats oluştur
-        stats = GameStats()
-        db.add(stats)
-        db.commit()
-        db.refresh(stats)
-    return stats
+    def build():
+        stats = db.query(GameStats).first()
+        if not stats:
+            # İlk kez çağrılıyorsa boş stats oluştur
+            stats = GameStats()
+            db.add(stats)
+            db.commit()
+            db.refresh(stats)
+        return GameStatsResponse.model_validate(stats)
+
+    return response_cache.respond(request, response_cache.table_version("game_stats"), build, ttl=STATS_TTL)
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Sunucu içi sayaçlar (rate limit vb.)"""
+    from .rate_limit import rate_limiter
+    from .bots import bot_players
+    from .websocket import progress_coalescer, lobby_feed, room_actors, spectator_feed, matchmaker
+    from .sessions import session_table
+    from .event_log import event_logs
+    from .auth import identity_cache
+    from .user_ids import user_id_allocator
+    from .write_behind import write_behind
+    from .profiler import profiler
+    from .tracing import tracer
+    return {
+        "rate_limits": rate_limiter.get_stats(),
+        "progress_coalescer": progress_coalescer.get_stats(),
+        "question_selector": question_selector.get_stats(),
+        "seen_questions": seen_store.get_stats(),
+        "near_duplicates": near_duplicate_index.get_stats(),
+        "distractors": distractor_index.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "lobby_feed": lobby_feed.get_stats(),
+        "spectators": spectator_feed.get_stats(),
+        "matchmaking": matchmaker.get_stats(),
+        "bots": bot_players.get_stats(),
+        "sessions": session_table.get_stats(),
+        "event_log": event_logs.get_stats(),
+        "identity_cache": identity_cache.get_stats(),
+        "user_ids": user_id_allocator.get_stats(),
+        "write_behind": write_behind.get_stats(),
+        "room_mailboxes": room_actors.get_stats(),
+        "profiler": profiler.get_stats(),
+        "logging": log.get_stats(),
+        "tracing": tracer.get_stats()
+    }
+
+
+# Yönetici uç noktaları için paylaşılan anahtar; tanımlı değilse bu uç noktalar kapalıdır
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """X-Admin-Token başlığını ADMIN_TOKEN ile karşılaştır"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Yönetici uç noktaları kapalı (ADMIN_TOKEN tanımlı değil)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Geçersiz yönetici anahtarı")
+
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    all_threads: bool = False,
+    format: str = "collapsed"
+):
+    """Admin: Bu worker'ın örneklemeli profilini çıkar
+
+    format=collapsed: flamegraph.pl / speedscope ile açılabilen collapsed stack dosyası
+    format=summary: handler ve oda görevi başına örnek sayıları (JSON)
+    Birden fazla worker varsa isteği hangi worker aldıysa o profillenir (pid / X-Worker-Pid).
+    """
+    from .profiler import profiler, ProfileBusy, MAX_DURATION, collapse, group_totals
+    from .websocket import profile_handler_codes, profile_task_label
+
+    if not 0 < seconds <= MAX_DURATION:
+        raise HTTPException(status_code=422, detail=f"seconds 0 ile {MAX_DURATION:g} arasında olmalı")
+    if format not in ("collapsed", "summary"):
+        raise HTTPException(status_code=422, detail="format 'collapsed' veya 'summary' olmalı")
+
+    # Örnekleme ayrı bir thread'de çalışır; event loop yalnızca sonucu bekler
+    try:
+        stacks = await asyncio.to_thread(
+            profiler.run, asyncio.get_running_loop(), threading.get_ident(), seconds,
+            interval_ms / 1000, profile_handler_codes(), profile_task_label, all_threads
+        )
+    except ProfileBusy:
+        raise HTTPException(status_code=409, detail="Bu worker'da zaten bir profil çalışıyor")
+
+    if format == "summary":
+        return {
+            "pid": os.getpid(),
+            "seconds": round(profiler.last_duration, 2),
+            "samples": profiler.last_samples,
+            "overhead_ms": round(profiler.last_overhead_ms, 2),
+            "groups": group_totals(stacks)
+        }
+    filename = f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return PlainTextResponse(collapse(stacks), headers={
+        "X-Worker-Pid": str(os.getpid()),
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    })
+
+
+class LoggingConfig(BaseModel):
+    level: str | None = None
+    format: str | None = None
+    sample: Dict[str, float] | None = None
+
+
+@app.get("/api/admin/logging", dependencies=[Depends(require_admin)])
+async def get_logging_config():
+    """Admin: Bu worker'ın log ayarları"""
+    return log.get_config()
+
+
+@app.put("/api/admin/logging", dependencies=[Depends(require_admin)])
+async def update_logging_config(config: LoggingConfig):
+    """Admin: Log seviyesi, formatı ve olay başına örnekleme oranını yeniden başlatmadan değiştir
+
+    sample: {"olay": oran}, ör. {"join": 0.1} join kayıtlarının %10'unu yazar; 1 örneklemeyi kaldırır.
+    Ayar yalnızca isteği alan worker'da geçerlidir.
+    """
+    try:
+        return log.configure(level=config.level, format=config.format, sample=config.sample)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/api/admin/ratings/recompute", dependencies=[Depends(require_admin)])
+async def recompute_player_ratings():
+    """Admin: Tüm oyuncu puanlamalarını game_results tablosundan baştan hesapla
+
+    Tek geçişte akış halinde okur; çalışırken biten oyunlar için tekrar çalıştırılmalıdır.
+    """
+    from .rating import recompute_ratings
+    return await run_in_threadpool(recompute_ratings)
+
+
+@app.post("/api/admin/questions/calibrate", dependencies=[Depends(require_admin)])
+async def calibrate_questions(full: bool = False):
+    """Admin: Soru zorluklarını oyun istatistiklerinden yeniden hesapla
+
+    Varsayılan olarak yalnızca istatistikleri son çalıştırmadan beri değişen sorular yazılır;
+    full=true tüm bankayı yeniden yazar.
+    """
+    from .calibration import calibrate_difficulty
+
+    summary = await run_in_threadpool(calibrate_difficulty, full)
+    if summary["relabelled"] or summary["updated"]:
+        question_selector.swap(await run_in_threadpool(question_selector.build))
+    return summary
+
+
+@app.get("/api/admin/questions/{question_id}/distractors", dependencies=[Depends(require_admin)])
+async def get_question_distractors(question_id: int, limit: int = 5):
+    """Admin: Sorunun en çok oy çeken sahte cevapları (oyun sonlarında kaydedilir)"""
+    if not 1 <= limit <= distractor_index.top_k:
+        raise HTTPException(status_code=422, detail=f"limit 1 ile {distractor_index.top_k} arasında olmalı")
+    return {
+        "question_id": question_id,
+        "distractors": [d._asdict() for d in distractor_index.top(question_id, limit)]
+    }
 
 
 @app.on_event("startup")
 async def startup_event():
-    print("LugaToz sunucusu baslatiliyor...")
+    log.info("startup", "LugaToz sunucusu baslatiliyor...")
     init_db()
     # Istatistik kaydi olustur
     from .database import SessionLocal
@@ -318,9 +615,30 @@ async def startup_event():
             stats = GameStats()
             db.add(stats)
             db.commit()
+
+        # Soru katalogunu belleğe yükle (oyun başlatırken DB'ye gidilmez)
+        question_selector.load(db)
+        # Oyuncuların yazdığı sahte cevapların en iknaedicileri
+        distractor_index.load(db)
     finally:
         db.close()
-    print("Sunucu hazir!")
+    asyncio.create_task(refresh_loop(question_selector))
+    # Benzer soru indeksi arka planda kurulur (büyük bankalarda birkaç saniye sürer)
+    asyncio.create_task(run_in_threadpool(rebuild_index))
+    # Son giris zamanlari gibi dusuk oncelikli yazmalar toplu yazilir
+    from .write_behind import write_behind, flush_loop
+    asyncio.create_task(flush_loop(write_behind))
+    log.info("startup", "Sunucu hazir!")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Bekleyen toplu yazmalari kaybetme
+    from .write_behind import write_behind
+    write_behind.flush()
+    from .tracing import tracer
+    tracer.shutdown()
+    log.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Quick-play matchmaking: waiting players are grouped into rooms in periodic batches"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+MATCH_INTERVAL = float(os.environ.get("MATCHMAKING_INTERVAL", "1.0"))  # Seconds between matching passes
+# After this long a player is matched with whoever is waiting, whatever their skill
+MATCH_MAX_WAIT = float(os.environ.get("MATCHMAKING_MAX_WAIT", "20"))
+GROUP_SIZE = 4  # Players per room (GameRoom.max_players)
+MIN_GROUP = 2  # Fewest players a room can start a game with
+SKILL_BUCKET = 5.0  # Width of a skill bracket (rating mu, see rating.py)
+WAIT_SAMPLES = 1000  # Recent time-to-match samples kept for percentiles
+
+
+@dataclass
+class Ticket:
+    """A player waiting for a match"""
+    sid: str
+    name: str
+    user_id: Optional[int]
+    skill: Optional[float]
+    bucket: Optional[int]  # None: guests and players without rated games
+    enqueued_at: float
+    seq: int
+    active: bool = True
+
+
+HeapEntry = Tuple[float, int, Ticket]
+
+
+class MatchmakingQueue:
+    """Skill-bracketed FIFO queue of quick-play tickets
+
+    Every ticket sits in two heaps ordered by enqueue time: the global one
+    and its skill bracket's. Enqueue and each ticket popped into a match
+    are O(log n); cancel only flags the ticket, and stale heap entries are
+    skipped when popped or dropped by an occasional O(n) rebuild, so
+    leaving the queue is O(1) amortized. Each pass first fills rooms from
+    brackets that have a full group, then matches tickets older than
+    max_wait oldest-first across brackets, down to MIN_GROUP players.
+    """
+
+    def __init__(self, on_match: Callable[[List[Ticket]], Awaitable[bool]],
+                 interval: float = MATCH_INTERVAL, max_wait: float = MATCH_MAX_WAIT,
+                 group_size: int = GROUP_SIZE, min_group: int = MIN_GROUP,
+                 bucket_width: float = SKILL_BUCKET, clock: Callable[[], float] = time.monotonic):
+        self._on_match = on_match  # Seats a group; False puts it back in the queue
+        self.interval = interval
+        self.max_wait = max_wait
+        self.group_size = group_size
+        self.min_group = min_group
+        self.bucket_width = bucket_width
+        self._clock = clock
+        self._seq = itertools.count()
+        self._tickets: Dict[str, Ticket] = {}  # sid -> waiting ticket
+        self._by_age: List[HeapEntry] = []
+        self._buckets: Dict[Optional[int], List[HeapEntry]] = {}
+        self._bucket_live: Dict[Optional[int], int] = {}
+        self._stale = 0  # Heap entries of tickets no longer waiting
+        self._task: Optional[asyncio.Task] = None
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.enqueued = 0
+        self.cancelled = 0
+        self.matched_players = 0
+        self.matches = 0
+        self.overdue_matches = 0
+        self.requeued = 0
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._tickets
+
+    def bucket_of(self, skill: Optional[float]) -> Optional[int]:
+        return None if skill is None else int(skill // self.bucket_width)
+
+    def enqueue(self, sid: str, name: str, user_id: Optional[int] = None,
+                skill: Optional[float] = None) -> Ticket:
+        """Add (or replace) the socket's ticket and make sure the matcher runs"""
+        if self.cancel(sid):
+            self.cancelled -= 1  # Replaced, not given up
+        ticket = Ticket(sid, name, user_id, skill, self.bucket_of(skill), self._clock(), next(self._seq))
+        self._push(ticket)
+        self.enqueued += 1
+        self._ensure_running()
+        return ticket
+
+    def cancel(self, sid: str) -> bool:
+        """Drop the socket's ticket; True if it was waiting"""
+        ticket = self._tickets.pop(sid, None)
+        if ticket is None:
+            return False
+        self._retire(ticket, stale_entries=2)
+        self.cancelled += 1
+        self._maybe_compact()
+        return True
+
+    def requeue(self, tickets: List[Ticket]):
+        """Put a group that could not be seated back, keeping its place in line"""
+        self.matches -= 1
+        self.matched_players -= len(tickets)
+        for ticket in tickets:
+            if ticket.sid in self._tickets:
+                continue  # Queued again in the meantime
+            # A fresh object: the retired one may still have a stale heap entry
+            self._push(replace(ticket, active=True))
+            self.requeued += 1
+        if tickets:
+            self._ensure_running()
+
+    def _push(self, ticket: Ticket):
+        entry = (ticket.enqueued_at, ticket.seq, ticket)
+        self._tickets[ticket.sid] = ticket
+        heapq.heappush(self._by_age, entry)
+        heapq.heappush(self._buckets.setdefault(ticket.bucket, []), entry)
+        self._bucket_live[ticket.bucket] = self._bucket_live.get(ticket.bucket, 0) + 1
+
+    def _retire(self, ticket: Ticket, stale_entries: int):
+        ticket.active = False
+        self._stale += stale_entries
+        live = self._bucket_live[ticket.bucket] - 1
+        if live:
+            self._bucket_live[ticket.bucket] = live
+        else:
+            del self._bucket_live[ticket.bucket]
+
+    def _pop_live(self, heap: List[HeapEntry]) -> Optional[Ticket]:
+        while heap:
+            ticket = heapq.heappop(heap)[2]
+            if ticket.active:
+                del self._tickets[ticket.sid]
+                self._retire(ticket, stale_entries=1)  # Its entry in the other heap
+                return ticket
+            self._stale -= 1
+        return None
+
+    def _peek_live(self, heap: List[HeapEntry]) -> Optional[Ticket]:
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+            self._stale -= 1
+        return heap[0][2] if heap else None
+
+    def _maybe_compact(self):
+        if self._stale <= max(64, 2 * len(self._tickets)):
+            return
+        self._by_age = [entry for entry in self._by_age if entry[2].active]
+        heapq.heapify(self._by_age)
+        for key in list(self._buckets):
+            heap = [entry for entry in self._buckets[key] if entry[2].active]
+            if heap:
+                heapq.heapify(heap)
+                self._buckets[key] = heap
+            else:
+                del self._buckets[key]
+        self._stale = 0
+
+    def take_matches(self, now: Optional[float] = None) -> List[List[Ticket]]:
+        """One matching pass: groups to seat, removed from the queue"""
+        now = self._clock() if now is None else now
+        groups = []
+        for key in list(self._bucket_live):
+            while self._bucket_live.get(key, 0) >= self.group_size:
+                groups.append([self._pop_live(self._buckets[key]) for _ in range(self.group_size)])
+
+        while len(self._tickets) >= self.min_group:
+            oldest = self._peek_live(self._by_age)
+            if oldest is None or now - oldest.enqueued_at < self.max_wait:
+                break
+            size = min(self.group_size, len(self._tickets))
+            groups.append([self._pop_live(self._by_age) for _ in range(size)])
+            self.overdue_matches += 1
+
+        self._maybe_compact()
+        for group in groups:
+            self.matches += 1
+            self.matched_players += len(group)
+            self._waits.extend(now - ticket.enqueued_at for ticket in group)
+        return groups
+
+    def _ensure_running(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop (scripts, benchmarks): call take_matches() directly
+        self._task = asyncio.create_task(self._run(), name="matchmaker")
+
+    async def _run(self):
+        """Matching passes every interval while anyone is waiting"""
+        while self._tickets:
+            await asyncio.sleep(self.interval)
+            groups = self.take_matches()
+            for i, group in enumerate(groups):
+                if not await self._on_match(group):
+                    # No room for them now; try again next pass
+                    for unseated in groups[i:]:
+                        self.requeue(unseated)
+                    break
+
+    def get_stats(self) -> Dict:
+        waits = sorted(self._waits)
+        now = self._clock()
+        oldest = self._peek_live(self._by_age)
+        return {
+            "queue_length": len(self._tickets),
+            "brackets": {str(key): live for key, live in self._bucket_live.items()},
+            "oldest_wait_seconds": round(now - oldest.enqueued_at, 3) if oldest else 0,
+            "max_wait_seconds": self.max_wait,
+            "enqueued": self.enqueued,
+            "cancelled": self.cancelled,
+            "requeued": self.requeued,
+            "matches": self.matches,
+            "overdue_matches": self.overdue_matches,
+            "matched_players": self.matched_players,
+            "time_to_match": {
+                "samples": len(waits),
+                "avg_seconds": round(sum(waits) / len(waits), 3) if waits else 0,
+                "p50_seconds": round(waits[len(waits) // 2], 3) if waits else 0,
+                "p95_seconds": round(waits[int(len(waits) * 0.95)], 3) if waits else 0,
+                "max_seconds": round(waits[-1], 3) if waits else 0,
+            },
+        }
+
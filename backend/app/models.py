@@ -1,18 +1,14 @@
 # -*- coding: utf-8 -*-
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, String, Boolean, ForeignKey, Text, DateTime, UniqueConstraint, LargeBinary, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy import event
 from datetime import datetime
-import random
+from .game_manager import question_fingerprint
 
 Base = declarative_base()
 
 
-def generate_user_id():
-    """Generate a unique 5-digit user ID"""
-    return random.randint(10000, 99999)
-
-
 class Question(Base):
     """Question model"""
     __tablename__ = "questions"
@@ -24,11 +20,20 @@ class Question(Base):
     category = Column(String(100), nullable=True)
     difficulty = Column(String(20), default="medium")  # easy, medium, hard
     is_active = Column(Boolean, default=True)
+    text_hash = Column(String(40), nullable=True, index=True)  # Normalize edilmiş metnin hash'i (tekrar kontrolü)
 
     def __repr__(self):
         return f"<Question(id={self.id}, text='{self.question_text[:50]}...')>"
 
 
+@event.listens_for(Question, "before_insert")
+@event.listens_for(Question, "before_update")
+def _set_question_text_hash(mapper, connection, target):
+    """Keep text_hash in sync with question_text"""
+    if target.question_text:
+        target.text_hash = question_fingerprint(target.question_text)
+
+
 class GameSession(Base):
     """Game session model"""
     __tablename__ = "game_sessions"
@@ -92,6 +97,14 @@ class QuestionStats(Base):
     total_players_seen = Column(Integer, default=0)  # Kaç oyuncu gördü
     games_used = Column(Integer, default=0)  # Kaç oyunda kullanıldı
     last_used = Column(DateTime, nullable=True)  # Son kullanım tarihi
+    times_voted = Column(Integer, default=0)  # Turlarda verilen oy sayısı
+    times_fooled = Column(Integer, default=0)  # Sahte cevaba giden oy sayısı
+    updated_at = Column(DateTime, nullable=True)  # Sayaçların son değiştiği an
+
+    # Written by calibration.calibrate_difficulty
+    difficulty_score = Column(Float, nullable=True)  # Hata oranının logiti (yüksek = zor)
+    deception_rate = Column(Float, nullable=True)  # Oyların sahte cevaplara gitme oranı
+    calibrated_at = Column(DateTime, nullable=True)
 
     def __repr__(self):
         return f"<QuestionStats(question_id={self.question_id}, asked={self.times_asked})>"
@@ -102,7 +115,7 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, unique=True, nullable=False, index=True)  # 5-digit unique ID
+    user_id = Column(Integer, unique=True, nullable=False, index=True)  # Public ID from user_ids.UserIdAllocator
     username = Column(String(50), unique=True, nullable=False, index=True)  # Unique username
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -114,6 +127,24 @@ class User(Base):
         return f"<User(user_id={self.user_id}, username='{self.username}')>"
 
 
+# Admin listing: keyset sort keys and case/diacritic-insensitive username prefix search
+# (tr_fold is registered on every connection, see database._on_connect)
+Index("ix_users_created_at_user_id", User.created_at, User.user_id)
+Index("ix_users_last_login_user_id", User.last_login, User.user_id)
+Index("ix_users_username_fold", func.tr_fold(User.username))
+# Usernames are unique ignoring case (Turkish-aware: "İrem" and "irem" collide)
+Index("ux_users_username_lower", func.tr_lower(User.username), unique=True)
+
+
+class IdAllocator(Base):
+    """Persisted state of a keyed-permutation ID allocator"""
+    __tablename__ = "id_allocators"
+
+    name = Column(String(50), primary_key=True)
+    next_value = Column(Integer, nullable=False, default=0)  # Counter; values below it are handed out
+    key = Column(String(64), nullable=False)  # Permutation key, fixed at creation
+
+
 class UserStats(Base):
     """User statistics model"""
     __tablename__ = "user_stats"
@@ -140,9 +171,68 @@ class UserStats(Base):
     average_answer_time = Column(Integer, default=0)  # Ortalama cevap süresi (saniye)
     total_play_time = Column(Integer, default=0)  # Toplam oyun süresi (saniye)
 
+    # Skill rating (rating.py): estimate, uncertainty and the conservative mu - 3*sigma used for ranking
+    rating_mu = Column(Float, default=25.0)
+    rating_sigma = Column(Float, default=25.0 / 3)
+    rating = Column(Float, default=0.0)
+    rated_games = Column(Integer, default=0)
+
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship("User", back_populates="stats")
 
     def __repr__(self):
         return f"<UserStats(user_id={self.user_id}, games={self.total_games_played})>"
+
+
+# Sortable stats columns in the admin user listing, each with user_id as tie-breaker
+USER_STATS_SORT_COLUMNS = (
+    "total_games_played", "total_games_won", "total_score", "highest_score",
+    "total_questions_answered", "total_correct_answers", "total_players_deceived", "rating",
+)
+for _column in USER_STATS_SORT_COLUMNS:
+    Index(f"ix_user_stats_{_column}_user_id", getattr(UserStats, _column), UserStats.user_id)
+
+
+class GameResult(Base):
+    """One player's place in a finished game; the input of rating.recompute_ratings"""
+    __tablename__ = "game_results"
+
+    id = Column(Integer, primary_key=True, index=True)  # Insertion order = game order
+    game_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=True, index=True)  # NULL: misafir oyuncu
+    rank = Column(Integer, nullable=False)  # 1 = birinci, eşit puanlar aynı sırayı paylaşır
+    score = Column(Integer, nullable=False)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GameResult(game_id='{self.game_id}', user_id={self.user_id}, rank={self.rank})>"
+
+
+class QuestionDistractors(Base):
+    """Fake answers players have written for a question, with the votes they drew"""
+    __tablename__ = "question_distractors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, unique=True, index=True)
+    entries = Column(LargeBinary, nullable=False)  # DistractorList.to_bytes() formatı
+    distinct_count = Column(Integer, default=0)  # Kayıtlı farklı sahte cevap sayısı
+    total_votes = Column(Integer, default=0)  # Sahte cevaplara giden toplam oy
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<QuestionDistractors(question_id={self.question_id}, count={self.distinct_count})>"
+
+
+class UserSeenQuestions(Base):
+    """Compact bitmap of question ids a user has already played"""
+    __tablename__ = "user_seen_questions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, unique=True, index=True)
+    bitmap = Column(LargeBinary, nullable=False)  # SeenBitmap.to_bytes() formatı
+    question_count = Column(Integer, default=0)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UserSeenQuestions(user_id={self.user_id}, count={self.question_count})>"
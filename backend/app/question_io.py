@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Streaming bulk import/export of questions (CSV and JSONL)"""
+import csv
+import io
+import json
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from .database import SessionLocal
+from .dedup import near_duplicate_index
+from .game_manager import question_fingerprint
+from .models import Question
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+MAX_REPORTED_NEAR_DUPLICATES = 50
+
+EXPORT_FIELDS = ["id", "question_text", "correct_answer", "acceptable_answers", "category", "difficulty", "is_active"]
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> Optional[str]:
+    """Pick 'csv' or 'jsonl' from an explicit value or the file extension"""
+    if explicit:
+        return explicit.lower() if explicit.lower() in ("csv", "jsonl") else None
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return None
+
+
+def _iter_records(binary: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield (line_no, record, error) one row at a time"""
+    stream = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Geçersiz JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Her satır bir JSON nesnesi olmalı"
+            continue
+        yield line_no, record, None
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_record(record: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Turn a raw record into insert values, or return an error message"""
+    question_text = _clean(record.get("question_text"))
+    correct_answer = _clean(record.get("correct_answer"))
+    if not question_text:
+        return None, "question_text boş olamaz"
+    if not correct_answer:
+        return None, "correct_answer boş olamaz"
+    if len(correct_answer) > 500:
+        return None, "correct_answer en fazla 500 karakter olabilir"
+
+    category = _clean(record.get("category"))
+    if category and len(category) > 100:
+        return None, "category en fazla 100 karakter olabilir"
+
+    difficulty = (_clean(record.get("difficulty")) or "medium").lower()
+    if difficulty not in DIFFICULTIES:
+        return None, f"difficulty şunlardan biri olmalı: {', '.join(DIFFICULTIES)}"
+
+    is_active = record.get("is_active", True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() not in ("0", "false", "hayir", "hayır", "no", "")
+
+    return {
+        "question_text": question_text,
+        "correct_answer": correct_answer,
+        "acceptable_answers": _clean(record.get("acceptable_answers")),
+        "category": category,
+        "difficulty": difficulty,
+        "is_active": bool(is_active),
+        "text_hash": question_fingerprint(question_text),
+    }, None
+
+
+def import_questions(binary: IO[bytes], fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Parse, validate and insert questions in batched transactions
+
+    Memory use is bounded by the batch size: duplicates are checked against
+    the database (including earlier committed batches) by text_hash. Inserted
+    rows are added to the near-duplicate index and flagged ones reported.
+    """
+    summary = {"inserted": 0, "duplicates": 0, "invalid": 0, "near_duplicates": 0,
+               "errors": [], "near_duplicate_samples": []}
+
+    def report(line_no: int, message: str):
+        summary["invalid"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_no, "error": message})
+
+    db = SessionLocal()
+    try:
+        batch: List[Dict] = []
+        batch_lines: List[int] = []
+
+        def flush():
+            hashes = {row["text_hash"] for row in batch}
+            existing = {
+                h for (h,) in db.query(Question.text_hash).filter(Question.text_hash.in_(hashes))
+            }
+            rows, lines = [], []
+            for line_no, row in zip(batch_lines, batch):
+                if row["text_hash"] in existing:
+                    summary["duplicates"] += 1
+                    continue
+                existing.add(row["text_hash"])  # also catches duplicates inside the batch
+                rows.append(row)
+                lines.append(line_no)
+            ids = []
+            if rows:
+                statement = insert(Question.__table__).returning(Question.__table__.c.id, sort_by_parameter_order=True)
+                ids = db.execute(statement, rows).scalars().all()
+            db.commit()
+            summary["inserted"] += len(rows)
+            batch.clear()
+            batch_lines.clear()
+
+            for question_id, line_no, row in zip(ids, lines, rows):
+                matches = near_duplicate_index.add(question_id, row["question_text"], row["correct_answer"])
+                if matches:
+                    summary["near_duplicates"] += 1
+                    if len(summary["near_duplicate_samples"]) < MAX_REPORTED_NEAR_DUPLICATES:
+                        summary["near_duplicate_samples"].append(
+                            {"line": line_no, "id": question_id, "matches": [m["id"] for m in matches]}
+                        )
+
+        for line_no, record, error in _iter_records(binary, fmt):
+            if error:
+                report(line_no, error)
+                continue
+            values, error = validate_record(record)
+            if error:
+                report(line_no, error)
+                continue
+            batch.append(values)
+            batch_lines.append(line_no)
+            if len(batch) >= batch_size:
+                flush()
+
+        if batch:
+            flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.rollback()
+        summary["errors"].append({"line": None, "error": f"Dosya okunamadı: {e}"})
+    finally:
+        db.close()
+
+    return summary
+
+
+def iter_export(fmt: str, include_inactive: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Yield the question bank as CSV or JSONL chunks using keyset pagination"""
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            yield buffer.getvalue()
+
+        last_id = 0
+        while True:
+            query = db.query(Question).filter(Question.id > last_id)
+            if not include_inactive:
+                query = query.filter(Question.is_active == True)
+            questions = query.order_by(Question.id).limit(batch_size).all()
+            if not questions:
+                break
+            last_id = questions[-1].id
+
+            buffer = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buffer)
+                for q in questions:
+                    writer.writerow([getattr(q, field) for field in EXPORT_FIELDS])
+            else:
+                for q in questions:
+                    buffer.write(json.dumps({field: getattr(q, field) for field in EXPORT_FIELDS}, ensure_ascii=False))
+                    buffer.write("\n")
+            db.expunge_all()
+            yield buffer.getvalue()
+    finally:
+        db.close()
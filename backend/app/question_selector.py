@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""Stats-aware weighted question selection"""
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Container, Dict, List, Optional, Iterable, Tuple, Set
+
+from .database import SessionLocal
+from .dedup import near_duplicate_index
+from .log import log
+from .models import Question, QuestionStats
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# Target share of each difficulty in a game
+DIFFICULTY_MIX = {"easy": 0.3, "medium": 0.4, "hard": 0.3}
+
+# Recently used questions recover full weight over this many seconds
+RECENCY_WINDOW = 6 * 60 * 60
+
+# Minimum weight so a heavily used question can still be picked
+MIN_WEIGHT = 0.02
+
+# Final test answers needed before success rate overrides the typed difficulty
+MIN_ANSWERS_FOR_RATE = 20
+
+# Full reload interval, picks up writes made by other workers
+REFRESH_INTERVAL = 60
+
+# A table is rebuilt once this share of its members has changed weight, or after REBUILD_INTERVAL seconds
+STALE_FRACTION = 0.1
+REBUILD_INTERVAL = 30
+
+
+class AliasTable:
+    """Vose alias table: O(n) build, O(1) weighted draw"""
+
+    __slots__ = ("ids", "weights", "prob", "alias", "built_at", "stale")
+
+    def __init__(self, ids: List[int], weights: List[float]):
+        n = len(ids)
+        self.ids = ids
+        self.weights = weights
+        self.built_at = time.monotonic()
+        self.stale = 0  # members whose weight changed since the build
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        if n == 0:
+            return
+
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def draw(self, rng: random.Random) -> int:
+        """Return the index of a weighted random member"""
+        i = rng.randrange(len(self.ids))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class QuestionSelector:
+    """In-memory question catalog with precomputed sampling weights
+
+    Questions are bucketed by (category, effective difficulty), each with its own
+    alias table. Usage updates don't rebuild tables right away: draws from a stale
+    table are corrected by accepting with probability current/built weight, and a
+    table is rebuilt once enough of it is stale. Bucket membership changes force
+    a rebuild on next use. Selection never touches the database.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self._rng = rng or random.Random()
+        self._questions: Dict[int, Dict] = {}  # question_id -> question dict
+        self._stats: Dict[int, Dict] = {}  # question_id -> usage stats
+        self._bucket_of: Dict[int, Tuple[str, str]] = {}  # question_id -> (category, difficulty)
+        self._buckets: Dict[Tuple[Optional[str], str], Set[int]] = {}
+        self._tables: Dict[Tuple[Optional[str], str], AliasTable] = {}
+        self._dirty: Set[Tuple[Optional[str], str]] = set()  # tables whose membership changed
+        self.loaded = False
+        self.rebuild_count = 0
+        self.catalog_version = 0  # Bumped when question texts/answers change (bots.CandidateTable)
+
+    # Catalog maintenance
+
+    @staticmethod
+    def fetch_rows(db=None) -> List:
+        """Read all active questions with their stats (safe to run in a thread)"""
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            # Plain column rows are much cheaper to load than ORM entities
+            return (
+                db.query(
+                    Question.id, Question.question_text, Question.correct_answer,
+                    Question.acceptable_answers, Question.category, Question.difficulty,
+                    QuestionStats.games_used, QuestionStats.last_used,
+                    QuestionStats.times_asked, QuestionStats.times_correct,
+                    QuestionStats.calibrated_at,
+                )
+                .outerjoin(QuestionStats, QuestionStats.question_id == Question.id)
+                .filter(Question.is_active == True)
+                .all()
+            )
+        finally:
+            if own_session:
+                db.close()
+
+    def load(self, db=None):
+        """(Re)load all active questions and their stats from the database"""
+        self.apply_rows(self.fetch_rows(db))
+
+    def apply_rows(self, rows: List):
+        """Replace the catalog with rows from fetch_rows()"""
+        self._questions.clear()
+        self._stats.clear()
+        self._bucket_of.clear()
+        self._buckets.clear()
+        self._tables.clear()
+        self._dirty.clear()
+        for row in rows:
+            self._put(row.id, row.question_text, row.correct_answer, row.acceptable_answers,
+                      row.category, row.difficulty)
+            self._stats[row.id] = {
+                'games_used': row.games_used or 0,
+                'last_used': row.last_used,
+                'times_asked': row.times_asked or 0,
+                'times_correct': row.times_correct or 0,
+                'calibrated': row.calibrated_at is not None,
+            }
+            self._rebucket(row.id)
+        self.loaded = True
+
+    def build(self, db=None) -> "QuestionSelector":
+        """Read the catalog into a new selector with all tables built (safe to run in a thread)"""
+        catalog = QuestionSelector(rng=self._rng)
+        catalog.apply_rows(self.fetch_rows(db))
+        for key in list(catalog._buckets):
+            catalog._table(key)
+        return catalog
+
+    def swap(self, catalog: "QuestionSelector"):
+        """Take over a catalog from build() in one step; selection never sees a half-built one"""
+        self._questions, self._stats, self._bucket_of = catalog._questions, catalog._stats, catalog._bucket_of
+        self._buckets, self._tables, self._dirty = catalog._buckets, catalog._tables, catalog._dirty
+        self.catalog_version += 1
+        self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def upsert(self, question: Question, stats: Optional[QuestionStats] = None):
+        """Add or refresh a question; inactive questions are removed"""
+        if not question.is_active:
+            self.remove(question.id)
+            return
+
+        self._put(question.id, question.question_text, question.correct_answer,
+                  question.acceptable_answers, question.category, question.difficulty)
+        if stats is not None:
+            self._stats[question.id] = {
+                'games_used': stats.games_used or 0,
+                'last_used': stats.last_used,
+                'times_asked': stats.times_asked or 0,
+                'times_correct': stats.times_correct or 0,
+                'calibrated': stats.calibrated_at is not None,
+            }
+        else:
+            self._stats.setdefault(question.id, {
+                'games_used': 0, 'last_used': None, 'times_asked': 0, 'times_correct': 0, 'calibrated': False
+            })
+        self._rebucket(question.id)
+
+    def _put(self, question_id, question_text, correct_answer, acceptable_answers, category, difficulty):
+        self.catalog_version += 1
+        self._questions[question_id] = {
+            'id': question_id,
+            'question_text': question_text,
+            'correct_answer': correct_answer,
+            'acceptable_answers': acceptable_answers,
+            'category': category,
+            'difficulty': difficulty or "medium",
+        }
+
+    def remove(self, question_id: int):
+        """Drop a question from the catalog"""
+        self._unbucket(question_id)
+        if self._questions.pop(question_id, None) is not None:
+            self.catalog_version += 1
+        self._stats.pop(question_id, None)
+
+    def record_game(self, question_ids: Iterable[int], when: Optional[datetime] = None):
+        """Mirror the games_used/last_used update written at game start"""
+        when = when or datetime.utcnow()
+        for question_id in question_ids:
+            stats = self._stats.get(question_id)
+            if stats is None:
+                continue
+            stats['games_used'] += 1
+            stats['last_used'] = when
+            self._mark_stale(self._bucket_of.get(question_id))
+
+    def record_answers(self, question_id: int, correct: int, wrong: int):
+        """Mirror the final test times_asked/times_correct update"""
+        stats = self._stats.get(question_id)
+        if stats is None:
+            return
+        stats['times_asked'] += correct + wrong
+        stats['times_correct'] += correct
+        self._rebucket(question_id)
+
+    # Bucketing and weights
+
+    def _effective_difficulty(self, question_id: int) -> str:
+        stats = self._stats[question_id]
+        # A calibrated label (calibration.py) already reflects the success rate, ranked bank-wide
+        if stats['times_asked'] >= MIN_ANSWERS_FOR_RATE and not stats['calibrated']:
+            rate = stats['times_correct'] / stats['times_asked']
+            if rate >= 0.7:
+                return "easy"
+            if rate <= 0.35:
+                return "hard"
+            return "medium"
+        difficulty = self._questions[question_id]['difficulty']
+        return difficulty if difficulty in DIFFICULTIES else "medium"
+
+    def _rebucket(self, question_id: int):
+        key = (self._questions[question_id]['category'], self._effective_difficulty(question_id))
+        if self._bucket_of.get(question_id) == key:
+            return
+        self._unbucket(question_id)
+        self._bucket_of[question_id] = key
+        for bucket_key in (key, (None, key[1])):
+            self._buckets.setdefault(bucket_key, set()).add(question_id)
+            self._dirty.add(bucket_key)
+
+    def _unbucket(self, question_id: int):
+        key = self._bucket_of.pop(question_id, None)
+        if key is None:
+            return
+        for bucket_key in (key, (None, key[1])):
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(question_id)
+                self._dirty.add(bucket_key)
+
+    def _mark_stale(self, key: Optional[Tuple[str, str]]):
+        if key is None:
+            return
+        for bucket_key in {key, (None, key[1])}:
+            table = self._tables.get(bucket_key)
+            if table is not None:
+                table.stale += 1
+
+    def _weight(self, question_id: int, now: datetime) -> float:
+        """Favor questions used in fewer games and not used recently"""
+        stats = self._stats[question_id]
+        weight = 1.0 / (1 + stats['games_used'])
+        if stats['last_used'] is not None:
+            age = (now - stats['last_used']).total_seconds()
+            weight *= min(1.0, max(age, 0) / RECENCY_WINDOW)
+        return max(weight, MIN_WEIGHT)
+
+    def _table(self, key: Tuple[Optional[str], str]) -> AliasTable:
+        table = self._tables.get(key)
+        if (
+            table is None
+            or key in self._dirty
+            or table.stale > max(8, len(table) * STALE_FRACTION)
+            or time.monotonic() - table.built_at > REBUILD_INTERVAL
+        ):
+            ids = list(self._buckets.get(key, ()))
+            now = datetime.utcnow()
+            table = AliasTable(ids, [self._weight(qid, now) for qid in ids])
+            self._tables[key] = table
+            self._dirty.discard(key)
+            self.rebuild_count += 1
+        return table
+
+    # Selection
+
+    def count(self, category: Optional[str] = None) -> int:
+        """Number of selectable questions (optionally in a category)"""
+        self.ensure_loaded()
+        return sum(len(self._buckets.get((category, d), ())) for d in DIFFICULTIES)
+
+    def category_questions(self, category: Optional[str] = None) -> List[Dict]:
+        """Selectable questions of a category (None: all), in no particular order"""
+        self.ensure_loaded()
+        ids = set().union(*(self._buckets.get((category, d), ()) for d in DIFFICULTIES))
+        return [self._questions[qid] for qid in ids]
+
+    def _difficulty_plan(self, k: int, available: Dict[str, int]) -> Dict[str, int]:
+        """Split k rounds across difficulties by DIFFICULTY_MIX, capped by availability"""
+        plan = {d: min(int(k * DIFFICULTY_MIX[d]), available[d]) for d in DIFFICULTIES}
+        remaining = k - sum(plan.values())
+        # Hand out leftover rounds, preferring the largest target share
+        for d in sorted(DIFFICULTIES, key=lambda d: -DIFFICULTY_MIX[d]):
+            extra = min(remaining, available[d] - plan[d])
+            plan[d] += extra
+            remaining -= extra
+        return plan
+
+    def _draw_unique(self, key: Tuple[Optional[str], str], n: int, exclude: Set[int],
+                     skip: Optional[Container[int]] = None) -> List[int]:
+        """Draw n distinct ids from a bucket, skipping exclude and skip"""
+        bucket = self._buckets.get(key, ())
+        if n <= 0 or not bucket:
+            return []
+
+        table = self._table(key)
+        now = datetime.utcnow()
+        picked: List[int] = []
+        if n * 2 < len(table):
+            # Rejection sampling, O(n) expected for sparse draws
+            attempts = n * 20
+            while len(picked) < n and attempts > 0:
+                attempts -= 1
+                i = table.draw(self._rng)
+                qid = table.ids[i]
+                if qid in exclude or qid not in bucket or (skip is not None and qid in skip):
+                    continue
+                # Correct for weights that dropped since the table was built
+                accept = self._weight(qid, now) / table.weights[i]
+                if accept < 1.0 and self._rng.random() >= accept:
+                    continue
+                self._take(qid, exclude)
+                picked.append(qid)
+            if len(picked) == n:
+                return picked
+
+        # Dense draw (bucket barely larger than n): weighted keys over the bucket
+        keyed = [
+            (self._rng.random() ** (1.0 / self._weight(qid, now)), qid)
+            for qid in bucket
+            if qid not in exclude and (skip is None or qid not in skip)
+        ]
+        keyed.sort(reverse=True)
+        for _, qid in keyed:
+            if len(picked) >= n:
+                break
+            if qid in exclude:
+                continue
+            self._take(qid, exclude)
+            picked.append(qid)
+        return picked
+
+    @staticmethod
+    def _take(question_id: int, exclude: Set[int]):
+        """Mark a question as picked; its near-duplicates are excluded from the same game"""
+        exclude.add(question_id)
+        exclude.update(near_duplicate_index.duplicates_of(question_id))
+
+    def select(self, k: int, category: Optional[str] = None, exclude: Optional[Iterable[int]] = None,
+               seen: Optional[Container[int]] = None) -> List[Dict]:
+        """Pick k questions weighted by usage, balanced and ordered easy -> hard
+
+        Questions in `seen` (e.g. a SeenFilter for the room's players) are
+        avoided; they are only used to top up when too few unseen remain.
+        """
+        self.ensure_loaded()
+        excluded = set(exclude or ())
+        available = {
+            d: len(self._buckets.get((category, d), ())) for d in DIFFICULTIES
+        }
+        plan = self._difficulty_plan(k, available)
+
+        chosen: List[int] = []
+        for difficulty in DIFFICULTIES:
+            chosen.extend(self._draw_unique((category, difficulty), plan[difficulty], excluded, seen))
+
+        # Top up from any difficulty if exclusions left a bucket short, then allow seen questions
+        for skip in ((seen, None) if seen is not None else (None,)):
+            for difficulty in DIFFICULTIES:
+                if len(chosen) >= k:
+                    break
+                chosen.extend(self._draw_unique((category, difficulty), k - len(chosen), excluded, skip))
+
+        # Stable sort keeps the random order within each difficulty
+        rank = {d: i for i, d in enumerate(DIFFICULTIES)}
+        chosen.sort(key=lambda qid: rank[self._bucket_of[qid][1]])
+        return [self._questions[qid] for qid in chosen]
+
+    def get_stats(self) -> Dict:
+        """Catalog size per bucket for monitoring"""
+        return {
+            'questions': len(self._questions),
+            'buckets': {
+                f"{category or '*'}:{difficulty}": len(ids)
+                for (category, difficulty), ids in self._buckets.items()
+            },
+            'dirty_tables': len(self._dirty),
+            'table_rebuilds': self.rebuild_count,
+        }
+
+
+async def refresh_loop(selector: "QuestionSelector", interval: float = REFRESH_INTERVAL):
+    """Periodically reload the catalog so writes from other workers show up"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # The rebuild runs off the event loop; only the swap happens on it
+            selector.swap(await asyncio.to_thread(selector.build))
+        except Exception as e:
+            log.error("error", f"Question catalog refresh failed: {e}")
+
+
+# Global question selector instance
+question_selector = QuestionSelector()
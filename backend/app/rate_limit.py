@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Per-socket rate limiting for Socket.IO events"""
+import time
+import functools
+from typing import Dict, Tuple, Optional, Callable, Awaitable
+from dataclasses import dataclass
+
+
+# Default budgets: event -> (burst capacity, tokens refilled per second)
+DEFAULT_BUDGETS: Dict[str, Tuple[float, float]] = {
+    'add_reaction': (5, 2.0),
+    'get_leaderboard': (3, 0.5),
+    'join_game': (5, 0.5),
+    'quick_play': (3, 0.2),
+    'resume': (5, 0.5),
+    'watch_room': (5, 0.5),
+}
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket for a single (sid, event) pair"""
+    capacity: float
+    refill_rate: float
+    tokens: float
+    updated_at: float
+
+    def consume(self, now: float, cost: float = 1.0) -> bool:
+        """Refill by elapsed time and try to take `cost` tokens"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated_at = now
+
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+class RateLimiter:
+    """Token bucket limiter keyed by socket id and event name"""
+
+    def __init__(self, budgets: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.budgets: Dict[str, Tuple[float, float]] = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}  # sid -> {event -> bucket}
+        self.allowed_counts: Dict[str, int] = {}  # event -> allowed count
+        self.throttled_counts: Dict[str, int] = {}  # event -> throttled count
+
+    def configure(self, event: str, capacity: float, refill_rate: float):
+        """Set (or replace) the budget for an event"""
+        self.budgets[event] = (capacity, refill_rate)
+        # Existing buckets keep their tokens but pick up the new limits
+        for buckets in self._buckets.values():
+            bucket = buckets.get(event)
+            if bucket:
+                bucket.capacity = capacity
+                bucket.refill_rate = refill_rate
+                bucket.tokens = min(bucket.tokens, capacity)
+
+    def allow(self, sid: str, event: str) -> bool:
+        """Return True if the event is within budget for this socket"""
+        budget = self.budgets.get(event)
+        if budget is None:
+            return True
+
+        now = time.monotonic()
+        buckets = self._buckets.setdefault(sid, {})
+        bucket = buckets.get(event)
+        if bucket is None:
+            capacity, refill_rate = budget
+            bucket = TokenBucket(capacity, refill_rate, capacity, now)
+            buckets[event] = bucket
+
+        if bucket.consume(now):
+            self.allowed_counts[event] = self.allowed_counts.get(event, 0) + 1
+            return True
+
+        self.throttled_counts[event] = self.throttled_counts.get(event, 0) + 1
+        return False
+
+    def forget(self, sid: str):
+        """Drop all buckets for a disconnected socket"""
+        self._buckets.pop(sid, None)
+
+    def limit(self, event: str, on_throttle: Optional[Callable[[str, dict], Awaitable[None]]] = None):
+        """Decorator for Socket.IO handlers; place it below `@sio.on(...)`
+
+        Throttled events are dropped unless `on_throttle(sid, data)` is given,
+        in which case it is awaited instead of the handler.
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(sid, data=None):
+                if self.allow(sid, event):
+                    return await handler(sid, data)
+                if on_throttle is not None:
+                    return await on_throttle(sid, data)
+                return None
+            return wrapper
+        return decorator
+
+    def get_stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            'budgets': {
+                event: {'capacity': capacity, 'refill_per_second': refill_rate}
+                for event, (capacity, refill_rate) in self.budgets.items()
+            },
+            'allowed': dict(self.allowed_counts),
+            'throttled': dict(self.throttled_counts),
+            'tracked_sockets': len(self._buckets),
+        }
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
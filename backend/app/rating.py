@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Multiplayer skill rating: Weng-Lin Bradley-Terry updates, a TrueSkill-style Bayesian model
+
+Every player has a skill estimate mu and an uncertainty sigma. A finished
+game is a ranking of everyone in the room (equal scores share a rank) and
+each player is compared with every other one, so beating a strong room
+moves mu more than beating a weak one, and sigma shrinks as games accrue.
+The displayed rating is the conservative estimate mu - 3 * sigma. Guests
+are rated as newcomers and their results are not stored.
+
+Ratings are updated incrementally at game over; recompute_ratings()
+rebuilds them from the game_results table, e.g. after changing constants.
+"""
+import argparse
+import itertools
+import math
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import bindparam, select, update
+
+from .database import SessionLocal
+from .http_cache import response_cache
+from .models import GameResult, UserStats
+
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2  # Performance noise within a single game
+TAU = MU / 300  # Uncertainty added before every game so ratings keep moving
+KAPPA = 0.0001  # Floor of the sigma shrink factor
+RECOMPUTE_BATCH = 1000  # Rows read and written per round trip by the rebuild
+
+
+class Rating(NamedTuple):
+    mu: float = MU
+    sigma: float = SIGMA
+
+    @property
+    def conservative(self) -> float:
+        """Rating shown and sorted on: a newcomer starts at 0"""
+        return self.mu - 3 * self.sigma
+
+
+def ranks_from_scores(scores: Sequence[int]) -> List[int]:
+    """Competition ranks, 1 = best: scores (30, 50, 50, 10) -> (3, 1, 1, 4)"""
+    return [1 + sum(1 for other in scores if other > score) for score in scores]
+
+
+def rate(ratings: Sequence[Rating], ranks: Sequence[int]) -> List[Rating]:
+    """New ratings for one game; ranks[i] is player i's place (ties allowed)"""
+    n = len(ratings)
+    mus = [r.mu for r in ratings]
+    variances = [r.sigma ** 2 + TAU ** 2 for r in ratings]
+    omega = [0.0] * n
+    delta = [0.0] * n
+    # Each pair once: c and the win probability are symmetric
+    for i in range(n):
+        for q in range(i + 1, n):
+            c2 = variances[i] + variances[q] + 2 * BETA ** 2
+            c = math.sqrt(c2)
+            p = 1 / (1 + math.exp((mus[q] - mus[i]) / c))  # P(i beats q)
+            outcome = 1.0 if ranks[i] < ranks[q] else 0.5 if ranks[i] == ranks[q] else 0.0
+            variance = p * (1 - p) / (c * c2)
+            omega[i] += variances[i] / c * (outcome - p)
+            omega[q] += variances[q] / c * (p - outcome)
+            delta[i] += variances[i] ** 1.5 * variance
+            delta[q] += variances[q] ** 1.5 * variance
+    return [
+        Rating(mus[i] + omega[i], math.sqrt(variances[i] * max(1 - delta[i], KAPPA)))
+        for i in range(n)
+    ]
+
+
+def rating_of(stats: Optional[UserStats]) -> Rating:
+    if stats is None or stats.rating_mu is None:
+        return Rating()
+    return Rating(stats.rating_mu, stats.rating_sigma)
+
+
+def rating_columns(rating: Rating) -> Dict[str, float]:
+    """UserStats column values for a rating"""
+    return {"rating_mu": rating.mu, "rating_sigma": rating.sigma, "rating": rating.conservative}
+
+
+def _games(rows: Iterable) -> Iterable[List]:
+    """Group consecutive game_results rows by game (one game's rows are inserted together)"""
+    for _, group in itertools.groupby(rows, key=lambda row: row.game_id):
+        yield list(group)
+
+
+def recompute_ratings(batch_size: int = RECOMPUTE_BATCH) -> Dict:
+    """Rebuild every rating from game_results in one streaming pass
+
+    Rows are read in insertion order with a server-side cursor, so memory
+    does not grow with the number of games, only with the number of rated
+    players (one Rating each). Everyone is then reset to the prior and the
+    rebuilt ratings are written with batched executemany UPDATEs in the
+    same transaction. Games that finish while this runs are overwritten;
+    run it again (or while the server is idle) to include them.
+    """
+    started = time.perf_counter()
+    ratings: Dict[int, Rating] = {}
+    rated_games: Dict[int, int] = {}
+    games = 0
+    rows_read = 0
+
+    db = SessionLocal()
+    try:
+        rows = db.connection().execution_options(yield_per=batch_size).execute(
+            select(GameResult.game_id, GameResult.user_id, GameResult.rank).order_by(GameResult.id)
+        )
+        for game in _games(rows):
+            games += 1
+            rows_read += len(game)
+            new = rate([ratings.get(row.user_id, Rating()) for row in game], [row.rank for row in game])
+            for row, rating in zip(game, new):
+                if row.user_id is not None:
+                    ratings[row.user_id] = rating
+                    rated_games[row.user_id] = rated_games.get(row.user_id, 0) + 1
+
+        table = UserStats.__table__
+        db.execute(update(table).values(rated_games=0, **rating_columns(Rating())))
+        statement = update(table).where(table.c.user_id == bindparam("uid"))
+        items = iter(ratings.items())
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                break
+            db.execute(statement, [
+                {"uid": user_id, "rated_games": rated_games[user_id], **rating_columns(rating)}
+                for user_id, rating in batch
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    response_cache.bump("user_stats")  # Core updates bypass the session hooks
+    return {
+        "games": games,
+        "rows": rows_read,
+        "players": len(ratings),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild all player ratings from game_results")
+    parser.add_argument("--batch-size", type=int, default=RECOMPUTE_BATCH)
+    args = parser.parse_args()
+    print(recompute_ratings(batch_size=args.batch_size))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Per-room command mailboxes: every room mutation runs one at a time, in arrival order"""
+import asyncio
+import functools
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .tracing import tracer
+
+
+class RoomMailbox:
+    """A queue plus a single worker task that runs one room's commands serially
+
+    A command runs to completion, including its awaits (emits, flushes),
+    before the next one starts, so handlers and timers can no longer
+    interleave between a state change and the broadcast that follows it.
+    Commands whose caller was cancelled while queued (e.g. a timer
+    cancelled by cancel_room_task) are skipped.
+    """
+
+    def __init__(self, room_code: str):
+        self.room_code = room_code
+        self._queue: "asyncio.Queue[Tuple[Callable, tuple, asyncio.Future, str]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self.running_for: Optional[str] = None  # Task name of the caller whose command is running
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def call(self, command: Callable[..., Any], *args) -> Any:
+        """Queue a command (plain or async function) and wait for its result"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(), name=f"mailbox:{self.room_code}")
+        future = asyncio.get_running_loop().create_future()
+        caller = asyncio.current_task()
+        self._queue.put_nowait((command, args, future, caller.get_name() if caller else None))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self):
+        while True:
+            command, args, future, caller = await self._queue.get()
+            if future.done():  # Caller gave up while the command was queued
+                self.skipped += 1
+                continue
+
+            started = time.perf_counter()
+            self.running_for = caller
+            try:
+                with tracer.span(getattr(command, '__name__', 'command'), room_code=self.room_code,
+                                 **({'caller': caller} if caller and not caller.startswith('Task-') else {})):
+                    result = command(*args)
+                    if inspect.isawaitable(result):
+                        result = await result
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                if asyncio.current_task().cancelling():
+                    raise  # The worker itself is being stopped
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.running_for = None
+                elapsed = (time.perf_counter() - started) * 1000
+                self.processed += 1
+                self.total_ms += elapsed
+                self.max_ms = max(self.max_ms, elapsed)
+
+    def get_stats(self) -> Dict:
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'avg_ms': round(self.total_ms / self.processed, 3) if self.processed else 0.0,
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class RoomActors:
+    """Mailboxes keyed by room code; they outlive GameRoom objects across resets"""
+
+    def __init__(self):
+        self._mailboxes: Dict[str, RoomMailbox] = {}
+
+    def mailbox(self, room_code: str) -> RoomMailbox:
+        mailbox = self._mailboxes.get(room_code)
+        if mailbox is None:
+            mailbox = self._mailboxes[room_code] = RoomMailbox(room_code)
+        return mailbox
+
+    def get(self, room_code: str) -> Optional[RoomMailbox]:
+        """Existing mailbox only (safe to call from other threads)"""
+        return self._mailboxes.get(room_code)
+
+    async def call(self, room_code: str, command: Callable[..., Any], *args) -> Any:
+        return await self.mailbox(room_code).call(command, *args)
+
+    def get_stats(self) -> Dict:
+        return {code: mailbox.get_stats() for code, mailbox in self._mailboxes.items()}
+
+
+def room_command(room_of: Callable[..., Optional[str]], actors: "RoomActors"):
+    """Decorator: run a socket handler inside the mailbox of room_of(sid, ...)
+
+    Handlers whose sender is in no room run directly; they only read state
+    or fail their own room checks.
+    """
+    def decorator(handler: Callable[..., Awaitable[Any]]):
+        @functools.wraps(handler)
+        async def wrapper(sid, *args):
+            room_code = room_of(sid, *args)
+            if room_code is None:
+                return await handler(sid, *args)
+            return await actors.call(room_code, handler, sid, *args)
+        return wrapper
+    return decorator
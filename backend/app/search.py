@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Full-text search over the question bank (SQLite FTS5)"""
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .game_manager import turkish_lower
+
+# After turkish_lower, fold Turkish letters to ASCII so "isik" finds "Işık"
+_ASCII_FOLD = str.maketrans({
+    'ı': 'i', 'ş': 's', 'ğ': 'g', 'ü': 'u', 'ö': 'o', 'ç': 'c',
+    'â': 'a', 'î': 'i', 'û': 'u',
+})
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Column weights for bm25(): question_text, correct_answer, acceptable_answers, category
+_RANK_WEIGHTS = "10.0, 5.0, 3.0, 1.0"
+
+# bm25 costs a few µs per matching row; very broad queries only rank the newest
+# RANK_WINDOW matches so latency stays bounded on large banks
+RANK_WINDOW = 1000
+
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        question_text, correct_answer, acceptable_answers, category,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, question_text, correct_answer, acceptable_answers, category)
+        VALUES (new.id, tr_fold(new.question_text), tr_fold(new.correct_answer),
+                tr_fold(new.acceptable_answers), tr_fold(new.category));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+        DELETE FROM questions_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_au
+    AFTER UPDATE OF question_text, correct_answer, acceptable_answers, category ON questions BEGIN
+        DELETE FROM questions_fts WHERE rowid = old.id;
+        INSERT INTO questions_fts(rowid, question_text, correct_answer, acceptable_answers, category)
+        VALUES (new.id, tr_fold(new.question_text), tr_fold(new.correct_answer),
+                tr_fold(new.acceptable_answers), tr_fold(new.category));
+    END
+    """,
+]
+
+
+def fold_for_search(value: Optional[str]) -> Optional[str]:
+    """Lowercase with turkish_lower, then fold Turkish letters to ASCII"""
+    if value is None:
+        return None
+    return turkish_lower(value).translate(_ASCII_FOLD)
+
+
+def _tr_lower(value: Optional[str]) -> Optional[str]:
+    return None if value is None else turkish_lower(value)
+
+
+def register_functions(dbapi_connection):
+    """Register tr_fold() (FTS triggers) and tr_lower() (username index) on a raw sqlite3 connection"""
+    dbapi_connection.create_function("tr_fold", 1, fold_for_search, deterministic=True)
+    dbapi_connection.create_function("tr_lower", 1, _tr_lower, deterministic=True)
+
+
+def install_fts(conn):
+    """Create the FTS table and triggers, rebuilding the index if out of sync"""
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+
+    indexed = conn.execute(text("SELECT count(*) FROM questions_fts")).scalar()
+    total = conn.execute(text("SELECT count(*) FROM questions")).scalar()
+    if indexed != total:
+        rebuild_fts(conn)
+
+
+def rebuild_fts(conn):
+    """Re-index every question"""
+    conn.execute(text("DELETE FROM questions_fts"))
+    conn.execute(text("""
+        INSERT INTO questions_fts(rowid, question_text, correct_answer, acceptable_answers, category)
+        SELECT id, tr_fold(question_text), tr_fold(correct_answer),
+               tr_fold(acceptable_answers), tr_fold(category)
+        FROM questions
+    """))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn user input into an FTS5 MATCH expression (all terms, prefix match)"""
+    tokens = _TOKEN.findall(fold_for_search(query) or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_questions(db: Session, query: str, limit: int = 20, offset: int = 0,
+                     category: Optional[str] = None, include_inactive: bool = False) -> Dict:
+    """Ranked, paginated question search"""
+    match = build_match_query(query)
+    if match is None:
+        return {"query": query, "results": [], "limit": limit, "offset": offset, "has_more": False,
+                "truncated": False}
+
+    filters = ""
+    params = {"match": match}
+    if not include_inactive:
+        filters += " AND q.is_active = 1"
+    if category:
+        filters += " AND q.category = :category"
+        params["category"] = category
+
+    # Matches are scanned in rowid order cheaply; find where the ranking window of
+    # the filtered matches starts, so filters never empty the window
+    floor = db.execute(text(f"""
+        SELECT questions_fts.rowid FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH :match{filters}
+        ORDER BY questions_fts.rowid DESC LIMIT 1 OFFSET :window
+    """), {**params, "window": RANK_WINDOW}).scalar()
+    if floor is not None:
+        filters += " AND questions_fts.rowid > :floor"
+        params["floor"] = floor
+    params.update(limit=limit + 1, offset=offset)
+
+    rows = db.execute(text(f"""
+        SELECT q.id, q.question_text, q.correct_answer, q.acceptable_answers,
+               q.category, q.difficulty, q.is_active,
+               bm25(questions_fts, {_RANK_WEIGHTS}) AS score
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH :match{filters}
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), params).fetchall()
+
+    results: List[Dict] = [
+        {
+            "id": row.id,
+            "question_text": row.question_text,
+            "correct_answer": row.correct_answer,
+            "acceptable_answers": row.acceptable_answers,
+            "category": row.category,
+            "difficulty": row.difficulty,
+            "is_active": bool(row.is_active),
+            "score": -row.score,  # bm25 is lower-is-better
+        }
+        for row in rows[:limit]
+    ]
+    return {
+        "query": query,
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+        # Only the newest RANK_WINDOW matches were ranked; older ones are not reachable
+        "truncated": floor is not None,
+    }
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Per-user "already seen" question tracking with compact bitmaps"""
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import UserSeenQuestions
+
+# Roaring-style containers: ids are split by their high 16 bits; a container
+# holds a sorted uint16 array until it grows past ARRAY_MAX, then a 64 Kbit bitmap.
+ARRAY_MAX = 4096
+BITMAP_BYTES = 65536 // 8
+
+_ARRAY = 0
+_BITMAP = 1
+_HEADER = struct.Struct("<HBI")  # high bits, container type, cardinality
+
+
+class SeenBitmap:
+    """Compressed set of question ids with O(1)/O(log 4096) membership"""
+
+    __slots__ = ("_containers", "_size")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._containers: Dict[int, object] = {}  # high -> array('H') or bytearray
+        self._size = 0
+        self.update(ids)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, bytearray):
+            return bool(container[low >> 3] & (1 << (low & 7)))
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def add(self, value: int) -> bool:
+        """Add an id; returns True if it was new"""
+        high, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(high)
+        if container is None:
+            container = array("H")
+            self._containers[high] = container
+
+        if isinstance(container, bytearray):
+            mask = 1 << (low & 7)
+            if container[low >> 3] & mask:
+                return False
+            container[low >> 3] |= mask
+        else:
+            i = bisect_left(container, low)
+            if i < len(container) and container[i] == low:
+                return False
+            container.insert(i, low)
+            if len(container) > ARRAY_MAX:
+                self._containers[high] = self._to_bitmap(container)
+
+        self._size += 1
+        return True
+
+    def update(self, ids: Iterable[int]) -> int:
+        """Add many ids; returns how many were new"""
+        return sum(1 for value in ids if self.add(value))
+
+    @staticmethod
+    def _to_bitmap(values: array) -> bytearray:
+        bits = bytearray(BITMAP_BYTES)
+        for low in values:
+            bits[low >> 3] |= 1 << (low & 7)
+        return bits
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a sequence of (header, payload) containers"""
+        parts: List[bytes] = []
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            if isinstance(container, bytearray):
+                cardinality = sum(bin(b).count("1") for b in container)
+                parts.append(_HEADER.pack(high, _BITMAP, cardinality))
+                parts.append(bytes(container))
+            else:
+                payload = array("H", container)
+                if sys.byteorder == "big":
+                    payload.byteswap()
+                parts.append(_HEADER.pack(high, _ARRAY, len(container)))
+                parts.append(payload.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SeenBitmap":
+        bitmap = cls()
+        offset = 0
+        while offset < len(data):
+            high, kind, cardinality = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if kind == _BITMAP:
+                bitmap._containers[high] = bytearray(data[offset:offset + BITMAP_BYTES])
+                offset += BITMAP_BYTES
+            else:
+                values = array("H")
+                values.frombytes(data[offset:offset + cardinality * 2])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                bitmap._containers[high] = values
+                offset += cardinality * 2
+            bitmap._size += cardinality
+        return bitmap
+
+
+class SeenFilter:
+    """Membership view over several users' bitmaps (no union is materialized)"""
+
+    __slots__ = ("_bitmaps",)
+
+    def __init__(self, bitmaps: Iterable[SeenBitmap]):
+        # Check the fullest bitmap first so misses short-circuit early on hits
+        self._bitmaps = sorted(bitmaps, key=len, reverse=True)
+
+    def __contains__(self, question_id: int) -> bool:
+        for bitmap in self._bitmaps:
+            if question_id in bitmap:
+                return True
+        return False
+
+
+class SeenQuestionStore:
+    """LRU cache of per-user bitmaps, loaded lazily from user_seen_questions"""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._cache: "OrderedDict[int, SeenBitmap]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _put(self, user_id: int, bitmap: SeenBitmap):
+        self._cache[user_id] = bitmap
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def get_many(self, db: Session, user_ids: Iterable[int]) -> Dict[int, SeenBitmap]:
+        """Return bitmaps for the given users, loading misses in one query"""
+        result: Dict[int, SeenBitmap] = {}
+        missing: List[int] = []
+        for user_id in set(user_ids):
+            bitmap = self._cache.get(user_id)
+            if bitmap is None:
+                missing.append(user_id)
+            else:
+                self._cache.move_to_end(user_id)
+                result[user_id] = bitmap
+        self.hits += len(result)
+        self.misses += len(missing)
+
+        if missing:
+            rows = db.query(UserSeenQuestions).filter(UserSeenQuestions.user_id.in_(missing)).all()
+            loaded = {row.user_id: SeenBitmap.from_bytes(row.bitmap) for row in rows}
+            for user_id in missing:
+                bitmap = loaded.get(user_id) or SeenBitmap()
+                self._put(user_id, bitmap)
+                result[user_id] = bitmap
+        return result
+
+    def filter_for(self, db: Session, user_ids: Iterable[int]) -> Optional[SeenFilter]:
+        """Combined "seen by anyone in the room" filter, or None for guests only"""
+        user_ids = [uid for uid in user_ids if uid]
+        if not user_ids:
+            return None
+        return SeenFilter(self.get_many(db, user_ids).values())
+
+    def mark_seen(self, db: Session, user_ids: Iterable[int], question_ids: List[int]) -> Dict[int, SeenBitmap]:
+        """Add questions to the users' stored bitmaps and stage the rows in db (caller commits)
+
+        The ids go into the bitmap read from the row, not the cached copy, so
+        ids another worker stored meanwhile are kept. Returns the updated
+        bitmaps for apply() once the commit has succeeded.
+        """
+        user_ids = {uid for uid in user_ids if uid}
+        if not user_ids:
+            return {}
+
+        rows = {
+            row.user_id: row
+            for row in db.query(UserSeenQuestions).filter(UserSeenQuestions.user_id.in_(user_ids)).all()
+        }
+        bitmaps: Dict[int, SeenBitmap] = {}
+        for user_id in user_ids:
+            row = rows.get(user_id)
+            bitmap = SeenBitmap.from_bytes(row.bitmap) if row is not None else SeenBitmap()
+            bitmaps[user_id] = bitmap
+            if not bitmap.update(question_ids) and row is not None:
+                continue
+            if row is None:
+                row = UserSeenQuestions(user_id=user_id)
+                db.add(row)
+            row.bitmap = bitmap.to_bytes()
+            row.question_count = len(bitmap)
+            row.last_updated = datetime.utcnow()
+        return bitmaps
+
+    def apply(self, bitmaps: Dict[int, SeenBitmap]):
+        """Cache the bitmaps mark_seen() returned, after their rows are committed"""
+        for user_id, bitmap in bitmaps.items():
+            self._put(user_id, bitmap)
+
+    def invalidate(self, user_id: int):
+        self._cache.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        return {
+            'cached_users': len(self._cache),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Global seen-question store instance
+seen_store = SeenQuestionStore()
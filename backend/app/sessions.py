@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Resumable player sessions: token -> (room, current socket id)"""
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# Sessions not resumed or refreshed for this long are dropped
+SESSION_TTL = 6 * 60 * 60
+
+
+@dataclass
+class PlayerSession:
+    token: str
+    room_code: str
+    sid: str  # Socket id the player is currently keyed by in GameRoom.players
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class SessionTable:
+    """In-memory session table with O(1) lookup by token and by socket id"""
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._by_token: "OrderedDict[str, PlayerSession]" = OrderedDict()  # oldest activity first
+        self._by_sid: Dict[str, str] = {}  # sid -> token
+        self.issued = 0
+        self.resumed = 0
+        self.failed = 0
+
+    def issue(self, room_code: str, sid: str) -> str:
+        """Create a session for a player who just joined; replaces the sid's old one"""
+        self._expire()
+        self.revoke_sid(sid)
+        token = secrets.token_urlsafe(16)
+        self._by_token[token] = PlayerSession(token, room_code, sid)
+        self._by_sid[sid] = token
+        self.issued += 1
+        return token
+
+    def get(self, token: str) -> Optional[PlayerSession]:
+        session = self._by_token.get(token) if token else None
+        if session is not None and time.monotonic() - session.last_seen > self.ttl:
+            self.revoke(token)
+            return None
+        return session
+
+    def get_by_sid(self, sid: str) -> Optional[PlayerSession]:
+        token = self._by_sid.get(sid)
+        return self._by_token.get(token) if token else None
+
+    def rebind(self, session: PlayerSession, new_sid: str):
+        """Point a session at the socket that resumed it"""
+        self._by_sid.pop(session.sid, None)
+        session.sid = new_sid
+        session.last_seen = time.monotonic()
+        self._by_sid[new_sid] = session.token
+        self._by_token.move_to_end(session.token)
+        self.resumed += 1
+
+    def revoke(self, token: str):
+        session = self._by_token.pop(token, None)
+        if session is not None and self._by_sid.get(session.sid) == token:
+            del self._by_sid[session.sid]
+
+    def revoke_sid(self, sid: str):
+        """Drop the session of a player who left or was removed"""
+        token = self._by_sid.pop(sid, None)
+        if token is not None:
+            self._by_token.pop(token, None)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._by_token:
+            token, session = next(iter(self._by_token.items()))
+            if session.last_seen > cutoff:
+                break
+            self.revoke(token)
+
+    def get_stats(self) -> Dict:
+        return {
+            'active': len(self._by_token),
+            'issued': self.issued,
+            'resumed': self.resumed,
+            'failed': self.failed,
+        }
+
+
+# Global session table instance
+session_table = SessionTable()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Read-only spectators: throttled room views fanned out to sharded broadcast groups"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .emit_coalescer import EmitCoalescer
+from .game_manager import GameManager, GameRoom, GamePhase
+
+SPECTATOR_THROTTLE = 0.5  # At most one view per room per window
+SHARD_SIZE = 100  # Spectators per Socket.IO room; shards are sent one after another
+MAX_SPECTATORS = 1000  # Per game room
+
+
+def spectator_group(room_code: str, shard: int) -> str:
+    """Socket.IO room of one spectator shard (players never join these)"""
+    return f"spectate:{room_code}:{shard}"
+
+
+def spectator_view(room: GameRoom, spectators: int = 0) -> Dict:
+    """What a projector shows: public game state only, no unrevealed answers"""
+    in_round = room.phase in (GamePhase.SUBMITTING_FAKE, GamePhase.VOTING, GamePhase.SHOWING_RESULTS)
+    current = room.rounds[room.current_round] if in_round and room.current_round < len(room.rounds) else None
+
+    view = {
+        'room_code': room.room_code,
+        'phase': room.phase.value,
+        'current_round': room.current_round,
+        'max_rounds': room.max_rounds,
+        'spectators': spectators,
+        'players': [
+            {
+                'name': player.name,
+                'score': player.score,
+                'color': player.color,
+                'is_connected': player.is_connected,
+                'submitted': current is not None and player_id in current.fake_answers,
+                'voted': current is not None and player_id in current.votes,
+                'final_answered': len(player.final_answers),
+            }
+            for player_id, player in room.players.items()
+        ],
+    }
+
+    if current is not None:
+        view['question'] = {
+            'round': room.current_round + 1,
+            'total_rounds': room.max_rounds,
+            'text': current.question_text,
+        }
+        if room.phase == GamePhase.VOTING:
+            view['options'] = current.all_options
+        elif room.phase == GamePhase.SHOWING_RESULTS:
+            names = {player_id: player.name for player_id, player in room.players.items()}
+            view['correct_answer'] = current.correct_answer
+            view['votes'] = {
+                option: [names.get(player_id, '?') for player_id, vote in current.votes.items() if vote == option]
+                for option in current.all_options
+            }
+
+    if room.phase in (GamePhase.SHOWING_RESULTS, GamePhase.GAME_OVER):
+        view['leaderboard'] = [
+            {'name': entry['name'], 'score': entry['score'], 'color': entry['color']}
+            for entry in room.get_leaderboard()
+        ]
+    if room.phase == GamePhase.FINAL_TEST:
+        view['final_questions'] = len(room.questions)
+    return view
+
+
+class SpectatorFeed:
+    """Pushes one view per room and window to all of the room's spectators
+
+    Game handlers only call notify(), which is a dict update; the view is
+    built once per window in the feed's own task and encoded once per
+    shard by the Socket.IO manager, so player events never wait on
+    per-spectator work. Shards are emitted one after another, letting
+    player events interleave with a large fan-out.
+    """
+
+    def __init__(self, manager: GameManager, emit: Callable[[str, Dict, str], Awaitable[None]],
+                 window: float = SPECTATOR_THROTTLE, shard_size: int = SHARD_SIZE,
+                 max_spectators: int = MAX_SPECTATORS):
+        self._manager = manager
+        self._emit = emit
+        self._coalescer = EmitCoalescer(self._send, window=window)
+        self.shard_size = shard_size
+        self.max_spectators = max_spectators
+        self._watching: Dict[str, Tuple[str, int]] = {}  # sid -> (room_code, shard)
+        self._shards: Dict[str, List[int]] = {}  # room_code -> spectators per shard
+        self._last_view: Dict[str, Dict] = {}  # room_code -> view spectators have
+        self.views_built = 0
+        self.views_sent = 0
+        self.unchanged_skipped = 0
+
+    def count(self, room_code: str) -> int:
+        return sum(self._shards.get(room_code, ()))
+
+    def room_of(self, sid: str) -> Optional[str]:
+        watching = self._watching.get(sid)
+        return watching[0] if watching else None
+
+    def watch(self, sid: str, room_code: str) -> Optional[Tuple[str, Dict]]:
+        """Add a spectator; returns (group to enter, current view) or None if the room is full"""
+        if self.count(room_code) >= self.max_spectators:
+            return None
+        shards = self._shards.setdefault(room_code, [])
+        shard = next((i for i, size in enumerate(shards) if size < self.shard_size), len(shards))
+        if shard == len(shards):
+            shards.append(0)
+        shards[shard] += 1
+        self._watching[sid] = (room_code, shard)
+
+        # Newcomers get the view the others have; the count change goes out with the next update
+        view = self._last_view.get(room_code)
+        if view is None:
+            view = self._last_view[room_code] = self._build(room_code)
+        self.notify(room_code)
+        return spectator_group(room_code, shard), view
+
+    def unwatch(self, sid: str) -> Optional[str]:
+        """Remove a spectator; returns the group it has to leave"""
+        watching = self._watching.pop(sid, None)
+        if watching is None:
+            return None
+        room_code, shard = watching
+        shards = self._shards[room_code]
+        shards[shard] -= 1
+        if not any(shards):
+            del self._shards[room_code]
+            self._last_view.pop(room_code, None)
+            self._coalescer.discard(room_code)
+        else:
+            self.notify(room_code)
+        return spectator_group(room_code, shard)
+
+    def notify(self, room_code: str):
+        """Room state changed; schedule a view if anyone is watching"""
+        if room_code not in self._shards:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop (scripts, benchmarks): nothing to push to
+        self._coalescer.schedule(room_code, "spectator_state", lambda: room_code)
+
+    def _build(self, room_code: str) -> Dict:
+        self.views_built += 1
+        return spectator_view(self._manager.get_room(room_code), self.count(room_code))
+
+    async def _send(self, event: str, room_code: str, key: str):
+        if room_code not in self._shards or self._manager.get_room(room_code) is None:
+            return
+        view = self._build(room_code)
+        if view == self._last_view.get(room_code):
+            self.unchanged_skipped += 1
+            return
+        self._last_view[room_code] = view
+        self.views_sent += 1
+        for shard, size in enumerate(list(self._shards.get(room_code, ()))):
+            if size:
+                await self._emit(event, view, spectator_group(room_code, shard))
+
+    def get_stats(self) -> Dict:
+        return {
+            "spectators": len(self._watching),
+            "rooms": {code: sum(shards) for code, shards in self._shards.items()},
+            "views_built": self.views_built,
+            "views_sent": self.views_sent,
+            "unchanged_skipped": self.unchanged_skipped,
+            "coalescer": self._coalescer.get_stats(),
+        }
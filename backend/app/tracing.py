@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""Game lifecycle tracing: spans per game, phase, room command, DB session and broadcast
+
+Each sampled game is one trace. Its root span ("game") runs from
+start_game to the room reset, with a span per round and per phase below
+it; room mailbox commands (socket handlers and timer commands) attach to
+the phase that was active, and DB sessions and broadcasts to the command
+that ran them. Finished traces are written as OTLP/JSON lines (the
+ExportTraceServiceRequest shape the OpenTelemetry collector's file
+exporter writes and its OTLP/HTTP receiver accepts) by a background thread.
+
+Configuration (environment): TRACE_SAMPLE_RATE (fraction of games traced,
+default 0 = off), TRACE_FILE, TRACE_ENDPOINT (optional OTLP/HTTP URL such
+as http://collector:4318/v1/traces).
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_FILE = "./data/traces.otlp.jsonl"
+MAX_TRACE_SPANS = 2000  # Finished spans buffered per game before a partial export
+MAX_EXPORT_QUEUE = 100  # Batches waiting for the exporter before new ones are dropped
+SERVICE_NAME = "lugatoz-backend"
+
+SPAN_KIND_INTERNAL = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """A timed operation; ids are hex strings as in OTLP/JSON"""
+
+    __slots__ = ("name", "span_id", "parent", "trace", "room_code", "start_ns", "end_ns",
+                 "attributes", "error", "pending")
+
+    def __init__(self, name: str, parent: Optional["Span"], trace: Optional["GameTrace"],
+                 room_code: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.trace = trace
+        self.room_code = room_code
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.pending: List["Span"] = []  # Finished children waiting for a trace (top-level spans only)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class GameTrace:
+    """Open spans and finished spans of one traced game"""
+
+    def __init__(self, room_code: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.room_code = room_code
+        self.root = Span("game", None, self, room_code, attributes)
+        self.round_span: Optional[Span] = None
+        self.round_index: Optional[int] = None
+        self.phase_span: Optional[Span] = None
+        self.finished: List[Span] = []
+        self.ended = False
+
+    def innermost(self) -> Span:
+        return self.phase_span or self.round_span or self.root
+
+
+class OtlpExporter:
+    """Writes span batches as OTLP/JSON lines to a file and/or POSTs them, from a background thread"""
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, endpoint: Optional[str] = None):
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=MAX_EXPORT_QUEUE)
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.spans = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def export(self, spans: List[Span]):
+        """Queue finished spans; never blocks the caller"""
+        if not spans:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            with self._start_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                    self._writer.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def _export_loop(self):
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            body = json.dumps(encode_otlp(spans), ensure_ascii=False, separators=(",", ":"))
+            try:
+                if self.path:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(body + "\n")
+                if self.endpoint:
+                    request = urllib.request.Request(
+                        self.endpoint, data=body.encode("utf-8"),
+                        headers={"Content-Type": "application/json"}, method="POST"
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+                self.batches += 1
+                self.spans += len(spans)
+            except Exception:
+                self.errors += 1
+
+    def close(self, timeout: float = 5.0):
+        """Export what is queued, then stop the thread"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        writer.join(timeout)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    encoded = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+    }
+    if span.parent is not None:
+        encoded["parentSpanId"] = span.parent.span_id
+    if span.error:
+        encoded["status"] = {"code": STATUS_ERROR, "message": span.error}
+    return encoded
+
+
+def encode_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest in OTLP/JSON encoding"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "lugatoz.tracing"},
+            "spans": [_otlp_span(span) for span in spans],
+        }],
+    }]}
+
+
+class Tracer:
+    """Per-room game traces with a sampled subset of games
+
+    A game's sampling decision is made in start_game and kept until the
+    room resets, so untraced games cost one dict lookup per span site.
+    Commands that run before a room has a game (joining, start_game
+    itself) are held as pending spans and kept if the command started a
+    sampled game, so question loading shows up in the trace too; with a
+    sample rate of 0 nothing is recorded at all.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, exporter: Optional[OtlpExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter or OtlpExporter()
+        self._games: Dict[str, Optional[GameTrace]] = {}  # room_code -> trace, None if not sampled
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+        self.games_traced = 0
+        self.games_skipped = 0
+
+    # Game lifecycle (called from GameRoom / GameManager)
+
+    def start_game(self, room_code: str, **attributes):
+        self.end_game(room_code, reason="restarted")
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            self._games[room_code] = None
+            self.games_skipped += 1
+            return
+        self._games[room_code] = GameTrace(room_code, {"room.code": room_code, **attributes})
+        self.games_traced += 1
+
+    def phase(self, room_code: str, name: str, round_index: Optional[int] = None):
+        """Enter a game phase; a new round_index also starts a new round span"""
+        trace = self._games.get(room_code)
+        if trace is None:
+            return
+        if trace.phase_span is not None and trace.phase_span.name == name and trace.round_index == round_index:
+            return
+        self._close(trace, trace.phase_span)
+        trace.phase_span = None
+        if round_index != trace.round_index:
+            self._close(trace, trace.round_span)
+            trace.round_span = None
+            trace.round_index = round_index
+            if round_index is not None:
+                trace.round_span = Span("round", trace.root, trace, room_code, {"game.round": round_index + 1})
+        trace.phase_span = Span(name, trace.innermost(), trace, room_code, {})
+
+    def end_game(self, room_code: str, reason: str = "reset"):
+        trace = self._games.pop(room_code, None)
+        if trace is None:
+            return
+        self._close(trace, trace.phase_span)
+        self._close(trace, trace.round_span)
+        trace.root.set(**{"game.end_reason": reason})
+        self._close(trace, trace.root)
+        trace.ended = True
+        self.exporter.export(trace.finished)
+        trace.finished = []
+
+    # Spans inside a game
+
+    @contextmanager
+    def span(self, name: str, room_code: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+        """Span under the current span, or under room_code's active phase; yields None when not traced"""
+        parent = self._current.get()
+        if parent is not None:
+            span = Span(name, parent, parent.trace, parent.room_code, attributes)
+        elif room_code is None:
+            yield None
+            return
+        elif room_code in self._games:
+            trace = self._games[room_code]
+            if trace is None:
+                yield None
+                return
+            span = Span(name, trace.innermost(), trace, room_code, attributes)
+        elif self.sample_rate > 0:
+            span = Span(name, None, None, room_code, attributes)  # Pending: no game yet
+        else:
+            yield None
+            return
+
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._current.reset(token)
+            self._finish(span)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator: run an async function in a span under the current one"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with self.span(name or fn.__name__):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def start_span(self, name: str, **attributes) -> Optional[Span]:
+        """Child of the current span for work with separate begin/end hooks (e.g. DB sessions)"""
+        parent = self._current.get()
+        if parent is None:
+            return None
+        return Span(name, parent, parent.trace, parent.room_code, attributes)
+
+    def end_span(self, span: Span, error: Optional[str] = None):
+        span.error = error
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        if span.trace is not None:
+            self._add(span.trace, span)
+            return
+
+        top = span
+        while top.parent is not None:
+            top = top.parent
+        if top is not span:
+            top.pending.append(span)
+            return
+
+        # A pending top-level span: keep it if its command started a traced game
+        trace = self._games.get(span.room_code)
+        if trace is None:
+            return
+        span.parent = trace.root
+        for pending in span.pending + [span]:
+            pending.trace = trace
+            self._add(trace, pending)
+        span.pending = []
+
+    def _close(self, trace: GameTrace, span: Optional[Span]):
+        if span is not None and not span.end_ns:
+            span.end_ns = time.time_ns()
+            self._add(trace, span)
+
+    def _add(self, trace: GameTrace, span: Span):
+        if trace.ended:  # e.g. the command that reset the room, finishing after its game
+            self.exporter.export([span])
+            return
+        trace.finished.append(span)
+        if len(trace.finished) >= MAX_TRACE_SPANS:
+            self.exporter.export(trace.finished)
+            trace.finished = []
+
+    def shutdown(self):
+        """End open games and export everything"""
+        for room_code in list(self._games):
+            self.end_game(room_code, reason="shutdown")
+        self.exporter.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "open_traces": sum(1 for trace in self._games.values() if trace is not None),
+            "games_traced": self.games_traced,
+            "games_skipped": self.games_skipped,
+            "exported_batches": self.exporter.batches,
+            "exported_spans": self.exporter.spans,
+            "dropped_spans": self.exporter.dropped,
+            "export_errors": self.exporter.errors,
+        }
+
+
+# Global tracer instance
+tracer = Tracer(
+    sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0")),
+    exporter=OtlpExporter(os.environ.get("TRACE_FILE", TRACE_FILE), os.environ.get("TRACE_ENDPOINT") or None),
+)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Collision-free public user IDs: a persisted counter run through a keyed permutation"""
+import hashlib
+import secrets
+import threading
+from typing import Dict, Tuple
+
+from sqlalchemy import text
+
+from .database import engine
+
+MIN_DIGITS = 5  # First 90,000 IDs are 5 digits (what the login form expects), then 6, ...
+FEISTEL_ROUNDS = 4
+BLOCK_SIZE = 32  # Counter values reserved per database round trip
+
+
+def _tier(index: int) -> Tuple[int, int, int]:
+    """Map the n-th ID to (digits, offset within that digit count, tier size)"""
+    digits = MIN_DIGITS
+    while True:
+        size = 9 * 10 ** (digits - 1)
+        if index < size:
+            return digits, index, size
+        index -= size
+        digits += 1
+
+
+class KeyedPermutation:
+    """Bijection on range(size): a balanced Feistel network plus cycle-walking"""
+
+    def __init__(self, key: bytes, size: int):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        self._key = hashlib.blake2b(key + size.to_bytes(8, "big"), digest_size=32).digest()
+
+    def _round(self, value: int, round_no: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8, "big"), digest_size=8,
+                                 key=self._key, person=round_no.to_bytes(16, "big")).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.mask
+        for round_no in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ self._round(right, round_no)
+        return (left << self.half_bits) | right
+
+    def __call__(self, value: int) -> int:
+        # The Feistel domain is a power of four >= size; walk until back inside
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class UserIdAllocator:
+    """Hands out unique, non-sequential-looking user IDs in O(1)
+
+    The n-th ID is permute(n) inside the n-th digit tier, so two counter
+    values never map to the same ID. Counter blocks are reserved with a
+    single UPDATE ... RETURNING, which keeps several workers apart; the
+    key lives in the same row so the mapping survives restarts.
+    """
+
+    def __init__(self, name: str = "users", block_size: int = BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # Reserved block is [_next, _end)
+        self._key = b""
+        self._permutations: Dict[int, KeyedPermutation] = {}
+        self.allocated = 0
+        self.blocks_reserved = 0
+
+    def _reserve_block(self):
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO id_allocators (name, next_value, key) VALUES (:name, 0, :key)"
+            ), {"name": self.name, "key": secrets.token_hex(32)})
+            row = conn.execute(text(
+                "UPDATE id_allocators SET next_value = next_value + :n WHERE name = :name "
+                "RETURNING next_value, key"
+            ), {"name": self.name, "n": self.block_size}).one()
+        self._end = row.next_value
+        self._next = self._end - self.block_size
+        if row.key.encode() != self._key:
+            self._key = row.key.encode()
+            self._permutations.clear()
+        self.blocks_reserved += 1
+
+    def _to_id(self, index: int) -> int:
+        digits, offset, size = _tier(index)
+        permutation = self._permutations.get(digits)
+        if permutation is None:
+            permutation = self._permutations[digits] = KeyedPermutation(self._key, size)
+        return 10 ** (digits - 1) + permutation(offset)
+
+    def allocate(self) -> int:
+        """Next ID in permutation order; a counter value is never handed out twice"""
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve_block()
+            index = self._next
+            self._next += 1
+            self.allocated += 1
+        return self._to_id(index)
+
+    def get_stats(self) -> Dict:
+        return {
+            "allocated": self.allocated,
+            "blocks_reserved": self.blocks_reserved,
+            "reserved_remaining": self._end - self._next,
+        }
+
+
+# Global user ID allocator instance
+user_id_allocator = UserIdAllocator()
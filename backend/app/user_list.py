@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Admin user listing: keyset pagination, indexed sorting, prefix search, NDJSON export"""
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import User, UserStats, USER_STATS_SORT_COLUMNS
+from .search import fold_for_search
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+
+# Sort key -> (column, tie-breaker); every pair is backed by an index
+SORT_COLUMNS = {
+    "user_id": (User.user_id, None),
+    "username": (User.username, None),
+    "created_at": (User.created_at, User.user_id),
+    "last_login": (User.last_login, User.user_id),
+}
+SORT_COLUMNS.update({
+    name: (getattr(UserStats, name), UserStats.user_id) for name in USER_STATS_SORT_COLUMNS
+})
+
+_STATS_FIELDS = (
+    "total_games_played", "total_games_won", "total_score", "highest_score",
+    "total_correct_answers", "total_questions_answered", "rating",
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, order: str, values: Tuple) -> str:
+    """Opaque cursor for the last row of a page, valid only for the same sort and order"""
+    plain = [sort, order] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _check_value(value, sort: str):
+    if sort in ("created_at", "last_login"):
+        return None if value is None else datetime.fromisoformat(value)
+    expected = str if sort == "username" else (int, float)
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise TypeError(f"{sort} cursor value {value!r}")
+    return value
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple:
+    """Values of a cursor from encode_cursor(); InvalidCursor if it was made for another sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        plain = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(plain, list) or plain[:2] != [sort, order]:
+            raise ValueError("cursor belongs to another sort")
+        values = plain[2:]
+        width = 1 if SORT_COLUMNS[sort][1] is None else 2
+        if len(values) != width:
+            raise ValueError(f"expected {width} cursor values")
+        values[0] = _check_value(values[0], sort)
+        if width == 2 and (not isinstance(values[1], int) or isinstance(values[1], bool)):
+            raise TypeError("user_id cursor value")
+        return tuple(values)
+    except (ValueError, TypeError, IndexError) as e:
+        raise InvalidCursor("Geçersiz cursor") from e
+
+
+def _prefix_filter(query, prefix: Optional[str]):
+    if not prefix:
+        return query
+    # Range scan on the tr_fold(username) expression index
+    folded = fold_for_search(prefix)
+    return query.filter(func.tr_fold(User.username) >= folded, func.tr_fold(User.username) < folded + "￿")
+
+
+def _query(db: Session, sort: str, descending: bool, prefix: Optional[str]):
+    column, tiebreak = SORT_COLUMNS[sort]
+    query = db.query(
+        User.user_id, User.username, User.created_at, User.last_login,
+        *(getattr(UserStats, field) for field in _STATS_FIELDS)
+    ).select_from(UserStats).join(User, User.user_id == UserStats.user_id)
+    query = _prefix_filter(query, prefix)
+
+    keys = [column] if tiebreak is None else [column, tiebreak]
+    order = [key.desc() if descending else key.asc() for key in keys]
+    return query.order_by(*order), keys
+
+
+def _after(query, keys, values: Tuple, descending: bool):
+    if len(keys) == 1:
+        return query.filter(keys[0] < values[0] if descending else keys[0] > values[0])
+    row_key, row_value = tuple_(*keys), tuple_(*values)
+    return query.filter(row_key < row_value if descending else row_key > row_value)
+
+
+def _serialize(row) -> Dict:
+    return {
+        'user_id': row.user_id,
+        'username': row.username,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'last_login': row.last_login.isoformat() if row.last_login else None,
+        'stats': {field: getattr(row, field) for field in _STATS_FIELDS},
+    }
+
+
+def _cursor_values(row, sort: str, keys) -> Tuple:
+    return (getattr(row, sort),) if len(keys) == 1 else (getattr(row, sort), row.user_id)
+
+
+def list_users(db: Session, limit: int = DEFAULT_PAGE_SIZE, sort: str = "user_id", order: str = "desc",
+               cursor: Optional[str] = None, prefix: Optional[str] = None) -> Dict:
+    """One page of users; pass next_cursor back to get the following page"""
+    descending = order != "asc"
+    order = 'desc' if descending else 'asc'
+    query, keys = _query(db, sort, descending, prefix)
+    if cursor:
+        query = _after(query, keys, decode_cursor(cursor, sort, order), descending)
+
+    rows = query.limit(limit + 1).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(sort, order, _cursor_values(page[-1], sort, keys)) if len(rows) > limit else None
+    return {
+        'users': [_serialize(row) for row in page],
+        'next_cursor': next_cursor,
+        'sort': sort,
+        'order': order,
+    }
+
+
+def count_users(db: Session, prefix: Optional[str] = None) -> int:
+    """Number of users list_users() pages through for the same prefix"""
+    query = db.query(func.count(UserStats.id)).select_from(UserStats).join(User, User.user_id == UserStats.user_id)
+    return _prefix_filter(query, prefix).scalar()
+
+
+def iter_users_ndjson(sort: str = "user_id", order: str = "desc", prefix: Optional[str] = None,
+                      batch_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+    """Yield every matching user as NDJSON, one keyset page at a time"""
+    descending = order != "asc"
+    db = SessionLocal()
+    try:
+        base, keys = _query(db, sort, descending, prefix)
+        last: Optional[Tuple] = None
+        while True:
+            query = base if last is None else _after(base, keys, last, descending)
+            rows: List = query.limit(batch_size).all()
+            if not rows:
+                break
+            last = _cursor_values(rows[-1], sort, keys)
+            yield "".join(json.dumps(_serialize(row), ensure_ascii=False) + "\n" for row in rows)
+    finally:
+        db.close()
@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
 import socketio
 import asyncio
-from typing import Dict
+import inspect
+import uuid
+from typing import Dict, List, Optional, Tuple
 from .game_manager import game_manager, GamePhase, check_answer, Player, GameManager
 from .database import SessionLocal
-from .models import Question, GameStats, QuestionStats, User, UserStats
+from .models import GameStats, QuestionStats, User, UserStats, GameResult
+from .rating import rate, rating_of, ranks_from_scores
 from .auth import create_user, get_user_by_id, get_user_by_username, update_username, update_last_login, get_leaderboard, get_user_stats, update_user_stats_after_game
+from .rate_limit import rate_limiter
+from .emit_coalescer import EmitCoalescer
+from .question_selector import question_selector
+from .seen_questions import seen_store
+from .distractors import distractor_index
+from .bots import bot_players, BOT_SKILL
+from .lobby import LobbyFeed, LOBBY_ROOM
+from .spectators import SpectatorFeed
+from .matchmaking import MatchmakingQueue
+from .sessions import session_table
+from .event_log import event_logs
+from .room_actor import RoomActors, room_command
+from .log import log
+from .tracing import tracer
 from datetime import datetime
 
 # Create Socket.IO server
@@ -22,9 +39,34 @@ socket_rooms: Dict[str, str] = {}  # socket_id -> room_code
 # Track user_id for each socket
 socket_users: Dict[str, int] = {}  # socket_id -> user_id
 
+# Runs every mutation of a room (handlers and timers) one at a time
+room_actors = RoomActors()
+in_player_room = room_command(lambda sid, *args: socket_rooms.get(sid), room_actors)
+
 # Track active tasks per room to prevent duplicates
 room_tasks: Dict[str, Dict[str, asyncio.Task]] = {}  # room_code -> {task_name -> task}
 
+# Batches submission/voting progress broadcasts per room (50 ms window);
+# progress counts are transient, so they bypass the room event log
+progress_coalescer = EmitCoalescer(lambda event, data, room: sio.emit(event, data, room=room), window=0.05)
+
+# Pushes room list deltas to sockets on the room selection screen
+lobby_feed = LobbyFeed(game_manager, lambda event, data: sio.emit(event, data, room=LOBBY_ROOM))
+game_manager.listeners.append(lobby_feed.notify)
+
+# Throttled read-only room views for spectators (not counted as players)
+spectator_feed = SpectatorFeed(game_manager, lambda event, data, group: sio.emit(event, data, room=group))
+game_manager.listeners.append(spectator_feed.notify)
+
+# Quick play: groups waiting players into rooms (seat_match seats each group)
+matchmaker = MatchmakingQueue(lambda tickets: seat_match(tickets))
+
+# Leaderboard size cap for the get_leaderboard event
+MAX_LEADERBOARD_LIMIT = 100
+
+# Delay before a coalesced reaction broadcast is sent (seconds)
+REACTION_FLUSH_DELAY = 0.5
+
 
 def cancel_room_task(room_code: str, task_name: str):
     """Cancel a specific task for a room if it exists"""
@@ -44,20 +86,98 @@ def create_room_task(room_code: str, task_name: str, coro):
     if room_code not in room_tasks:
         room_tasks[room_code] = {}
 
-    # Create and track new task
-    task = asyncio.create_task(coro)
+    # Create and track new task (named by kind for the profiler; per-player keys carry the sid)
+    kind = 'remove_player' if task_name.startswith('remove_player_') else task_name
+    task = asyncio.create_task(coro, name=f'room_task:{kind}')
     room_tasks[room_code][task_name] = task
     return task
 
 
+def has_room_task(room_code: str, task_name: str) -> bool:
+    """Check if a tracked task for a room is still pending"""
+    task = room_tasks.get(room_code, {}).get(task_name)
+    return task is not None and not task.done()
+
+
+def socket_log_context(sid: Optional[str], room_code: Optional[str]) -> Dict:
+    """Fields added to log records about a socket or a room"""
+    room_code = room_code or socket_rooms.get(sid)
+    room = game_manager.get_room(room_code) if room_code else None
+    return {
+        'room': room_code,
+        'user_id': socket_users.get(sid),
+        'phase': room.phase.value if room else None,
+    }
+
+
+log.context_provider = socket_log_context
+
+
+def profile_task_label(task: asyncio.Task) -> Optional[str]:
+    """Profiler group of a running task: the room task it is, or the one whose command a mailbox runs
+
+    Called from the profiler thread; only reads.
+    """
+    name = task.get_name()
+    if name.startswith('mailbox:'):
+        mailbox = room_actors.get(name[len('mailbox:'):])
+        caller = (mailbox.running_for if mailbox else None) or ''
+        return caller if caller.startswith('room_task:') else 'room_mailbox'
+    return name if name.startswith('room_task:') else None
+
+
+def profile_handler_codes() -> Dict[object, str]:
+    """Profiler groups for code objects of the Socket.IO handlers (innermost function, not the wrappers)"""
+    codes = {
+        inspect.unwrap(handler).__code__: f'handler:{event}'
+        for event, handler in sio.handlers.get('/', {}).items()
+    }
+    # join_game does its work in the mailboxes of the old and the new room
+    codes[leave_previous_room.__code__] = codes[join_room.__code__] = 'handler:join_game'
+    return codes
+
+
 def cancel_all_room_tasks(room_code: str):
     """Cancel all tasks for a room"""
+    progress_coalescer.discard(room_code)
     if room_code in room_tasks:
         for task_name in list(room_tasks[room_code].keys()):
             cancel_room_task(room_code, task_name)
         del room_tasks[room_code]
 
 
+def schedule_submission_progress(room):
+    """Queue a coalesced submission_progress update for the room"""
+    current_round = room.rounds[room.current_round]
+    progress_coalescer.schedule(room.room_code, 'submission_progress', lambda: {
+        'submitted': len(current_round.fake_answers),
+        'total': len(room.players)
+    })
+    spectator_feed.notify(room.room_code)
+
+
+def schedule_voting_progress(room):
+    """Queue a coalesced voting_progress update for the room"""
+    current_round = room.rounds[room.current_round]
+    progress_coalescer.schedule(room.room_code, 'voting_progress', lambda: {
+        'voted': len(current_round.votes),
+        'total': len(room.players)
+    })
+    spectator_feed.notify(room.room_code)
+
+
+def run_bots(room):
+    """Let the room's bots play the phase that just opened (bots have no tasks of their own)"""
+    if not bot_players.act(room):
+        return
+    if room.phase == GamePhase.SUBMITTING_FAKE:
+        schedule_submission_progress(room)
+    elif room.phase == GamePhase.VOTING:
+        schedule_voting_progress(room)
+    else:
+        spectator_feed.notify(room.room_code)
+
+
 def get_player_room(sid):
     """Get the room for a given socket ID"""
     room_code = socket_rooms.get(sid)
@@ -66,6 +186,13 @@ def get_player_room(sid):
     return None
 
 
+async def broadcast(event: str, data: Dict, room: str, skip_sid: Optional[str] = None):
+    """Emit to a game room, logging the event so reconnecting players can catch up"""
+    seq = event_logs.record(room, event, data)
+    with tracer.span('broadcast', **{'socketio.event': event}):
+        await sio.emit(event, {**data, 'seq': seq}, room=room, skip_sid=skip_sid)
+
+
 @sio.event
 async def connect(sid, environ):
     """When client connects"""
@@ -129,12 +256,12 @@ async def handle_login_user(sid, data):
             }, room=sid)
             return
 
-        # Update last login
-        update_last_login(db, user.user_id)
+        # Update last login (buffered, written in the next batch)
+        update_last_login(user.user_id)
 
         # Track user
         socket_users[sid] = user.user_id
-        print(f"[LOGIN] User {user.username} (id={user.user_id}) logged in, sid={sid}")
+        log.info('login', f'User {user.username} logged in', sid=sid, user_id=user.user_id)
 
         await sio.emit('login_success', {
             'user_id': user.user_id,
@@ -179,9 +306,14 @@ async def handle_change_username(sid, data):
 
 
 @sio.on('get_leaderboard')
+@rate_limiter.limit('get_leaderboard')
 async def handle_get_leaderboard(sid, data):
     """Get global leaderboard"""
-    limit = data.get('limit', 100)
+    try:
+        limit = int(data.get('limit', MAX_LEADERBOARD_LIMIT))
+    except (TypeError, ValueError):
+        limit = MAX_LEADERBOARD_LIMIT
+    limit = max(1, min(limit, MAX_LEADERBOARD_LIMIT))
 
     db = SessionLocal()
     try:
@@ -193,6 +325,120 @@ async def handle_get_leaderboard(sid, data):
         db.close()
 
 
+@sio.on('subscribe_lobby')
+async def handle_subscribe_lobby(sid, data=None):
+    """Send the room list once, then per-room deltas (lobby_room_update)"""
+    await sio.enter_room(sid, LOBBY_ROOM)
+    await sio.emit('lobby_rooms', {'rooms': lobby_feed.subscribe(sid)}, room=sid)
+
+
+@sio.on('unsubscribe_lobby')
+async def handle_unsubscribe_lobby(sid, data=None):
+    """Stop lobby updates (e.g. after joining a room)"""
+    await sio.leave_room(sid, LOBBY_ROOM)
+    lobby_feed.unsubscribe(sid)
+
+
+@sio.on('watch_room')
+@rate_limiter.limit('watch_room')
+async def handle_watch_room(sid, data):
+    """Follow a room as a read-only spectator (spectator_state updates, no seat taken)"""
+    room_code = (data or {}).get('room_code')
+    if not room_code or not game_manager.get_room(room_code):
+        await sio.emit('error', {'message': 'Oda bulunamadı!'}, room=sid)
+        return
+    if sid in socket_rooms:
+        await sio.emit('error', {'message': 'Oyundayken izleyici olamazsınız.'}, room=sid)
+        return
+
+    await stop_watching(sid)
+    joined = spectator_feed.watch(sid, room_code)
+    if joined is None:
+        await sio.emit('error', {'message': 'Bu odanın izleyici sınırı doldu.'}, room=sid)
+        return
+    group, view = joined
+    await sio.enter_room(sid, group)
+    await sio.emit('spectator_state', view, room=sid)
+
+
+@sio.on('stop_watching')
+async def handle_stop_watching(sid, data=None):
+    """Stop spectating"""
+    await stop_watching(sid)
+
+
+async def stop_watching(sid):
+    group = spectator_feed.unwatch(sid)
+    if group:
+        await sio.leave_room(sid, group)
+
+
+@sio.on('quick_play')
+@rate_limiter.limit('quick_play')
+async def handle_quick_play(sid, data):
+    """Wait in the matchmaking queue instead of picking a room"""
+    if sid in socket_rooms:
+        await sio.emit('error', {'message': 'Zaten bir odadasınız!'}, room=sid)
+        return
+    player_name = ((data or {}).get('player_name') or '').strip()
+    if not player_name:
+        await sio.emit('error', {'message': 'İsim gerekli!'}, room=sid)
+        return
+
+    await stop_watching(sid)
+    user_id = socket_users.get(sid)
+    matchmaker.enqueue(sid, player_name, user_id, player_skill(user_id))
+    await sio.emit('matchmaking_status', {'queued': True, 'queue_length': len(matchmaker)}, room=sid)
+
+
+@sio.on('cancel_quick_play')
+async def handle_cancel_quick_play(sid, data=None):
+    """Leave the matchmaking queue"""
+    matchmaker.cancel(sid)
+    await sio.emit('matchmaking_status', {'queued': False}, room=sid)
+
+
+def player_skill(user_id: Optional[int]) -> Optional[float]:
+    """Rating estimate (mu) of a logged-in player; None puts them in the unrated bracket"""
+    if user_id is None:
+        return None
+    db = SessionLocal()
+    try:
+        stats = get_user_stats(db, user_id)
+    finally:
+        db.close()
+    if not stats or not stats.rated_games:
+        return None
+    return stats.rating_mu
+
+
+async def seat_match(tickets) -> bool:
+    """Seat a matched group in a quick-play room; False if no room is free"""
+    # Sockets that left or joined a room since the pass took them
+    tickets = [t for t in tickets if t.sid not in socket_rooms and sio.manager.is_connected(t.sid, '/')]
+    if len(tickets) < matchmaker.min_group:
+        matchmaker.requeue(tickets)
+        return True
+
+    room = game_manager.acquire_match_room()
+    if room is None:
+        return False
+
+    room_code = room.room_code
+    taken = set()
+    for ticket in tickets:
+        # Names must be unique within a room
+        name, suffix = ticket.name, 2
+        while name.lower() in taken:
+            name, suffix = f"{ticket.name}{suffix}", suffix + 1
+        taken.add(name.lower())
+
+        await sio.emit('match_found', {'room_code': room_code, 'player_name': name}, room=ticket.sid)
+        await room_actors.call(room_code, join_room, ticket.sid, {'player_name': name, 'room_code': room_code})
+    log.info('matchmaking', f'Matched {len(tickets)} players', room=room_code)
+    return True
+
+
 @sio.on('get_user_stats')
 async def handle_get_user_stats(sid, data):
     """Get stats for a specific user"""
@@ -219,7 +465,9 @@ async def handle_get_user_stats(sid, data):
                 'total_correct_answers': stats.total_correct_answers,
                 'total_wrong_answers': stats.total_wrong_answers,
                 'total_players_deceived': stats.total_players_deceived,
-                'total_times_deceived': stats.total_times_deceived
+                'total_times_deceived': stats.total_times_deceived,
+                'rating': round(stats.rating or 0, 2),
+                'rated_games': stats.rated_games or 0
             }
         }, room=sid)
     finally:
@@ -229,7 +477,11 @@ async def handle_get_user_stats(sid, data):
 async def remove_disconnected_player(sid: str, room_code: str):
     """Remove player after disconnect timeout"""
     await asyncio.sleep(15)  # Wait 15 seconds for reconnection
+    await room_actors.call(room_code, drop_disconnected_player, sid, room_code)
+
 
+async def drop_disconnected_player(sid: str, room_code: str):
+    """Remove the player if they are still disconnected"""
     room = game_manager.get_room(room_code)
     if room and sid in room.players:
         # Check if still disconnected
@@ -238,7 +490,7 @@ async def remove_disconnected_player(sid: str, room_code: str):
             room.remove_player(sid)
 
             # Notify other players
-            await sio.emit('player_left', {
+            await broadcast('player_left', {
                 'player_id': sid,
                 'player_name': player_name,
                 'room_state': room.to_dict()
@@ -250,6 +502,7 @@ async def remove_disconnected_player(sid: str, room_code: str):
 
 
 @sio.event
+@in_player_room
 async def disconnect(sid):
     """When client disconnects"""
 
@@ -257,6 +510,11 @@ async def disconnect(sid):
     if sid in socket_users:
         del socket_users[sid]
 
+    rate_limiter.forget(sid)
+    lobby_feed.unsubscribe(sid)
+    spectator_feed.unwatch(sid)  # Socket.IO drops its rooms itself
+    matchmaker.cancel(sid)
+
     # Get the room this socket was in
     room_code = socket_rooms.get(sid)
     if room_code:
@@ -269,7 +527,7 @@ async def disconnect(sid):
                 room.remove_player(sid)
 
                 # Notify other players
-                await sio.emit('player_left', {
+                await broadcast('player_left', {
                     'player_id': sid,
                     'player_name': player_name,
                     'room_state': room.to_dict()
@@ -281,12 +539,12 @@ async def disconnect(sid):
             else:
                 # In game - allow reconnection, mark as disconnected
                 room.players[sid].is_connected = False
+                room.touch()
 
                 # Notify other players about disconnection
-                await sio.emit('player_disconnected', {
+                await broadcast('player_disconnected', {
                     'player_id': sid,
-                    'player_name': player_name,
-                    'room_state': room.to_dict()
+                    'player_name': player_name
                 }, room=room.room_code)
 
                 # Schedule removal after 15 seconds if not reconnected
@@ -297,46 +555,72 @@ async def disconnect(sid):
             del socket_rooms[sid]
 
 
+async def reject_throttled_join(sid, data):
+    """Tell the client its join attempts are being throttled"""
+    await sio.emit('error', {'message': 'Çok fazla deneme! Lütfen biraz bekleyin.'}, room=sid)
+
+
 @sio.on('join_game')
+@rate_limiter.limit('join_game', on_throttle=reject_throttled_join)
 async def handle_join_game(sid, data):
     """Join a specific game room"""
-    player_name = data.get('player_name', 'Anonymous')
     room_code = data.get('room_code', 'ALI_KUSCU')  # Default to first room
 
-    room = game_manager.get_room(room_code)
-
-    if not room:
+    if not game_manager.get_room(room_code):
         await sio.emit('error', {'message': 'Oda bulunamadı!'}, room=sid)
         return
 
+    # Leave the previous room through its own mailbox first; holding two
+    # mailboxes at once could deadlock two players swapping rooms
+    old_room_code = socket_rooms.get(sid)
+    if old_room_code and old_room_code != room_code:
+        if not await room_actors.call(old_room_code, leave_previous_room, sid, room_code):
+            return
+
+    await stop_watching(sid)  # Players are not spectators
+    matchmaker.cancel(sid)
+    await room_actors.call(room_code, join_room, sid, data)
+
+
+async def leave_previous_room(sid, room_code) -> bool:
+    """Drop the player from their current room before joining room_code; False blocks the join"""
+    room = game_manager.get_room(room_code)
+    if room.phase != GamePhase.WAITING:
+        return True  # join_room rejects it without touching the old room
+
+    old_room_code = socket_rooms.get(sid)
+    old_room = game_manager.get_room(old_room_code) if old_room_code else None
+    if old_room and sid in old_room.players:
+        # Don't allow leaving if game is in progress
+        if old_room.phase != GamePhase.WAITING and old_room.phase != GamePhase.GAME_OVER:
+            await sio.emit('error', {'message': 'Oyun devam ederken oda değiştiremezsiniz!'}, room=sid)
+            return False
+
+        # Remove from old room
+        old_player_name = old_room.players[sid].name
+        old_room.remove_player(sid)
+        await sio.leave_room(sid, old_room_code)
+        await broadcast('player_left', {
+            'player_id': sid,
+            'player_name': old_player_name,
+            'room_state': old_room.to_dict()
+        }, room=old_room_code)
+        # Reset old room if empty
+        if len(old_room.players) == 0:
+            game_manager.reset_room(old_room_code)
+    return True
+
+
+async def join_room(sid, data):
+    """Seat the player in the room (runs in that room's mailbox)"""
+    player_name = data.get('player_name', 'Anonymous')
+    room_code = data.get('room_code', 'ALI_KUSCU')
+    room = game_manager.get_room(room_code)
+
     if room.phase != GamePhase.WAITING:
         await sio.emit('error', {'message': 'Oyun zaten başladı!'}, room=sid)
         return
 
-    # Check if player is already in another room
-    if sid in socket_rooms:
-        old_room_code = socket_rooms[sid]
-        if old_room_code != room_code:
-            old_room = game_manager.get_room(old_room_code)
-            if old_room and sid in old_room.players:
-                # Don't allow leaving if game is in progress
-                if old_room.phase != GamePhase.WAITING and old_room.phase != GamePhase.GAME_OVER:
-                    await sio.emit('error', {'message': 'Oyun devam ederken oda değiştiremezsiniz!'}, room=sid)
-                    return
-
-                # Remove from old room
-                old_player_name = old_room.players[sid].name
-                old_room.remove_player(sid)
-                await sio.leave_room(sid, old_room_code)
-                await sio.emit('player_left', {
-                    'player_id': sid,
-                    'player_name': old_player_name,
-                    'room_state': old_room.to_dict()
-                }, room=old_room_code)
-                # Reset old room if empty
-                if len(old_room.players) == 0:
-                    game_manager.reset_room(old_room_code)
-
     # Check if name already exists in the new room
     existing_names = [p.name.lower() for p in room.players.values()]
     if player_name.lower() in existing_names:
@@ -355,9 +639,9 @@ async def handle_join_game(sid, data):
     # Link user_id to player if logged in
     if sid in socket_users:
         room.players[sid].user_id = socket_users[sid]
-        print(f"[JOIN] Player {player_name} linked to user_id={socket_users[sid]}")
+        log.info('join', f'Player {player_name} joined', sid=sid, room=room_code)
     else:
-        print(f"[JOIN] Player {player_name} is guest (no user_id)")
+        log.info('join', f'Player {player_name} joined as guest', sid=sid, room=room_code)
 
     # Track which room this socket is in
     socket_rooms[sid] = room_code
@@ -365,8 +649,12 @@ async def handle_join_game(sid, data):
     # Add to Socket.IO room
     await sio.enter_room(sid, room.room_code)
 
+    # Resumable session: lets a reconnecting socket take this seat back
+    token = session_table.issue(room_code, sid)
+    await sio.emit('session', {'token': token, 'room_code': room_code}, room=sid)
+
     # Notify all players
-    await sio.emit('player_joined', {
+    await broadcast('player_joined', {
         'player': {
             'socket_id': sid,
             'name': player_name,
@@ -376,7 +664,145 @@ async def handle_join_game(sid, data):
     }, room=room.room_code)
 
 
+async def reject_throttled_resume(sid, data):
+    """Resume attempts are throttled; the client falls back to a normal join"""
+    await sio.emit('resume_failed', {'message': 'Çok fazla deneme! Lütfen biraz bekleyin.'}, room=sid)
+
+
+def session_room(sid, data=None):
+    """Room of the session a resume request refers to"""
+    session = session_table.get((data or {}).get('token'))
+    return session.room_code if session else None
+
+
+@sio.on('resume')
+@rate_limiter.limit('resume', on_throttle=reject_throttled_resume)
+@room_command(session_room, room_actors)
+async def handle_resume(sid, data):
+    """Take back a seat after a reconnect using the session token from join"""
+    session = session_table.get((data or {}).get('token'))
+    room = game_manager.get_room(session.room_code) if session else None
+    old_sid = session.sid if session else None
+
+    # Seat gone (removed after timeout, left, room reset) or socket already seated elsewhere
+    if not room or old_sid not in room.players or (sid != old_sid and sid in socket_rooms):
+        if session and (not room or old_sid not in room.players):
+            session_table.revoke(session.token)
+        session_table.failed += 1
+        await sio.emit('resume_failed', {'message': 'Oturum bulunamadı, lütfen odaya tekrar katılın.'}, room=sid)
+        return
+
+    room_code = room.room_code
+    if sid != old_sid:
+        cancel_room_task(room_code, f'remove_player_{old_sid}')
+        player = room.rebind_player(old_sid, sid)
+        if player is None:
+            session_table.failed += 1
+            await sio.emit('resume_failed', {'message': 'Oturum bulunamadı, lütfen odaya tekrar katılın.'}, room=sid)
+            return
+
+        # The old socket may still be attached if resume raced ahead of its disconnect
+        socket_rooms.pop(old_sid, None)
+        socket_users.pop(old_sid, None)
+        await sio.leave_room(old_sid, room_code)
+        session_table.rebind(session, sid)
+    else:
+        player = room.players[sid]
+
+    socket_rooms[sid] = room_code
+    if player.user_id is not None:
+        socket_users[sid] = player.user_id  # No DB login round-trip needed
+    await sio.enter_room(sid, room_code)
+    log.info('resume', f'Player {player.name} resumed', sid=sid, old_sid=old_sid)
+
+    # Replay what was missed if it is still buffered, otherwise send a snapshot
+    resumed = {
+        'player_id': sid,
+        'old_player_id': old_sid,
+        'player_name': player.name,
+        'room_code': room_code,
+        'seq': event_logs.get(room_code).seq
+    }
+    events = event_logs.missed(room_code, (data or {}).get('last_seq'))
+    if events is None:
+        resumed['snapshot'] = room.snapshot_for(sid)
+    else:
+        resumed['events'] = events
+        resumed['is_host'] = player.is_host
+    await sio.emit('resumed', resumed, room=sid)
+
+    # Others only need the id swap, not a full room state
+    await broadcast('player_reconnected', {
+        'old_player_id': old_sid,
+        'player_id': sid,
+        'player_name': player.name
+    }, room=room_code, skip_sid=sid)
+
+
+@sio.on('add_bot')
+@in_player_room
+async def handle_add_bot(sid, data):
+    """Host seats a bot in a free seat of the waiting room"""
+    room = get_player_room(sid)
+    if not room or not room.players.get(sid) or not room.players[sid].is_host:
+        await sio.emit('error', {'message': 'Sadece oyun yöneticisi bot ekleyebilir!'}, room=sid)
+        return
+
+    try:
+        skill = float((data or {}).get('skill', BOT_SKILL))
+    except (TypeError, ValueError):
+        skill = BOT_SKILL
+    bot = bot_players.add(room, skill)
+    if bot is None:
+        await sio.emit('error', {'message': 'Bot eklenemedi! Oda dolu ya da oyun başladı.'}, room=sid)
+        return
+
+    await broadcast('player_joined', {
+        'player': {
+            'socket_id': bot.socket_id,
+            'name': bot.name,
+            'is_host': False,
+            'is_bot': True
+        },
+        'room_state': room.to_dict()
+    }, room=room.room_code)
+
+
+@sio.on('remove_bot')
+@in_player_room
+async def handle_remove_bot(sid, data):
+    """Host frees a bot's seat before the game starts"""
+    room = get_player_room(sid)
+    if not room or not room.players.get(sid) or not room.players[sid].is_host:
+        await sio.emit('error', {'message': 'Sadece oyun yöneticisi bot çıkarabilir!'}, room=sid)
+        return
+
+    bot_id = (data or {}).get('player_id')
+    bot = room.players.get(bot_id)
+    if bot is None or not bot.is_bot or room.phase != GamePhase.WAITING:
+        await sio.emit('error', {'message': 'Bot çıkarılamadı!'}, room=sid)
+        return
+
+    room.remove_player(bot_id)
+    await broadcast('player_left', {
+        'player_id': bot_id,
+        'player_name': bot.name,
+        'room_state': room.to_dict()
+    }, room=room.room_code)
+
+
+def requested_category(data) -> Tuple[bool, Optional[str]]:
+    """The category the host picked (None: all); valid is False for anything not in the catalog"""
+    category = (data or {}).get('category') or None
+    if category is None:
+        return True, None
+    if not isinstance(category, str) or not question_selector.count(category):
+        return False, None
+    return True, category
+
+
 @sio.on('start_game')
+@in_player_room
 async def handle_start_game(sid, data):
     """Start game"""
     room = get_player_room(sid)
@@ -386,21 +812,23 @@ async def handle_start_game(sid, data):
         await sio.emit('error', {'message': 'Sadece oyun yöneticisi oyunu başlatabilir!'}, room=sid)
         return
 
-    # Get questions from database
+    valid, category = requested_category(data)
+    if not valid:
+        await sio.emit('error', {'message': 'Geçersiz kategori!'}, room=sid)
+        return
+
+    # Pick questions from the in-memory catalog, avoiding ones players already saw
+    user_ids = [p.user_id for p in room.players.values() if p.user_id]
     db = SessionLocal()
     try:
-        questions_db = db.query(Question).filter(Question.is_active == True).all()
-        questions = [
-            {
-                'id': q.id,
-                'question_text': q.question_text,
-                'correct_answer': q.correct_answer,
-                'acceptable_answers': q.acceptable_answers
-            }
-            for q in questions_db
-        ]
+        seen = seen_store.filter_for(db, user_ids)
     finally:
         db.close()
+    questions = question_selector.select(room.max_rounds, category=category, seen=seen)
+
+    if len(questions) < room.max_rounds:
+        await sio.emit('error', {'message': f'Yeterli soru yok! En az {room.max_rounds} soru gerekli.'}, room=sid)
+        return
 
     success = room.start_game(questions)
 
@@ -436,16 +864,25 @@ async def handle_start_game(sid, data):
                 db.flush()  # Flush to get default values
 
             question_stat.games_used = (question_stat.games_used or 0) + 1
-            question_stat.total_players_seen = (question_stat.total_players_seen or 0) + len(room.players)
+            question_stat.total_players_seen = (question_stat.total_players_seen or 0) + room.human_count
             question_stat.last_used = datetime.utcnow()
 
+        # Remember these questions for logged-in players (cached once the rows are stored)
+        seen_bitmaps = seen_store.mark_seen(db, user_ids, [q['id'] for q in room.questions])
+
         db.commit()
+        seen_store.apply(seen_bitmaps)
+    except Exception as e:
+        db.rollback()
+        log.error('error', f'Failed to update stats in start_game: {e}', exc_info=True, room=room.room_code)
     finally:
         db.close()
 
+    question_selector.record_game(q['id'] for q in room.questions)
+
     # Notify all players
     current_round = room.rounds[room.current_round]
-    await sio.emit('game_started', {
+    await broadcast('game_started', {
         'room_state': room.to_dict(),
         'question': {
             'round': room.current_round + 1,
@@ -453,12 +890,14 @@ async def handle_start_game(sid, data):
             'text': current_round.question_text
         }
     }, room=room.room_code)
+    run_bots(room)
 
     # Start timeout for fake answer submission
     create_room_task(room.room_code, 'auto_force_fake', auto_force_fake_submissions(room.room_code))
 
 
 @sio.on('submit_fake_answer')
+@in_player_room
 async def handle_submit_fake_answer(sid, data):
     """Submit fake answer"""
     fake_answer = data.get('answer', '').strip()
@@ -494,25 +933,25 @@ async def handle_submit_fake_answer(sid, data):
     # Confirm to player
     await sio.emit('fake_answer_submitted', {'success': True}, room=sid)
 
-    # Check if all players submitted
+    # Progress updates are batched per room
     current_round = room.rounds[room.current_round]
-    await sio.emit('submission_progress', {
-        'submitted': len(current_round.fake_answers),
-        'total': len(room.players)
-    }, room=room.room_code)
+    schedule_submission_progress(room)
 
     # If everyone submitted, move to voting
     if room.phase == GamePhase.VOTING:
-        await sio.emit('voting_phase', {
+        await progress_coalescer.flush(room.room_code)
+        await broadcast('voting_phase', {
             'options': current_round.all_options,
             'question': current_round.question_text
         }, room=room.room_code)
+        run_bots(room)
 
         # Start voting timeout
         create_room_task(room.room_code, 'auto_force_votes', auto_force_votes(room.room_code))
 
 
 @sio.on('submit_vote')
+@in_player_room
 async def handle_submit_vote(sid, data):
     """Submit vote"""
     chosen_answer = data.get('answer', '')
@@ -540,15 +979,14 @@ async def handle_submit_vote(sid, data):
     # Confirm to player
     await sio.emit('vote_submitted', {'success': True}, room=sid)
 
-    # Update progress
+    # Progress updates are batched per room
     current_round = room.rounds[room.current_round]
-    await sio.emit('voting_progress', {
-        'voted': len(current_round.votes),
-        'total': len(room.players)
-    }, room=room.room_code)
+    schedule_voting_progress(room)
 
     # If everyone voted, show results
     if room.phase == GamePhase.SHOWING_RESULTS:
+        await progress_coalescer.flush(room.room_code)
+
         # Prepare results
         from .game_manager import normalize_answer
 
@@ -570,20 +1008,55 @@ async def handle_submit_vote(sid, data):
             }
             results['player_votes'].append(vote_info)
 
-        await sio.emit('round_results', results, room=room.room_code)
+        await broadcast('round_results', results, room=room.room_code)
 
         # Auto proceed to next round after 10 seconds
         create_room_task(room.room_code, 'auto_next_round', auto_next_round(room.room_code))
 
 
+@in_player_room
+async def coalesce_throttled_reaction(sid, data):
+    """Apply an over-budget reaction but defer its broadcast to a single flush"""
+    answer = data.get('answer', '').strip()
+    emoji = data.get('emoji', '')
+    room = get_player_room(sid)
+
+    if not room or not answer or not emoji:
+        return
+
+    if room.add_reaction(sid, answer, emoji):
+        if not has_room_task(room.room_code, 'flush_reactions'):
+            create_room_task(room.room_code, 'flush_reactions', flush_reactions(room.room_code))
+
+
+async def flush_reactions(room_code):
+    """Broadcast the current reactions map once after a short delay"""
+    await asyncio.sleep(REACTION_FLUSH_DELAY)
+    await room_actors.call(room_code, broadcast_reactions, room_code)
+
+
+async def broadcast_reactions(room_code):
+    """Send the current reactions map"""
+    room = game_manager.get_room(room_code)
+    if not room or room.phase != GamePhase.SHOWING_RESULTS:
+        return
+
+    current_round = room.rounds[room.current_round]
+    await broadcast('reaction_added', {
+        'all_reactions': current_round.reactions
+    }, room=room_code)
+
+
 @sio.on('add_reaction')
+@rate_limiter.limit('add_reaction', on_throttle=coalesce_throttled_reaction)
+@in_player_room
 async def handle_add_reaction(sid, data):
     """Add emoji reaction to an answer"""
     answer = data.get('answer', '').strip()
     emoji = data.get('emoji', '')
     room = get_player_room(sid)
 
-    if not answer or not emoji:
+    if not room or not answer or not emoji:
         return
 
     success = room.add_reaction(sid, answer, emoji)
@@ -591,7 +1064,7 @@ async def handle_add_reaction(sid, data):
     if success:
         # Broadcast reaction to all players
         current_round = room.rounds[room.current_round]
-        await sio.emit('reaction_added', {
+        await broadcast('reaction_added', {
             'player_id': sid,
             'player_name': room.players[sid].name,
             'answer': answer,
@@ -604,7 +1077,11 @@ async def handle_add_reaction(sid, data):
 async def auto_force_fake_submissions(room_code):
     """Force submit empty answers for players who haven't submitted after timeout"""
     await asyncio.sleep(25)  # 20 seconds + 5 buffer
+    await room_actors.call(room_code, force_fake_submissions, room_code)
+
 
+async def force_fake_submissions(room_code):
+    """Submit empty (penalized) answers for everyone still missing one"""
     room = game_manager.get_room(room_code)
     if not room or room.phase != GamePhase.SUBMITTING_FAKE:
         return
@@ -616,13 +1093,18 @@ async def auto_force_fake_submissions(room_code):
         if player_id not in current_round.fake_answers:
             room.submit_fake_answer(player_id, "")  # Empty = timeout penalty
 
+    # One combined progress update for all forced submissions
+    schedule_submission_progress(room)
+
     # Check if we should move to voting now
     if room.phase == GamePhase.VOTING:
+        await progress_coalescer.flush(room_code)
         current_round = room.rounds[room.current_round]
-        await sio.emit('voting_phase', {
+        await broadcast('voting_phase', {
             'options': current_round.all_options,
             'question': current_round.question_text
         }, room=room_code)
+        run_bots(room)
 
         # Start voting timeout
         create_room_task(room_code, 'auto_force_votes', auto_force_votes(room_code))
@@ -630,9 +1112,13 @@ async def auto_force_fake_submissions(room_code):
 
 async def auto_force_votes(room_code):
     """Force submit empty votes for players who haven't voted after timeout"""
-    from .game_manager import normalize_answer
-
     await asyncio.sleep(15)  # 10 seconds + 5 buffer
+    await room_actors.call(room_code, force_votes, room_code)
+
+
+async def force_votes(room_code):
+    """Submit empty (penalized) votes for everyone still missing one"""
+    from .game_manager import normalize_answer
 
     room = game_manager.get_room(room_code)
     if not room or room.phase != GamePhase.VOTING:
@@ -645,8 +1131,13 @@ async def auto_force_votes(room_code):
         if player_id not in current_round.votes:
             room.submit_vote(player_id, "")  # Empty = timeout penalty
 
+    # One combined progress update for all forced votes
+    schedule_voting_progress(room)
+
     # Show results if phase changed
     if room.phase == GamePhase.SHOWING_RESULTS:
+        await progress_coalescer.flush(room_code)
+
         results = {
             'round': room.current_round + 1,
             'question': current_round.question_text,
@@ -667,7 +1158,7 @@ async def auto_force_votes(room_code):
             }
             results['player_votes'].append(vote_info)
 
-        await sio.emit('round_results', results, room=room_code)
+        await broadcast('round_results', results, room=room_code)
 
         # Auto proceed to next round
         create_room_task(room_code, 'auto_next_round', auto_next_round(room_code))
@@ -676,7 +1167,11 @@ async def auto_force_votes(room_code):
 async def auto_next_round(room_code):
     """Automatically proceed to next round after 10 seconds"""
     await asyncio.sleep(10)  # Wait 10 seconds
+    await room_actors.call(room_code, advance_round, room_code)
+
 
+async def advance_round(room_code):
+    """Start the next round, or the final test after the last one"""
     room = game_manager.get_room(room_code)
 
     # Check if we're still in showing results (in case manually advanced)
@@ -688,7 +1183,7 @@ async def auto_next_round(room_code):
 
     if room.phase == GamePhase.FINAL_TEST:
         # Send the same questions that were played during the game
-        await sio.emit('final_test_phase', {
+        await broadcast('final_test_phase', {
             'questions': [
                 {
                     'index': i,
@@ -697,13 +1192,14 @@ async def auto_next_round(room_code):
                 for i in range(len(room.questions))
             ]
         }, room=room_code)
+        run_bots(room)
 
         # Start timeout for final test (120 seconds)
         create_room_task(room_code, 'auto_finish_final_test', auto_finish_final_test(room_code))
     else:
         # New round
         current_round = room.rounds[room.current_round]
-        await sio.emit('new_round', {
+        await broadcast('new_round', {
             'room_state': room.to_dict(),
             'question': {
                 'round': room.current_round + 1,
@@ -711,6 +1207,7 @@ async def auto_next_round(room_code):
                 'text': current_round.question_text
             }
         }, room=room_code)
+        run_bots(room)
 
         # Start timeout for fake answer submission
         create_room_task(room_code, 'auto_force_fake', auto_force_fake_submissions(room_code))
@@ -719,7 +1216,11 @@ async def auto_next_round(room_code):
 async def auto_finish_final_test(room_code):
     """Automatically finish final test after 120 seconds"""
     await asyncio.sleep(120)  # Wait 120 seconds
+    await room_actors.call(room_code, finish_final_test, room_code)
+
 
+async def finish_final_test(room_code):
+    """End the final test and show results"""
     room = game_manager.get_room(room_code)
 
     if not room:
@@ -733,7 +1234,7 @@ async def auto_finish_final_test(room_code):
     try:
         await show_final_results(room)
     except Exception as e:
-        print(f"[ERROR] auto_finish_final_test failed: {e}")
+        log.error('error', f'auto_finish_final_test failed: {e}', exc_info=True, room=room_code)
         # Force game over state
         room.phase = GamePhase.GAME_OVER
         await sio.emit('error', {'message': 'Sonuçlar hesaplanırken hata oluştu.'}, room=room_code)
@@ -742,7 +1243,11 @@ async def auto_finish_final_test(room_code):
 async def auto_reset_room(room_code):
     """Reset room to waiting state after game over"""
     await asyncio.sleep(30)  # Wait 30 seconds
+    await room_actors.call(room_code, reset_finished_room, room_code)
 
+
+async def reset_finished_room(room_code):
+    """Put a finished room back to waiting, keeping its players"""
     room = game_manager.get_room(room_code)
 
     # Only reset if still in game over state
@@ -751,7 +1256,7 @@ async def auto_reset_room(room_code):
         room = game_manager.reset_room_keep_players(room_code)
 
         # Notify all players
-        await sio.emit('room_ready_for_new_game', {
+        await broadcast('room_ready_for_new_game', {
             'message': 'Oda yeni oyun icin hazir!',
             'room_state': room.to_dict()
         }, room=room_code)
@@ -766,6 +1271,7 @@ async def handle_next_round(sid, data):
 
 
 @sio.on('submit_final_answer')
+@in_player_room
 async def handle_submit_final_answer(sid, data):
     """Submit final test answer"""
     question_index = data.get('question_index', 0)
@@ -789,6 +1295,7 @@ async def handle_submit_final_answer(sid, data):
         'question_index': question_index,
         'success': True
     }, room=sid)
+    spectator_feed.notify(room.room_code)
 
     # Check if all players have answered all questions
     all_completed = True
@@ -802,11 +1309,12 @@ async def handle_submit_final_answer(sid, data):
         try:
             await show_final_results(room)
         except Exception as e:
-            print(f"[ERROR] show_final_results failed: {e}")
+            log.error('error', f'show_final_results failed: {e}', exc_info=True, room=room.room_code)
             room.phase = GamePhase.GAME_OVER
             await sio.emit('error', {'message': 'Sonuçlar hesaplanırken hata oluştu.'}, room=room.room_code)
 
 
+@tracer.traced()
 async def show_final_results(room):
     """Calculate and show final results to all players"""
     from .game_manager import normalize_answer
@@ -846,9 +1354,7 @@ async def show_final_results(room):
 
     room.phase = GamePhase.GAME_OVER
 
-    # Determine winner
     leaderboard = room.get_leaderboard()
-    winner_id = leaderboard[0]['socket_id'] if leaderboard else None
 
     # Update game statistics and question statistics (non-blocking)
     try:
@@ -858,11 +1364,59 @@ async def show_final_results(room):
             stats = db.query(GameStats).first()
             if stats:
                 stats.completed_sessions += 1
-                stats.total_players += len(room.players)
+                stats.total_players += room.human_count
+
+            # Bots play along but leave no trace in ratings, question or user statistics
+            bot_ids = {pid for pid, player in room.players.items() if player.is_bot}
+            # Only a game against another person counts as a win, adds to score totals or is rated
+            contested = room.human_count >= 2
+            stats_winner_id = next(
+                (entry['socket_id'] for entry in leaderboard if entry['socket_id'] not in bot_ids), None
+            ) if contested else None
+
+            # Rate the whole room at once: every player is compared with every other
+            player_ids = [pid for pid in room.players if pid not in bot_ids]
+            user_ids = [room.players[pid].user_id for pid in player_ids]
+            ranks = ranks_from_scores([room.players[pid].score for pid in player_ids])
+            rated = {
+                row.user_id: row for row in
+                db.query(UserStats).filter(UserStats.user_id.in_([uid for uid in user_ids if uid]))
+            }
+            new_ratings = dict(zip(player_ids, rate([rating_of(rated.get(uid)) for uid in user_ids], ranks)))
+            game_id = uuid.uuid4().hex
+            db.add_all([
+                GameResult(game_id=game_id, user_id=uid or None, rank=rank, score=room.players[pid].score)
+                for pid, uid, rank in zip(player_ids, user_ids, ranks)
+            ])
+
+            # Round votes: how often each question's fake answers fooled voters (see calibration.py)
+            for round_data in room.rounds:
+                # Empty votes are timeouts, not choices
+                votes = [vote for pid, vote in round_data.votes.items() if vote and pid not in bot_ids]
+                if not votes:
+                    continue
+                question_stat = db.query(QuestionStats).filter(
+                    QuestionStats.question_id == round_data.question_id
+                ).first()
+                if question_stat:
+                    correct_answer = normalize_answer(round_data.correct_answer)
+                    question_stat.times_voted = (question_stat.times_voted or 0) + len(votes)
+                    question_stat.times_fooled = (question_stat.times_fooled or 0) + sum(
+                        1 for vote in votes if vote != correct_answer
+                    )
+                    question_stat.updated_at = datetime.utcnow()
+
+            # Keep the round's fake answers and the votes they drew (see distractors.py)
+            distractor_top = distractor_index.record(db, room.rounds, exclude=bot_ids)
+
+            # Final test answers per question, mirrored into the selector after the commit
+            answer_counts: Dict[int, List[int]] = {}  # question_id -> [correct, wrong]
 
             # Process each player's final test answers and stats
             for player_id in room.players:
                 player = room.players[player_id]
+                if player.is_bot:
+                    continue
                 answers = player_answers.get(player_id, [])
 
                 # Count correct/wrong answers from final test only
@@ -885,24 +1439,29 @@ async def show_final_results(room):
                             ).first()
 
                             if question_stat:
+                                question_stat.updated_at = datetime.utcnow()
                                 question_stat.times_asked = (question_stat.times_asked or 0) + 1
                                 if answer.get('is_correct'):
                                     question_stat.times_correct = (question_stat.times_correct or 0) + 1
                                 else:
                                     question_stat.times_wrong = (question_stat.times_wrong or 0) + 1
+                                counts = answer_counts.setdefault(question_id, [0, 0])
+                                counts[0 if answer.get('is_correct') else 1] += 1
 
                 # Update user statistics if player is logged in
-                print(f"[STATS] Player {player.name}: user_id={player.user_id}")
+                log.info('stats', f'Player {player.name} stats', room=room.room_code, user_id=player.user_id)
                 if player.user_id:
                     # Calculate deception stats from normal rounds
                     players_deceived = 0
                     times_deceived = 0
 
                     for round_data in room.rounds:
-                        # Count how many players voted for this player's fake answer
+                        # Count how many people voted for this player's fake answer
                         fake_answer = round_data.fake_answers.get(player_id)
                         if fake_answer:
-                            votes_for_fake = sum(1 for vote in round_data.votes.values() if vote == fake_answer)
+                            votes_for_fake = sum(
+                                1 for pid, vote in round_data.votes.items() if vote == fake_answer and pid not in bot_ids
+                            )
                             players_deceived += votes_for_fake
 
                         # Count if this player was deceived (voted for wrong answer)
@@ -913,22 +1472,27 @@ async def show_final_results(room):
 
                     # Update user stats (final test results only for correct/wrong)
                     update_user_stats_after_game(db, player.user_id, {
-                        'won': player_id == winner_id,
-                        'score': player.score,
+                        'won': player_id == stats_winner_id,
+                        'score': player.score if contested else 0,
                         'correct_answers': correct_count,
                         'wrong_answers': wrong_count,
                         'players_deceived': players_deceived,
-                        'times_deceived': times_deceived
+                        'times_deceived': times_deceived,
+                        'rating': new_ratings[player_id] if contested else None
                     })
 
             db.commit()
+            # In-memory copies follow the database only once the rows are stored
+            distractor_index.apply(distractor_top)
+            for question_id, (correct, wrong) in answer_counts.items():
+                question_selector.record_answers(question_id, correct, wrong)
         finally:
             db.close()
     except Exception as e:
-        print(f"[ERROR] Failed to update stats in show_final_results: {e}")
+        log.error('error', f'Failed to update stats in show_final_results: {e}', exc_info=True, room=room.room_code)
 
     # Send results with the same questions list
-    await sio.emit('game_over', {
+    await broadcast('game_over', {
         'final_scores': final_scores,
         'player_answers': player_answers,
         'leaderboard': room.get_leaderboard(),
@@ -955,6 +1519,7 @@ async def handle_finish_game(sid, data):
 
 
 @sio.on('leave_room')
+@in_player_room
 async def handle_leave_room(sid, data):
     """Player leaves room"""
     room_code = socket_rooms.get(sid)
@@ -965,7 +1530,7 @@ async def handle_leave_room(sid, data):
             room.remove_player(sid)
 
             # Notify other players
-            await sio.emit('player_left', {
+            await broadcast('player_left', {
                 'player_id': sid,
                 'player_name': player_name,
                 'room_state': room.to_dict()
@@ -977,6 +1542,7 @@ async def handle_leave_room(sid, data):
 
         # Leave Socket.IO room
         await sio.leave_room(sid, room_code)
+        session_table.revoke_sid(sid)
 
         # Remove from tracking
         if sid in socket_rooms:
@@ -985,6 +1551,7 @@ async def handle_leave_room(sid, data):
 
 
 @sio.on('reset_room')
+@in_player_room
 async def handle_reset_room(sid, data):
     """Reset room for new game (only host can do this)"""
     room_code = socket_rooms.get(sid)
@@ -1012,13 +1579,14 @@ async def handle_reset_room(sid, data):
     game_manager.reset_room(room_code)
 
     # Notify everyone that room was reset
-    await sio.emit('room_reset', {
+    await broadcast('room_reset', {
         'message': 'Oda sifirlandi. Ana sayfaya yonlendiriliyorsunuz...'
     }, room=room_code)
 
 
 
 @sio.on('return_to_lobby')
+@in_player_room
 async def handle_return_to_lobby(sid, data):
     """Return to lobby with same players (only host can do this)"""
     room_code = socket_rooms.get(sid)
@@ -1042,7 +1610,7 @@ async def handle_return_to_lobby(sid, data):
     room = game_manager.reset_room_keep_players(room_code)
 
     # Notify all players
-    await sio.emit('returned_to_lobby', {
+    await broadcast('returned_to_lobby', {
         'message': 'Lobiye donuldu!',
         'room_state': room.to_dict()
     }, room=room_code)
@@ -1050,6 +1618,7 @@ async def handle_return_to_lobby(sid, data):
 
 
 @sio.on('restart_game')
+@in_player_room
 async def handle_restart_game(sid, data):
     """Restart game with same players (only host can do this)"""
     room_code = socket_rooms.get(sid)
@@ -1077,21 +1646,19 @@ async def handle_restart_game(sid, data):
     # Reset room but keep players
     room = game_manager.reset_room_keep_players(room_code)
 
-    # Get questions from database
+    valid, category = requested_category(data)
+    if not valid:
+        await sio.emit('error', {'message': 'Geçersiz kategori!'}, room=sid)
+        return
+
+    # Pick questions from the in-memory catalog, avoiding ones players already saw
+    user_ids = [p.user_id for p in room.players.values() if p.user_id]
     db = SessionLocal()
     try:
-        questions = db.query(Question).filter(Question.is_active == True).all()
-        questions_list = [
-            {
-                'id': q.id,
-                'question_text': q.question_text,
-                'correct_answer': q.correct_answer,
-                'acceptable_answers': q.acceptable_answers
-            }
-            for q in questions
-        ]
+        seen = seen_store.filter_for(db, user_ids)
     finally:
         db.close()
+    questions_list = question_selector.select(room.max_rounds, category=category, seen=seen)
 
     if len(questions_list) < room.max_rounds:
         await sio.emit('error', {'message': f'Yeterli soru yok! En az {room.max_rounds} soru gerekli.'}, room=sid)
@@ -1106,7 +1673,7 @@ async def handle_restart_game(sid, data):
         stats = db.query(GameStats).first()
         if stats:
             stats.total_sessions = (stats.total_sessions or 0) + 1
-            stats.total_players = (stats.total_players or 0) + len(room.players)
+            stats.total_players = (stats.total_players or 0) + room.human_count
             db.commit()
 
         # Update question stats
@@ -1124,14 +1691,24 @@ async def handle_restart_game(sid, data):
                 db.add(question_stat)
                 db.flush()
             question_stat.games_used = (question_stat.games_used or 0) + 1
-            question_stat.total_players_seen = (question_stat.total_players_seen or 0) + len(room.players)
+            question_stat.total_players_seen = (question_stat.total_players_seen or 0) + room.human_count
+            question_stat.last_used = datetime.utcnow()
+
+        # Remember these questions for logged-in players (cached once the rows are stored)
+        seen_bitmaps = seen_store.mark_seen(db, user_ids, [q['id'] for q in room.questions])
         db.commit()
+        seen_store.apply(seen_bitmaps)
+    except Exception as e:
+        db.rollback()
+        log.error('error', f'Failed to update stats in restart_game: {e}', exc_info=True, room=room.room_code)
     finally:
         db.close()
 
+    question_selector.record_game(q['id'] for q in room.questions)
+
     # Notify all players
     current_round = room.rounds[0]
-    await sio.emit('game_restarted', {
+    await broadcast('game_restarted', {
         'message': 'Yeni oyun basladi!',
         'room_state': room.to_dict(),
         'current_question': {
@@ -1140,6 +1717,7 @@ async def handle_restart_game(sid, data):
             'text': current_round.question_text
         }
     }, room=room_code)
+    run_bots(room)
 
 
 
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Write-behind buffer for low-value per-user writes (last_login, missing stats rows)"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from sqlalchemy import bindparam, insert, select, update
+
+from .database import SessionLocal
+from .http_cache import response_cache
+from .log import log
+from .models import User, UserStats
+
+FLUSH_INTERVAL = 3.0  # Seconds between background flushes
+MAX_PENDING = 10000  # Pending users that wake the flusher early; also caps a failed batch put back
+
+
+class WriteBehindBuffer:
+    """Coalesces per-user writes in memory and commits them in one transaction
+
+    Repeated logins of the same user collapse into a single UPDATE with the
+    latest timestamp. A crash loses at most one interval of last_login
+    values, which is acceptable for this data; anything that matters for
+    scoring is still written synchronously.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._last_login: Dict[int, datetime] = {}  # user_id -> newest login time
+        self._missing_stats: Set[int] = set()  # user_ids whose stats row must be created
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None  # Set to run the flush_loop before its interval
+        self.queued = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.overflow_flushes = 0
+        self.rows_written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    def _pending_count(self) -> int:
+        return len(self._last_login) + len(self._missing_stats)
+
+    def record_login(self, user_id: int, when: datetime = None):
+        with self._lock:
+            self.queued += 1
+            if user_id in self._last_login:
+                self.coalesced += 1
+            self._last_login[user_id] = when or datetime.utcnow()
+            full = self._pending_count() >= self.max_pending
+        if full:
+            self._request_flush()
+
+    def ensure_stats(self, user_id: int):
+        with self._lock:
+            self.queued += 1
+            if user_id in self._missing_stats:
+                self.coalesced += 1
+            self._missing_stats.add(user_id)
+            full = self._pending_count() >= self.max_pending
+        if full:
+            self._request_flush()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> asyncio.Event:
+        """Event the flush_loop on loop waits on between flushes"""
+        self._loop, self._wake = loop, asyncio.Event()
+        return self._wake
+
+    def _request_flush(self):
+        """Wake the background flusher early; callers (the event loop too) never write themselves"""
+        self.overflow_flushes += 1
+        if self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self) -> int:
+        """Write everything pending in one transaction; returns rows written"""
+        with self._lock:
+            logins, self._last_login = self._last_login, {}
+            missing, self._missing_stats = self._missing_stats, set()
+        if not logins and not missing:
+            return 0
+
+        started = time.perf_counter()
+        written = 0
+        db = SessionLocal()
+        try:
+            if logins:
+                db.execute(
+                    update(User.__table__).where(User.__table__.c.user_id == bindparam("uid")),
+                    [{"uid": user_id, "last_login": when} for user_id, when in logins.items()]
+                )
+                written += len(logins)
+            if missing:
+                # Only users that exist and still have no stats row
+                to_create = set(db.execute(
+                    select(User.user_id).where(User.user_id.in_(missing))
+                ).scalars()) - set(db.execute(
+                    select(UserStats.user_id).where(UserStats.user_id.in_(missing))
+                ).scalars())
+                if to_create:
+                    db.execute(insert(UserStats), [{"user_id": user_id} for user_id in to_create])
+                    written += len(to_create)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.errors += 1
+            log.error("error", f"Write-behind flush failed: {e}")
+            self._requeue(logins, missing)
+            return 0
+        finally:
+            db.close()
+
+        response_cache.bump("users", "user_stats")
+        self.flushes += 1
+        self.rows_written += written
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return written
+
+    def _requeue(self, logins: Dict[int, datetime], missing: Set[int]):
+        """Put a failed batch back without overwriting newer values, up to max_pending"""
+        dropped = 0
+        with self._lock:
+            room = self.max_pending - self._pending_count()
+            for user_id, when in logins.items():
+                if user_id in self._last_login:
+                    continue
+                if room > 0:
+                    self._last_login[user_id] = when
+                    room -= 1
+                else:
+                    dropped += 1
+            for user_id in missing - self._missing_stats:
+                if room > 0:
+                    self._missing_stats.add(user_id)
+                    room -= 1
+                else:
+                    dropped += 1
+            self.dropped += dropped
+        if dropped:
+            # While the database keeps failing, the buffer must not grow without bound
+            log.warning("error", f"Write-behind buffer full, dropped {dropped} pending writes")
+
+    def get_stats(self) -> Dict:
+        return {
+            "pending": self._pending_count(),
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "overflow_flushes": self.overflow_flushes,
+            "rows_written": self.rows_written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+async def flush_loop(buffer: WriteBehindBuffer, interval: float = FLUSH_INTERVAL):
+    """Flush the buffer in a worker thread every interval, or early once it fills up"""
+    wake = buffer.attach(asyncio.get_running_loop())
+    while True:
+        try:
+            await asyncio.wait_for(wake.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+        try:
+            await asyncio.to_thread(buffer.flush)
+        except Exception as e:
+            log.error("error", f"Write-behind flush loop: {e}", exc_info=True)
+
+
+# Global write-behind buffer instance
+write_behind = WriteBehindBuffer()
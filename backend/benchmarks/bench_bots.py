@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Bot player benchmark: CPU cost of bot-filled rooms
+
+Usage (from backend/):  python -m benchmarks.bench_bots [--rooms 1000 --questions 20000]
+Plays full games in rooms of one person and three bots against a
+synthetic in-memory catalog, calling BotPlayers.act() where the room
+timers would. Runs in memory; no database is touched.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ["Coğrafya", "Tarih", "Fizik", "Kimya", "Biyoloji", "Edebiyat", "Teknoloji", "Dil"]
+
+Row = namedtuple("Row", "id question_text correct_answer acceptable_answers category difficulty "
+                        "games_used last_used times_asked times_correct calibrated_at")
+
+
+def make_selector(questions: int, seed: int = 42):
+    from app.question_selector import QuestionSelector
+
+    rng = random.Random(seed)
+    selector = QuestionSelector(rng=random.Random(seed))
+    selector.apply_rows([
+        Row(i, f"Soru {i}?", f"Cevap {i}", None, rng.choice(CATEGORIES), rng.choice(["easy", "medium", "hard"]),
+            0, None, 0, 0, None)
+        for i in range(1, questions + 1)
+    ])
+    return selector
+
+
+def play_game(room, bots, selector, rng) -> float:
+    """One game; returns seconds spent inside BotPlayers.act"""
+    from app.game_manager import GamePhase
+
+    spent = 0.0
+
+    def act():
+        nonlocal spent
+        started = time.perf_counter()
+        bots.act(room)
+        spent += time.perf_counter() - started
+
+    room.start_game(selector.select(room.max_rounds, category=rng.choice(CATEGORIES)))
+    while room.phase == GamePhase.SUBMITTING_FAKE:
+        act()
+        fake = f"yalan {rng.random()}"
+        room.submit_fake_answer("human", fake)
+        act()
+        room.submit_vote("human", rng.choice([o for o in room.rounds[room.current_round].all_options if o != fake]))
+        if room.phase != GamePhase.SHOWING_RESULTS:
+            raise SystemExit(f"round did not finish: {room.phase}")
+        room.next_round()
+    act()
+    for i in range(len(room.questions)):
+        room.submit_final_answer("human", i, "")
+    if any(len(p.final_answers) < len(room.questions) for p in room.players.values()):
+        raise SystemExit("a bot did not finish the final test")
+    return spent
+
+
+def run(rooms: int, questions: int):
+    from app.bots import BotPlayers
+    from app.game_manager import GameManager, GameRoom
+
+    selector = make_selector(questions)
+    manager = GameManager()
+    bots = BotPlayers(manager, selector, rng=random.Random(7))
+    rng = random.Random(3)
+
+    # Warm the per-category candidate tables, as the first bot game of each category would
+    started = time.perf_counter()
+    for category in CATEGORIES:
+        bots.candidates.for_question(category)
+    print(f"candidate tables for {questions} questions built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    spent = 0.0
+    started = time.perf_counter()
+    for i in range(rooms):
+        room = GameRoom(f"BENCH_{i}")
+        room.add_player("human", "İnsan")
+        while bots.add(room):
+            pass
+        spent += play_game(room, bots, selector, rng)
+    elapsed = time.perf_counter() - started
+
+    stats = bots.get_stats()
+    actions = stats["fakes"] + stats["empty_fakes"] + stats["votes"] + stats["final_tests"]
+    print(f"{rooms} games with 3 bots each in {elapsed:.2f}s (game logic included)")
+    print(f"bots: {spent * 1000:.1f} ms total, {spent / rooms * 1000:.3f} ms per game, "
+          f"{spent / actions * 1e6:.1f} µs per bot action")
+    print(f"stats: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=20000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    run(args.rooms, args.questions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Difficulty calibration benchmark on a synthetic 100k-question bank
+
+Usage (from backend/):  python -m benchmarks.bench_calibration [--rows 100000]
+Runs a full calibration, then an incremental one after a share of the
+questions got new play statistics, against a throwaway database in a
+temp directory.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ["Coğrafya", "Tarih", "Fizik", "Kimya", "Biyoloji", "Edebiyat", "Teknoloji", "Dil"]
+
+
+def populate(rows: int, seed: int = 42):
+    """Questions with a hidden true difficulty and stats sampled from it"""
+    from sqlalchemy import func, insert
+    from app.database import SessionLocal
+    from app.models import Question, QuestionStats
+
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        first = (db.query(func.max(Question.id)).scalar() or 0) + 1  # After init_db's sample questions
+        questions, stats = [], []
+        for i in range(first, first + rows):
+            questions.append({
+                "id": i,
+                "question_text": f"Soru {i}?",
+                "correct_answer": f"Cevap {i}",
+                "category": rng.choice(CATEGORIES),
+                "difficulty": rng.choice(["easy", "medium", "hard"]),
+                "is_active": True,
+            })
+            answered = rng.choice([0, 2, 10, 40, 200])
+            p_correct = rng.betavariate(4, 3)
+            correct = sum(rng.random() < p_correct for _ in range(answered))
+            voted = rng.choice([0, 6, 30, 120])
+            fooled = sum(rng.random() < 0.4 * (1 - p_correct) + 0.1 for _ in range(voted))
+            stats.append({
+                "question_id": i, "times_asked": answered, "times_correct": correct,
+                "times_wrong": answered - correct, "times_voted": voted, "times_fooled": fooled,
+                "games_used": 1, "total_players_seen": 4,
+            })
+            if len(questions) == 5000:
+                db.execute(insert(Question), questions)
+                db.execute(insert(QuestionStats), stats)
+                questions.clear()
+                stats.clear()
+        if questions:
+            db.execute(insert(Question), questions)
+            db.execute(insert(QuestionStats), stats)
+        db.commit()
+    finally:
+        db.close()
+
+
+def touch(fraction: float, seed: int = 7) -> int:
+    """New answers for a share of the bank, as game over would record them"""
+    from sqlalchemy import bindparam, select, update
+    from app.database import engine
+    from app.models import QuestionStats
+
+    rng = random.Random(seed)
+    table = QuestionStats.__table__
+    with engine.begin() as conn:
+        ids = list(conn.execute(select(table.c.question_id)).scalars())
+        chosen = rng.sample(ids, int(len(ids) * fraction))
+        conn.execute(
+            update(table).where(table.c.question_id == bindparam("qid")).values(
+                times_wrong=table.c.times_wrong + 1, updated_at=bindparam("now")
+            ),
+            [{"qid": qid, "now": datetime.utcnow()} for qid in chosen]
+        )
+    return len(chosen)
+
+
+def run(rows: int, fraction: float):
+    from app.database import init_db
+    from app.calibration import calibrate_difficulty
+
+    init_db()
+    started = time.perf_counter()
+    populate(rows)
+    print(f"populated {rows} questions in {time.perf_counter() - started:.2f}s")
+
+    full = calibrate_difficulty(full=True)
+    print(f"full:        {full}")
+    changed = touch(fraction)
+    incremental = calibrate_difficulty()
+    print(f"incremental: {incremental}")
+    if incremental["updated"] != changed:
+        raise SystemExit(f"incremental run wrote {incremental['updated']} rows, expected {changed}")
+    idle = calibrate_difficulty()
+    print(f"no changes:  {idle}")
+    if idle["updated"]:
+        raise SystemExit("a run without changes should not write anything")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--changed", type=float, default=0.05, help="share of questions with new stats")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # DATABASE_URL is relative (./data/lugatoz.db)
+        run(args.rows, args.changed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Near-duplicate index benchmark on a synthetic question bank
+
+Usage (from backend/):  python -m benchmarks.bench_dedup [--rows 100000]
+Runs in memory; no database is touched.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLANTED = 200
+
+
+def make_rows(rows: int, seed: int = 42):
+    from benchmarks.bench_search import SYLLABLES, WORDS
+
+    rng = random.Random(seed)
+    filler = ["".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(5000)]
+    result = []
+    for i in range(rows):
+        words = rng.sample(WORDS, 2) + rng.sample(filler, 6)
+        result.append((i + 1, f"{' '.join(words)} nedir?", f"{rng.choice(WORDS)} {i}"))
+
+    # Planted near-duplicates: re-cased, and with an extra word
+    for j in range(PLANTED):
+        question_id, text, answer = result[j]
+        result.append((rows + 2 * j + 1, text.upper().replace(" NEDIR?", " NEDİR"), answer))
+        result.append((rows + 2 * j + 2, text + " acaba", answer))
+    return result
+
+
+def run(rows: int, lookups: int):
+    from app.dedup import NearDuplicateIndex
+
+    data = make_rows(rows)
+    index = NearDuplicateIndex()
+    started = time.perf_counter()
+    index.build(data)
+    elapsed = time.perf_counter() - started
+    print(f"indexed {len(data)} questions in {elapsed:.2f}s ({elapsed / len(data) * 1e6:.0f} µs/question)")
+
+    started = time.perf_counter()
+    for question_id, text, answer in data[:lookups]:
+        index.query(text, answer, exclude_id=question_id)
+    print(f"lookup: {(time.perf_counter() - started) / lookups * 1e6:.0f} µs/question")
+
+    started = time.perf_counter()
+    result = index.find_groups()
+    found = sum(1 for group in result["groups"] if group[0] <= PLANTED)
+    print(f"find_groups: {time.perf_counter() - started:.2f}s, {result['pairs_compared']} pairs compared, "
+          f"{len(result['groups'])} groups ({found}/{PLANTED} planted found)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    run(args.rows, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Distractor store benchmark: game-over writes, reload and top-K lookups
+
+Usage (from backend/):  python -m benchmarks.bench_distractors [--questions 20000 --games 5000]
+Plays synthetic 10-round games into a throwaway database in a temp
+directory, reloads the index from disk and times top(question_id, 5).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUNDS = 10
+PLAYERS = 4
+
+
+def populate(questions: int) -> int:
+    from sqlalchemy import func, insert
+    from app.database import SessionLocal
+    from app.models import Question
+
+    db = SessionLocal()
+    try:
+        first = (db.query(func.max(Question.id)).scalar() or 0) + 1  # After init_db's sample questions
+        db.execute(insert(Question), [
+            {"id": i, "question_text": f"Soru {i}?", "correct_answer": f"cevap {i}",
+             "category": "Genel", "difficulty": "medium", "is_active": True}
+            for i in range(first, first + questions)
+        ])
+        db.commit()
+        return first
+    finally:
+        db.close()
+
+
+def play(index, first: int, questions: int, games: int, seed: int = 42):
+    """Rounds with fakes from a small per-question vocabulary, so answers repeat across games"""
+    from app.database import SessionLocal
+    from app.game_manager import Round
+
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for _ in range(games):
+            rounds = []
+            for question_id in rng.sample(range(first, first + questions), ROUNDS):
+                fakes = rng.sample([f"sahte {question_id} {k}" for k in range(12)], PLAYERS)
+                round_data = Round(question_id, f"Soru {question_id}?", f"cevap {question_id}")
+                round_data.fake_answers = {f"p{p}": fake for p, fake in enumerate(fakes)}
+                options = fakes + [f"cevap {question_id}"]
+                round_data.votes = {f"p{p}": rng.choice(options) for p in range(PLAYERS)}
+                rounds.append(round_data)
+            top = index.record(db, rounds)
+            db.commit()
+            index.apply(top)
+        elapsed = time.perf_counter() - started
+        print(f"recorded {games} games in {elapsed:.2f}s ({elapsed / games * 1000:.2f} ms/game incl. commit)")
+    finally:
+        db.close()
+
+
+def run(questions: int, games: int, lookups: int):
+    from sqlalchemy import func
+    from app.database import SessionLocal, init_db
+    from app.distractors import DistractorIndex
+    from app.models import QuestionDistractors
+
+    init_db()
+    first = populate(questions)
+    live = DistractorIndex()
+    play(live, first, questions, games)
+
+    db = SessionLocal()
+    try:
+        rows, stored_bytes = db.query(
+            func.count(QuestionDistractors.id), func.sum(func.length(QuestionDistractors.entries))
+        ).one()
+        reloaded = DistractorIndex()
+        started = time.perf_counter()
+        reloaded.load(db)
+        print(f"reloaded {rows} questions in {time.perf_counter() - started:.2f}s, "
+              f"{stored_bytes / max(rows, 1):.0f} bytes/question on disk")
+    finally:
+        db.close()
+
+    ids = [random.randrange(first, first + questions) for _ in range(lookups)]
+    mismatched = sum(1 for qid in ids if reloaded.top(qid, 5) != live.top(qid, 5))
+    if mismatched:
+        raise SystemExit(f"{mismatched} lookups differ between the live and the reloaded index")
+
+    top = reloaded.top
+    started = time.perf_counter()
+    for qid in ids:
+        top(qid, 5)
+    print(f"top(question_id, 5): {(time.perf_counter() - started) / lookups * 1e6:.2f} µs/lookup")
+    print(f"example: {reloaded.top(ids[0], 5)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # DATABASE_URL is relative (./data/lugatoz.db)
+        run(args.questions, args.games, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
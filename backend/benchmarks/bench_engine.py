@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""Microbenchmarks for the game engine hot paths, with stored baselines
+
+Usage (from backend/):
+    python -m benchmarks.bench_engine                 # run and compare with the baseline
+    python -m benchmarks.bench_engine --save          # run and store a new baseline
+    python -m benchmarks.bench_engine -k vote         # only cases whose name contains "vote"
+
+Each case is sized so one batch takes about --min-time, then --repeat batches
+of every case are timed in interleaved rounds, so a slow spell on the machine
+spreads over all cases instead of skewing one. This is done in --processes
+separate interpreters and their samples are pooled; the median per operation
+is reported with its spread (half the interquartile range, relative to the
+median). Cases that mutate room state reset it between operations, outside
+the timed region.
+
+A case is a regression (exit status 1) only when its median is more than
+--threshold slower than the baseline, the two interquartile ranges do not
+overlap, and the change is more than NOISE_FACTOR times the spread both runs
+measured together. A change over --threshold that fails the noise tests is
+reported as "~". Baselines are
+machine specific: refresh them with --save on the machine that runs the
+comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "engine.json")
+
+ROOM_SIZES = (4, 40, 400)
+ROOM_COUNTS = (8, 1000, 10000)
+QUESTIONS = 10
+NOISE_FACTOR = 3  # A change must exceed this many times the combined measured spread
+
+# (setup, op): setup() runs untimed before every op() call; None means op is pure
+Case = Tuple[Optional[Callable[[], None]], Callable[[], object]]
+
+
+def make_questions(count: int = QUESTIONS) -> List[Dict]:
+    return [
+        {'id': i, 'question_text': f'Soru {i}: Işık hızı yaklaşık kaç km/s?',
+         'correct_answer': f'Doğru Cevap {i}', 'acceptable_answers': f'dogru cevap {i},cevap {i}'}
+        for i in range(count)
+    ]
+
+
+def make_room(size: int, phase: str = "submitting"):
+    """A started room with `size` players, brought to the requested phase"""
+    from app.game_manager import GameRoom, GamePhase
+
+    room = GameRoom("BENCH", max_players=size)
+    for i in range(size):
+        room.add_player(f"sid{i}", f"Oyuncu {i}")
+    room.start_game(make_questions())
+    current = room.rounds[room.current_round]
+
+    if phase in ("voting", "scored"):
+        for i, sid in enumerate(room.players):
+            current.fake_answers[sid] = f"yalan {i}"
+            room.players[sid].submitted_answer = f"yalan {i}"
+        room._prepare_voting()
+    if phase == "scored":
+        options = current.all_options
+        for i, (sid, player) in enumerate(room.players.items()):
+            current.votes[sid] = options[(i * 7) % len(options)]
+            player.voted_answer = current.votes[sid]
+        room.phase = GamePhase.SHOWING_RESULTS
+    if phase == "final":
+        for player in room.players.values():
+            player.final_answers = {i: (f"doğru cevap {i}" if i % 3 else "bilmiyorum") for i in range(QUESTIONS)}
+        room.phase = GamePhase.FINAL_TEST
+    for i, player in enumerate(room.players.values()):
+        player.score = (i * 7919) % 5000
+    return room
+
+
+def checked(setup: Callable[[], None], op: Callable[[], bool]) -> Case:
+    """Run a mutating op once up front: a rejected submission would time the early return"""
+    setup()
+    if not op():
+        raise RuntimeError("benchmark setup is wrong: the operation was rejected")
+    return setup, op
+
+
+def case_normalize_answer() -> Case:
+    from app.game_manager import normalize_answer
+    return None, lambda: normalize_answer("  İSTANBUL Boğazı ve IĞDIR  ")
+
+
+def case_check_answer() -> Case:
+    from app.game_manager import check_answer
+    return None, lambda: check_answer("Deoksiribonükleik asit", "DNA", "deoksiribo nükleik asit,deoksiribonükleik asit")
+
+
+def case_submit_fake_answer(size: int) -> Case:
+    room = make_room(size)
+    current = room.rounds[0]
+    sids = list(room.players)
+    for i, sid in enumerate(sids[:-2]):
+        current.fake_answers[sid] = f"yalan {i}"
+    submitter = sids[-2]
+
+    # Two answers short of complete, so voting never starts
+    def setup():
+        current.fake_answers.pop(submitter, None)
+        current.start_time = time.time()
+
+    return checked(setup, lambda: room.submit_fake_answer(submitter, "Tamamen Uydurma Bir Cevap"))
+
+
+def case_submit_vote(size: int) -> Case:
+    room = make_room(size, "voting")
+    current = room.rounds[0]
+    sids = list(room.players)
+    options = current.all_options
+    for i, sid in enumerate(sids[:-2]):
+        current.votes[sid] = options[i % len(options)]
+    voter = sids[-2]
+    choice = next(option for option in options if option != current.fake_answers[voter])
+
+    # Two votes short of complete, so scoring never triggers
+    def setup():
+        current.votes.pop(voter, None)
+        current.voting_start_time = time.time()
+
+    return checked(setup, lambda: room.submit_vote(voter, choice))
+
+
+def case_calculate_scores(size: int) -> Case:
+    room = make_room(size, "scored")
+    return None, room._calculate_scores
+
+
+def case_calculate_final_scores(size: int) -> Case:
+    from app.game_manager import GamePhase
+
+    room = make_room(size, "final")
+
+    def setup():
+        room._phase = GamePhase.FINAL_TEST  # Skip the touch() of the phase setter
+
+    return setup, room.calculate_final_scores
+
+
+def case_get_leaderboard(size: int) -> Case:
+    room = make_room(size, "scored")
+    return None, room.get_leaderboard
+
+
+def case_to_dict(size: int) -> Case:
+    room = make_room(size, "scored")
+    return None, room.to_dict
+
+
+def case_get_all_rooms(count: int) -> Case:
+    from app.game_manager import GameManager
+
+    infos = [{"code": f"ROOM_{i}", "name": f"Oda {i}", "description": "Kıyaslama odası"} for i in range(count)]
+    manager = type("BenchGameManager", (GameManager,), {"FIXED_ROOMS": infos})()
+    rng = random.Random(count)
+    for info in infos:
+        room = manager.rooms[info["code"]]
+        for p in range(rng.randrange(5)):
+            room.add_player(f"{info['code']}-{p}", f"Oyuncu {p}")
+        if len(room.players) >= 2 and rng.random() < 0.5:
+            room.start_game(make_questions())
+    return None, manager.get_all_rooms
+
+
+def all_cases() -> Dict[str, Callable[[], Case]]:
+    cases: Dict[str, Callable[[], Case]] = {
+        "normalize_answer": case_normalize_answer,
+        "check_answer": case_check_answer,
+    }
+    for size in ROOM_SIZES:
+        cases[f"submit_fake_answer[{size}p]"] = lambda size=size: case_submit_fake_answer(size)
+        cases[f"submit_vote[{size}p]"] = lambda size=size: case_submit_vote(size)
+        cases[f"calculate_scores[{size}p]"] = lambda size=size: case_calculate_scores(size)
+        cases[f"calculate_final_scores[{size}p]"] = lambda size=size: case_calculate_final_scores(size)
+        cases[f"get_leaderboard[{size}p]"] = lambda size=size: case_get_leaderboard(size)
+        cases[f"to_dict[{size}p]"] = lambda size=size: case_to_dict(size)
+    for count in ROOM_COUNTS:
+        cases[f"get_all_rooms[{count}r]"] = lambda count=count: case_get_all_rooms(count)
+    return cases
+
+
+def _time_batch(case: Case, loops: int) -> float:
+    setup, op = case
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # Like timeit: collections would land on random operations
+    try:
+        return _timed_loops(setup, op, loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _timed_loops(setup: Optional[Callable[[], None]], op: Callable[[], object], loops: int) -> float:
+    if setup is None:
+        started = time.perf_counter()
+        for _ in range(loops):
+            op()
+        return time.perf_counter() - started
+
+    total = 0.0
+    clock = time.perf_counter
+    for _ in range(loops):
+        setup()
+        started = clock()
+        op()
+        total += clock() - started
+    return total
+
+
+def calibrate(case: Case, min_time: float) -> int:
+    """Operations per batch so that one batch takes at least min_time"""
+    loops = 1
+    while True:
+        elapsed = _time_batch(case, loops)
+        if elapsed >= min_time or loops >= 10_000_000:
+            return loops
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Median seconds per operation with the quartiles it is compared by"""
+    q1, median, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+    return {"median": median, "q1": q1, "q3": q3}
+
+
+def spread(result: Dict[str, float]) -> float:
+    """Half the interquartile range relative to the median"""
+    return (result["q3"] - result["q1"]) / 2 / result["median"]
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-6:
+        return f"{seconds * 1e9:.0f} ns"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} µs"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+def sample(pattern: Optional[str], min_time: float, repeat: int) -> Dict[str, List[float]]:
+    """Seconds per operation of every batch, timed in interleaved rounds over the cases"""
+    cases = {name: make() for name, make in all_cases().items() if not pattern or pattern in name}
+    loops = {name: calibrate(case, min_time) for name, case in cases.items()}
+    samples: Dict[str, List[float]] = {name: [] for name in cases}
+    for i in range(repeat):
+        print(f"\r  round {i + 1}/{repeat}", end="", file=sys.stderr, flush=True)
+        for name, case in cases.items():
+            samples[name].append(_time_batch(case, loops[name]) / loops[name])
+    print(file=sys.stderr)
+    return samples
+
+
+def run(pattern: Optional[str], min_time: float, repeat: int, processes: int) -> Dict[str, Dict[str, float]]:
+    """Pool the samples of several interpreter processes
+
+    Hash seeds and memory layout differ between processes and move a case's
+    timing as a whole, which batches within one process never show. Pooling
+    the processes' samples puts that run-to-run variance into the quartiles.
+    """
+    pooled: Dict[str, List[float]] = {}
+    for i in range(processes):
+        print(f"process {i + 1}/{processes}", file=sys.stderr, flush=True)
+        command = [sys.executable, "-m", "benchmarks.bench_engine", "--worker",
+                   "--min-time", str(min_time), "--repeat", str(repeat)]
+        if pattern:
+            command += ["-k", pattern]
+        output = subprocess.run(command, cwd=BACKEND_DIR, check=True, stdout=subprocess.PIPE, text=True).stdout
+        for name, values in json.loads(output).items():
+            pooled.setdefault(name, []).extend(values)
+
+    results = {}
+    for name, values in pooled.items():
+        results[name] = summarize(values)
+        print(f"  {name:<34} {format_time(results[name]['median']):>12} ±{spread(results[name]):>6.1%}")
+    return results
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]], merge: bool):
+    baseline = load_baseline(path) if merge else None
+    stored = dict(baseline["results"]) if baseline else {}
+    stored.update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": stored,
+        }, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"baseline saved to {os.path.relpath(path)} ({len(stored)} cases)")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, threshold: float) -> List[str]:
+    """Print a comparison table; returns the names of regressed cases"""
+    print(f"\nbaseline: Python {baseline['python']} on {baseline['machine']}, {baseline['created']}")
+    print(f"  {'case':<34} {'baseline':>19} {'now':>19} {'change':>9}")
+    regressions = []
+    for name, now in results.items():
+        before = baseline["results"].get(name)
+        now_text = f"{format_time(now['median'])} ±{spread(now):.0%}"
+        if not isinstance(before, dict):  # Missing, or a best-of value from an older baseline
+            print(f"  {name:<34} {'-':>19} {now_text:>19} {'new':>9}")
+            continue
+        change = now["median"] / before["median"] - 1
+        significant = abs(change) > max(threshold, NOISE_FACTOR * (spread(before) + spread(now)))
+        flag = ""
+        if significant and change > 0 and now["q1"] > before["q3"]:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif significant and change < 0 and now["q3"] < before["q1"]:
+            flag = "  faster"
+        elif abs(change) > threshold:
+            flag = "  ~ (within noise)"
+        before_text = f"{format_time(before['median'])} ±{spread(before):.0%}"
+        print(f"  {name:<34} {before_text:>19} {now_text:>19} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed batch")
+    parser.add_argument("--repeat", type=int, default=10, help="interleaved batches per case and process")
+    parser.add_argument("--processes", type=int, default=3, help="interpreter processes whose samples are pooled")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    if args.worker:
+        json.dump(sample(args.pattern, args.min_time, args.repeat), sys.stdout)
+        return
+    print(f"Python {platform.python_version()}, min batch {args.min_time}s, "
+          f"{args.repeat} rounds x {args.processes} processes")
+    results = run(args.pattern, args.min_time, args.repeat, args.processes)
+
+    if args.save:
+        save_baseline(args.baseline, results, merge=bool(args.pattern))
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("no baseline yet; run with --save to create one")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
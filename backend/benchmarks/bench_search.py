@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""FTS5 question search benchmark on a synthetic 100k-question bank
+
+Usage (from backend/):  python -m benchmarks.bench_search [--rows 100000]
+Runs against a throwaway database in a temp directory.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = [
+    "Türkiye", "başkent", "okyanus", "ışık", "hız", "bilgisayar", "programcı", "DNA",
+    "medeniyet", "Osmanlı", "İmparatorluk", "periyodik", "element", "Python", "dil",
+    "fotosentez", "organel", "Shakespeare", "oyun", "nehir", "dağ", "göl", "şehir",
+    "yazar", "şair", "roman", "savaş", "antlaşma", "gezegen", "yıldız", "kimya", "fizik",
+    "matematik", "sayı", "hayvan", "bitki", "çiçek", "ağaç", "müzik", "besteci",
+]
+SYLLABLES = ["ka", "le", "mi", "ro", "su", "ta", "ne", "bu", "dal", "gör", "yol", "tem", "şa", "çe", "ğı", "ön"]
+CATEGORIES = ["Coğrafya", "Tarih", "Fizik", "Kimya", "Biyoloji", "Edebiyat", "Teknoloji", "Dil"]
+QUERIES = ["ışık hız", "isik", "osmanli imparatorluk", "Shakespeare oyun", "fotosent",
+           "gezegen yıldız", "ÇİÇEK", "besteci müzik", "başkent", "antlaşma savaş"]
+
+
+def populate(rows: int, seed: int = 42):
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Question
+
+    rng = random.Random(seed)
+    # Filler vocabulary so topic words are moderately rare, like in a real bank
+    filler = ["".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(5000)]
+    db = SessionLocal()
+    try:
+        batch = []
+        for i in range(rows):
+            words = rng.sample(WORDS, 2) + rng.sample(filler, 6)
+            rng.shuffle(words)
+            batch.append({
+                "question_text": f"{' '.join(words)} #{i}?",
+                "correct_answer": f"{rng.choice(WORDS)} {i}",
+                "category": rng.choice(CATEGORIES),
+                "difficulty": rng.choice(["easy", "medium", "hard"]),
+                "is_active": True,
+            })
+            if len(batch) == 5000:
+                db.execute(insert(Question), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(Question), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(rows: int, repeat: int):
+    from app.database import SessionLocal, init_db
+    from app.search import search_questions
+
+    init_db()
+    started = time.perf_counter()
+    populate(rows)
+    print(f"populated {rows} rows (with FTS triggers) in {time.perf_counter() - started:.2f}s")
+
+    db = SessionLocal()
+    try:
+        print(f"{'query':<24}{'hits':>6}{'p50 ms':>10}{'p95 ms':>10}")
+        worst = 0.0
+        for query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                result = search_questions(db, query, limit=20)
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            worst = max(worst, p95)
+            print(f"{query:<24}{len(result['results']):>6}{p50:>10.2f}{p95:>10.2f}")
+        print(f"worst p95: {worst:.2f} ms")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # DATABASE_URL is relative (./data/lugatoz.db)
+        run(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Stress test for the per-room mailboxes: concurrent submissions racing the timeouts
+
+Usage (from backend/):  python -m benchmarks.stress_room_mailbox [--rooms 50] [--games 3]
+                        python -m benchmarks.stress_room_mailbox --no-mailbox   (shows the races)
+
+Every round fires all players' answers and votes concurrently, each after a
+random delay, together with the forced-timeout commands the room timers
+would run. Afterwards each round must have exactly one entry per player,
+one voting_phase and one round_results broadcast, and scores must match a
+recomputation from the recorded answers. Runs in memory; sockets are
+registered with the Socket.IO manager but nothing is sent over the wire.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYERS = 4
+
+
+def make_questions(rounds: int, game: int):
+    return [
+        {'id': game * 100 + i, 'question_text': f'Soru {game}-{i}?', 'correct_answer': f'dogru {i}'}
+        for i in range(rounds)
+    ]
+
+
+async def jitter(max_delay: float):
+    await asyncio.sleep(random.random() * max_delay)
+
+
+async def play_round(ws, room, sids, mailbox: bool, delay: float):
+    """One round: answers, votes and both timeouts all in flight at once"""
+    code = room.room_code
+    call = (lambda fn, *args: ws.room_actors.call(code, fn, *args)) if mailbox else (lambda fn, *args: fn(*args))
+    submit = ws.handle_submit_fake_answer if mailbox else ws.handle_submit_fake_answer.__wrapped__
+    vote = ws.handle_submit_vote if mailbox else ws.handle_submit_vote.__wrapped__
+
+    async def answer(i, sid):
+        await jitter(delay)
+        if random.random() < 0.8:  # Some players time out
+            await submit(sid, {'answer': f'yalan {i} {random.randrange(3)}'})
+
+    async def force_fake():
+        await jitter(delay)
+        await call(ws.force_fake_submissions, code)
+
+    await asyncio.gather(force_fake(), *(answer(i, sid) for i, sid in enumerate(sids)))
+    if room.phase != ws.GamePhase.VOTING:
+        await call(ws.force_fake_submissions, code)
+
+    options = room.rounds[room.current_round].all_options
+
+    async def cast(sid):
+        await jitter(delay)
+        if random.random() < 0.8:
+            await vote(sid, {'answer': random.choice(options)})
+
+    async def force_votes():
+        await jitter(delay)
+        await call(ws.force_votes, code)
+
+    await asyncio.gather(force_votes(), *(cast(sid) for sid in sids))
+    if room.phase != ws.GamePhase.SHOWING_RESULTS:
+        await call(ws.force_votes, code)
+
+
+def check_round(room, round_index, sids, counts):
+    """Return a list of invariant violations for one finished round (counts: event -> broadcasts)"""
+    problems = []
+    current = room.rounds[round_index]
+    if sorted(current.fake_answers) != sorted(sids):
+        problems.append(f"{room.room_code} r{round_index}: fake_answers for {sorted(current.fake_answers)}")
+    if sorted(current.votes) != sorted(sids):
+        problems.append(f"{room.room_code} r{round_index}: votes for {sorted(current.votes)}")
+    for event in ('voting_phase', 'round_results'):
+        if counts.get(event, 0) != 1:
+            problems.append(f"{room.room_code} r{round_index}: {counts.get(event, 0)} x {event}")
+    return problems
+
+
+def expected_scores(room, sids):
+    """Recompute scores from the recorded rounds with the game's scoring rules"""
+    from app.game_manager import normalize_answer
+
+    scores = {sid: 0 for sid in sids}
+    for current in room.rounds:
+        correct = normalize_answer(current.correct_answer)
+        for sid in sids:
+            fake = current.fake_answers.get(sid)
+            chosen = current.votes.get(sid)
+            if fake == "":
+                scores[sid] -= 100
+            if chosen == "":
+                scores[sid] -= 100
+            elif chosen == correct:
+                scores[sid] += 1000
+            elif chosen:
+                scores[sid] -= 500
+            if fake:
+                scores[sid] += 500 * sum(1 for vote in current.votes.values() if vote == fake)
+    return scores
+
+
+async def run(rooms: int, games: int, rounds: int, mailbox: bool, delay: float, seed: int):
+    from app import websocket as ws
+    from app.game_manager import GameRoom
+    from app.log import log
+
+    random.seed(seed)
+    manager = ws.game_manager
+    codes = []
+    for i in range(rooms):
+        code = f"STRESS_{i}"
+        manager.rooms[code] = GameRoom(code, max_players=PLAYERS)
+        codes.append(code)
+
+    # Real Socket.IO sids (so enter_room/emit work), no transport behind them
+    players = {}
+    log.configure(level="warning")  # No join lines
+    for code in codes:
+        players[code] = []
+        for p in range(PLAYERS):
+            sid = await ws.sio.manager.connect(f"{code}-{p}", "/")
+            await ws.handle_join_game(sid, {'player_name': f'P{p}', 'room_code': code})
+            players[code].append(sid)
+
+    problems = []
+    rounds_played = 0
+    started = time.perf_counter()
+
+    async def play_game(code, game):
+        nonlocal rounds_played
+        room = manager.get_room(code)
+        sids = players[code]
+        log_start = ws.event_logs.get(code).seq
+        room.start_game(make_questions(rounds, game))
+
+        for round_index in range(rounds):
+            await play_round(ws, room, sids, mailbox, delay)
+            ws.cancel_all_room_tasks(code)  # Drive phases ourselves, not the 10-15 s timers
+            counts = {}
+            for event in ws.event_logs.get(code).since(log_start) or []:
+                counts[event['event']] = counts.get(event['event'], 0) + 1
+            problems.extend(check_round(room, round_index, sids, counts))
+            log_start = ws.event_logs.get(code).seq
+            rounds_played += 1
+
+            if round_index < rounds - 1:
+                if mailbox:
+                    await ws.room_actors.call(code, ws.advance_round, code)
+                else:
+                    await ws.advance_round(code)
+                ws.cancel_all_room_tasks(code)
+                log_start = ws.event_logs.get(code).seq
+
+        actual = {sid: room.players[sid].score for sid in sids}
+        if actual != expected_scores(room, sids):
+            problems.append(f"{code} game {game}: scores {actual} != {expected_scores(room, sids)}")
+        manager.reset_room_keep_players(code)
+
+    for game in range(games):
+        await asyncio.gather(*(play_game(code, game) for code in codes))
+
+    elapsed = time.perf_counter() - started
+    print(f"{'mailbox' if mailbox else 'no mailbox'}: {rooms} rooms x {games} games x {rounds} rounds "
+          f"({rounds_played} rounds) in {elapsed:.2f}s")
+
+    if mailbox:
+        stats = ws.room_actors.get_stats()
+        processed = sum(s['processed'] for s in stats.values())
+        max_depth = max(s['max_depth'] for s in stats.values())
+        worst = max(s['max_ms'] for s in stats.values())
+        print(f"mailboxes: {processed} commands, max queue depth {max_depth}, slowest command {worst:.2f} ms")
+
+    if problems:
+        print(f"{len(problems)} invariant violations, e.g.:")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+    else:
+        print("state consistent: one answer and vote per player, one broadcast per phase, scores match")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.005, help="max random delay per action (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-mailbox", action="store_true", help="call handlers directly (old behaviour)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    ok = asyncio.run(run(args.rooms, args.games, args.rounds, not args.no_mailbox, args.delay, args.seed))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# The engine resolves ./data/lugatoz.db on import; keep the suite's database out of the tree
+os.chdir(tempfile.mkdtemp(prefix="lugatoz-tests-"))
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    """The app's database with the sample questions, and the selector loaded from it"""
+    from app.database import SessionLocal, init_db
+    from app.question_selector import question_selector
+
+    init_db()
+    db = SessionLocal()
+    try:
+        question_selector.load(db)
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    """Socket.IO events the handlers send, as (event, room, data); nothing goes over the wire"""
+    from app import websocket as ws
+
+    events = []
+
+    async def emit(event, data=None, room=None, **kwargs):
+        events.append((event, room, data))
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(ws.sio, "emit", emit)
+    monkeypatch.setattr(ws.sio, "enter_room", noop)
+    monkeypatch.setattr(ws.sio, "leave_room", noop)
+    return events
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app import auth
+from app.database import SessionLocal
+from app.models import User, UserStats
+
+
+@pytest.fixture
+def db(app_db):
+    session = SessionLocal()
+    yield session
+    session.query(UserStats).filter(UserStats.user_id >= 6000).delete()
+    session.query(User).filter(User.user_id >= 6000).delete()
+    session.commit()
+    session.close()
+
+
+def test_rename_in_another_worker_expires_cached_name(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(auth, "identity_cache", auth.IdentityCache(ttl=30))
+    db.add(User(user_id=6001, username="Eski"))
+    db.commit()
+    assert auth.get_user_by_username(db, "eski").user_id == 6001
+
+    # Another worker renames the user and someone registers the old name
+    db.query(User).filter(User.user_id == 6001).update({"username": "Yeni"})
+    db.add(User(user_id=6002, username="Eski"))
+    db.commit()
+
+    now[0] += 31
+    assert auth.get_user_by_username(db, "eski").user_id == 6002
+    assert auth.get_user_by_id(db, 6001).username == "Yeni"
+    assert auth.identity_cache.get_stats()["expired"] == 1
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+
+import pytest
+
+from app import websocket as ws
+from app.database import SessionLocal
+from app.game_manager import GamePhase
+from app.models import GameResult, User, UserStats
+from app.question_selector import question_selector
+
+ROOM_CODE = "ALI_KUSCU"
+SOLO = "solo"
+_games = itertools.count(1)
+
+
+@pytest.fixture
+def db(app_db):
+    session = SessionLocal()
+    session.add(User(user_id=7001, username="Tekbasina"))
+    session.add(UserStats(user_id=7001))
+    session.commit()
+    yield session
+    ws.cancel_all_room_tasks(ROOM_CODE)
+    ws.game_manager.reset_room(ROOM_CODE)
+    ws.socket_rooms.pop(SOLO, None)
+    ws.rate_limiter.forget(SOLO)  # As on disconnect; the next test plays with the same sid
+    session.query(GameResult).filter(GameResult.user_id == 7001).delete()
+    session.query(UserStats).filter(UserStats.user_id == 7001).delete()
+    session.query(User).filter(User.user_id == 7001).delete()
+    session.commit()
+    session.close()
+
+
+async def play_against_bots(before_final_test=lambda: None):
+    await ws.handle_join_game(SOLO, {"player_name": "Tekbasina", "room_code": ROOM_CODE})
+    room = ws.game_manager.get_room(ROOM_CODE)
+    room.players[SOLO].user_id = 7001
+    for _ in range(3):
+        # Bots that never vote for the truth vote for a fake, often the person's
+        await ws.handle_add_bot(SOLO, {"skill": 0.0})
+    await ws.handle_start_game(SOLO, {})
+    # Bots reuse recorded fakes first, so an earlier game's fake would already be taken
+    game = next(_games)
+    for i in range(room.max_rounds):
+        current = room.rounds[room.current_round]
+        await ws.handle_submit_fake_answer(SOLO, {"answer": f"uydurma cevap {game}-{i}"})
+        await ws.handle_submit_vote(SOLO, {"answer": current.correct_answer})
+        assert room.phase == GamePhase.SHOWING_RESULTS
+        await ws.advance_round(ROOM_CODE)
+    before_final_test()
+    for i, question in enumerate(room.questions):
+        await ws.handle_submit_final_answer(SOLO, {"question_index": i, "answer": question["correct_answer"]})
+    assert room.phase == GamePhase.GAME_OVER
+    ws.cancel_all_room_tasks(ROOM_CODE)
+    return room
+
+
+def test_game_against_bots_only_leaves_no_leaderboard_trace(db, emitted):
+    room = asyncio.run(play_against_bots())
+    bot_votes_for_fakes = sum(
+        1 for round_data in room.rounds for pid, vote in round_data.votes.items()
+        if room.players[pid].is_bot and vote == round_data.fake_answers[SOLO]
+    )
+    assert bot_votes_for_fakes  # Otherwise the test proves nothing
+
+    db.expire_all()
+    stats = db.query(UserStats).filter(UserStats.user_id == 7001).one()
+    assert stats.total_games_played == 1
+    assert stats.total_games_won == 0
+    assert stats.total_score == 0 and stats.highest_score == 0
+    assert stats.total_players_deceived == 0
+    assert stats.total_correct_answers == room.max_rounds
+    assert (stats.rated_games or 0) == 0
+
+
+def test_failed_game_over_commit_leaves_selector_stats_alone(db, emitted, monkeypatch):
+    def failing_session():
+        session = SessionLocal()
+
+        def commit():
+            raise RuntimeError("disk full")
+
+        session.commit = commit
+        return session
+
+    asked = {}
+
+    def break_database():
+        room = ws.game_manager.get_room(ROOM_CODE)
+        asked.update({q["id"]: question_selector._stats[q["id"]]["times_asked"] for q in room.questions})
+        monkeypatch.setattr(ws, "SessionLocal", failing_session)
+
+    asyncio.run(play_against_bots(break_database))
+    assert {qid: question_selector._stats[qid]["times_asked"] for qid in asked} == asked
+
+
+def test_game_over_mirrors_final_test_answers_into_selector(db, emitted):
+    asked = {}
+
+    def remember():
+        room = ws.game_manager.get_room(ROOM_CODE)
+        asked.update({q["id"]: question_selector._stats[q["id"]]["times_asked"] for q in room.questions})
+
+    asyncio.run(play_against_bots(remember))
+    assert {qid: question_selector._stats[qid]["times_asked"] for qid in asked} == {
+        qid: times + 1 for qid, times in asked.items()
+    }
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app.game_manager import GameManager
+from app.lobby import LobbyFeed
+
+
+def test_quick_play_rooms_stay_out_of_the_lobby():
+    manager = GameManager()
+    sent = []
+
+    async def emit(event, data):
+        sent.append((event, data["room_code"]))
+
+    feed = LobbyFeed(manager, emit, window=0.01)
+    manager.listeners.append(feed.notify)
+
+    async def play():
+        feed.subscribe("viewer")
+        version = manager.version
+        match_room = manager.acquire_match_room()
+        match_room.add_player("a", "Ali")
+        match_room.add_player("b", "Veli")
+        await asyncio.sleep(0.05)
+        assert manager.version == version
+
+        manager.get_room("KASGARLI").add_player("c", "Ayşe")
+        await asyncio.sleep(0.05)
+        assert manager.version != version
+
+    asyncio.run(play())
+    assert sent == [("lobby_room_update", "KASGARLI")]
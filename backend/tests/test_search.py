@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from app.models import Base, Question
+from app.search import RANK_WINDOW, install_fts, register_functions, search_questions
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    event.listen(engine, "connect", lambda dbapi_connection, record: register_functions(dbapi_connection))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        install_fts(conn)
+    session = Session(bind=engine)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_questions(db, category, count):
+    db.execute(insert(Question), [
+        {"question_text": f"Bu kelime {category} {i} nedir?", "correct_answer": f"cevap {i}",
+         "category": category, "difficulty": "medium", "is_active": True}
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def test_category_filter_with_broad_term_beyond_rank_window(db):
+    # Older category B matches sit below the window of all matches
+    add_questions(db, "B", 500)
+    add_questions(db, "A", RANK_WINDOW + 100)
+
+    result = search_questions(db, "kelime", category="B")
+    assert len(result["results"]) == 20
+    assert all(row["category"] == "B" for row in result["results"])
+    assert result["has_more"] and not result["truncated"]
+
+
+def test_window_cut_is_reported(db):
+    add_questions(db, "A", RANK_WINDOW + 100)
+
+    first = search_questions(db, "kelime")
+    assert first["has_more"] and first["truncated"]
+
+    beyond = search_questions(db, "kelime", offset=RANK_WINDOW)
+    assert beyond["results"] == [] and not beyond["has_more"] and beyond["truncated"]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.database import SessionLocal
+from app.models import UserSeenQuestions
+from app.seen_questions import SeenBitmap, SeenQuestionStore
+
+
+@pytest.fixture
+def db(app_db):
+    session = SessionLocal()
+    yield session
+    session.query(UserSeenQuestions).delete()
+    session.commit()
+    session.close()
+
+
+def stored(db, user_id):
+    db.expire_all()
+    row = db.query(UserSeenQuestions).filter(UserSeenQuestions.user_id == user_id).one()
+    return set(question_id for question_id in range(100) if question_id in SeenBitmap.from_bytes(row.bitmap))
+
+
+def test_stale_cache_of_another_worker_keeps_stored_ids(db):
+    first, second = SeenQuestionStore(), SeenQuestionStore()
+    second.get_many(db, [7])  # Cached empty before the first worker writes
+
+    bitmaps = first.mark_seen(db, [7], [1, 2])
+    db.commit()
+    first.apply(bitmaps)
+    bitmaps = second.mark_seen(db, [7], [3])
+    db.commit()
+    second.apply(bitmaps)
+
+    assert stored(db, 7) == {1, 2, 3}
+    assert all(question_id in second.get_many(db, [7])[7] for question_id in (1, 2, 3))
+
+
+def test_cache_is_untouched_until_commit(db):
+    store = SeenQuestionStore()
+    store.mark_seen(db, [8], [4, 5])
+    db.rollback()
+    assert 4 not in store.get_many(db, [8])[8]
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+
+import pytest
+
+from app import websocket as ws
+from app.game_manager import GamePhase
+
+ROOM_CODE = "KASGARLI"
+_sids = itertools.count(1)
+
+
+@pytest.fixture
+def host(app_db, emitted):
+    """Socket id of the host of a two-player room waiting to start"""
+    # Fresh ids per test: join_game is rate limited per socket
+    sids = [f"test-{next(_sids)}" for _ in range(2)]
+    for sid, name in zip(sids, ("Ali", "Veli")):
+        asyncio.run(ws.handle_join_game(sid, {"player_name": name, "room_code": ROOM_CODE}))
+    yield sids[0]
+    ws.cancel_all_room_tasks(ROOM_CODE)
+    ws.game_manager.reset_room(ROOM_CODE)
+    for sid in sids:
+        ws.socket_rooms.pop(sid, None)
+
+
+def errors(emitted):
+    return [data["message"] for event, _, data in emitted if event == "error"]
+
+
+@pytest.mark.parametrize("category", ["Yok Böyle Kategori", ["Tarih"], 42])
+def test_unknown_category_is_rejected(host, emitted, category):
+    asyncio.run(ws.handle_start_game(host, {"category": category}))
+    room = ws.game_manager.get_room(ROOM_CODE)
+    assert errors(emitted) == ["Geçersiz kategori!"]
+    assert room.phase == GamePhase.WAITING and not room.rounds
+
+
+def test_category_with_too_few_questions_is_rejected(host, emitted):
+    # The sample bank has 3 Tarih questions, fewer than max_rounds
+    asyncio.run(ws.handle_start_game(host, {"category": "Tarih"}))
+    room = ws.game_manager.get_room(ROOM_CODE)
+    assert errors(emitted) == [f"Yeterli soru yok! En az {room.max_rounds} soru gerekli."]
+    assert room.phase == GamePhase.WAITING and not room.rounds
+
+
+@pytest.mark.parametrize("category", [None, ""])
+def test_no_category_uses_the_whole_bank(host, emitted, category):
+    asyncio.run(ws.handle_start_game(host, {"category": category}))
+    room = ws.game_manager.get_room(ROOM_CODE)
+    assert errors(emitted) == []
+    assert room.phase == GamePhase.SUBMITTING_FAKE
+    assert len(room.questions) == room.max_rounds and len(room.rounds) == 1
+
+
+def test_start_game_without_questions_does_not_start(host):
+    room = ws.game_manager.get_room(ROOM_CODE)
+    assert room.start_game([]) is False
+    assert room.phase == GamePhase.WAITING and not room.rounds
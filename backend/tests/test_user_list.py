@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+from app.models import User, UserStats
+
+
+@pytest.fixture
+def client(app_db):
+    db = SessionLocal()
+    db.add_all([User(user_id=5000 + i, username=f"liste{i}") for i in range(5)])
+    db.add_all([UserStats(user_id=5000 + i, total_score=i * 10) for i in range(5)])
+    db.commit()
+    yield TestClient(app)
+    db.query(UserStats).filter(UserStats.user_id >= 5000).delete()
+    db.query(User).filter(User.user_id >= 5000).delete()
+    db.commit()
+    db.close()
+
+
+def test_cursor_pages_through_every_user(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "sort": "total_score", "q": "liste"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/users", params=params).json()
+        seen += [user["username"] for user in page["users"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"liste{i}" for i in reversed(range(5))]
+
+
+@pytest.mark.parametrize("params", [
+    {"sort": "total_score"},
+    {"sort": "user_id", "order": "asc"},
+    {"sort": "created_at"},
+])
+def test_cursor_from_another_sort_is_rejected(client, params):
+    cursor = client.get("/api/users", params={"limit": 1, "sort": "user_id"}).json()["next_cursor"]
+    response = client.get("/api/users", params={"limit": 1, "cursor": cursor, **params})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["bm90IGpzb24", "WyJ1c2VyX2lkIiwiZGVzYyIsIngiXQ"])
+def test_malformed_cursor_is_rejected(client, cursor):
+    assert client.get("/api/users", params={"cursor": cursor}).status_code == 400
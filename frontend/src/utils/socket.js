@@ -7,6 +7,10 @@ class SocketManager {
     this.lastRoomCode = null;
     this.lastPlayerName = null;
     this.isReconnecting = false;
+    // Oturum anahtarı: sayfa yenilense bile aynı koltuğa geri dönmek için
+    this.sessionToken = sessionStorage.getItem('lugatoz_session');
+    // Odadan alinan son olayin sira numarasi (kacirilan olaylari istemek icin)
+    this.lastSeq = null;
   }
 
   connect() {
@@ -29,6 +33,13 @@ class SocketManager {
     this.socket.on('connect', () => {
       this.connected = true;
 
+      // Oturum anahtari varsa ayni oyuncu olarak devam et (durum sunucudan gelir)
+      if (this.sessionToken) {
+        this.socket.emit('resume', { token: this.sessionToken, last_seq: this.lastSeq });
+        this.isReconnecting = false;
+        return;
+      }
+
       // Eger daha once bir odadaysa, otomatik yeniden katil
       if (this.lastRoomCode && this.lastPlayerName && this.isReconnecting) {
         setTimeout(() => {
@@ -41,6 +52,13 @@ class SocketManager {
       }
     });
 
+    // Oda yayinlari sira numarasi tasir
+    this.socket.onAny((event, data) => {
+      if (data && typeof data.seq === 'number') {
+        this.lastSeq = data.seq;
+      }
+    });
+
     this.socket.on('disconnect', (reason) => {
       this.connected = false;
 
@@ -80,6 +98,34 @@ class SocketManager {
     this.lastPlayerName = null;
     this.lastRoomCode = null;
     this.isReconnecting = false;
+    this.clearSession();
+  }
+
+  // Sunucunun join sonrasi verdigi oturum anahtarini sakla
+  setSession(token) {
+    this.sessionToken = token;
+    this.lastSeq = null;
+    sessionStorage.setItem('lugatoz_session', token);
+  }
+
+  clearSession() {
+    this.sessionToken = null;
+    this.lastSeq = null;
+    sessionStorage.removeItem('lugatoz_session');
+  }
+
+  hasSession() {
+    return !!this.sessionToken;
+  }
+
+  // Oturum devam ettirilemedi: eski yonteme (isimle yeniden katilma) don
+  rejoinRoom() {
+    if (this.lastRoomCode && this.lastPlayerName) {
+      this.socket.emit('join_game', {
+        player_name: this.lastPlayerName,
+        room_code: this.lastRoomCode
+      });
+    }
   }
 
   disconnect() {